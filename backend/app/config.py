@@ -12,6 +12,67 @@ class Settings(BaseSettings):
     MAX_IMAGE_SIZE: int = 5 * 1024 * 1024  # 5MB
     OPENAI_API_KEY: str | None = None
 
+    # Background job queue (set JOB_WORKER_CONCURRENCY=0 to run jobs inline)
+    JOB_WORKER_CONCURRENCY: int = 4
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 5.0
+    JOB_STALE_AFTER_SECONDS: int = 600
+    JOB_HEARTBEAT_SECONDS: float = 60.0
+    JOB_DRAIN_TIMEOUT_SECONDS: float = 30.0
+
+    # Historical reconciliation replay
+    REPLAY_WORKERS: int = 4
+    REPLAY_BATCH_SIZE: int = 5000
+
+    # Loss severity rules
+    LOSS_RULE_CACHE_TTL_SECONDS: float = 30.0
+
+    # Learned per-product thresholds (z-score against weekday discrepancy stats)
+    LOSS_STATS_ENABLED: bool = True
+    LOSS_STATS_MIN_SAMPLES: int = 8
+    LOSS_STATS_MIN_STD: float = 0.1
+    LOSS_Z_INFO: float = 2.0
+    LOSS_Z_WARNING: float = 3.0
+    LOSS_Z_CRITICAL: float = 4.0
+
+    # Dashboard cache ("memory", or "redis" with the optional redis package)
+    CACHE_BACKEND: str = "memory"
+    CACHE_REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_MAX_ENTRIES: int = 2048
+    DASHBOARD_CACHE_TTL_SECONDS: float = 300.0
+
+    # Bar time zone / business-day cutover cache
+    BAR_CLOCK_CACHE_TTL_SECONDS: float = 300.0
+
+    # Analytics time series: longest range for series read from raw tables
+    ANALYTICS_RAW_MAX_DAYS: int = 31
+
+    # List totals: planner estimates below this are replaced by exact counts
+    PAGINATION_EXACT_COUNT_THRESHOLD: int = 1000
+
+    # Product search ("auto", "trigram" for pg_trgm, or "memory")
+    PRODUCT_SEARCH_BACKEND: str = "auto"
+    PRODUCT_SEARCH_INDEX_TTL_SECONDS: float = 300.0
+
+    # Background file imports; kept out of UPLOAD_DIR, which is served publicly
+    IMPORT_DIR: str = "imports"
+    IMPORT_MAX_FILE_BYTES: int = 1024 * 1024 * 1024  # 1GB
+    IMPORT_BATCH_ROWS: int = 5000
+
+    # Streaming POS sales (POST /sales/stream): per-bar write buffer
+    SALES_STREAM_BATCH_ROWS: int = 500
+    SALES_STREAM_FLUSH_SECONDS: float = 0.25
+    SALES_STREAM_MAX_PENDING_ROWS: int = 5000
+    SALES_STREAM_MAX_LINE_BYTES: int = 16 * 1024
+
+    # Idempotency keys: recently committed keys answered from memory
+    IDEMPOTENCY_CACHE_MAX_KEYS: int = 100_000
+
+    # Monthly partitions of sales, stock movements and loss reports
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_CHECK_INTERVAL_SECONDS: int = 6 * 3600
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
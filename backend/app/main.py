@@ -20,24 +20,44 @@ from app.routers import (
     loss_reports,
     dashboard,
     ai,
+    jobs,
+    loss_rules,
+    analytics,
+    bars,
+    imports,
 )
+from app.services.job_queue import job_pool
+from app.services.partitions import ensure_partitions, start_partition_maintenance, stop_partition_maintenance
+from app.services.reconciliation_replay import shutdown_replay_executor
+from app.services.sales_stream import drain_sales_buffers
 
 settings = get_settings()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create tables on startup
+    # Create tables and the coming months' partitions on startup
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn)
 
     # Create upload directory
     os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
     os.makedirs(os.path.join(settings.UPLOAD_DIR, "products"), exist_ok=True)
+    os.makedirs(settings.IMPORT_DIR, exist_ok=True)
+
+    # Start background job workers
+    job_pool.start(settings.JOB_WORKER_CONCURRENCY)
+    start_partition_maintenance()
 
     yield
 
-    # Cleanup on shutdown
+    # Cleanup on shutdown: write out buffered POS sales and let in-flight
+    # jobs finish before closing the pool
+    await drain_sales_buffers(settings.JOB_DRAIN_TIMEOUT_SECONDS)
+    await job_pool.stop(settings.JOB_DRAIN_TIMEOUT_SECONDS)
+    await stop_partition_maintenance()
+    shutdown_replay_executor()
     await engine.dispose()
 
 
@@ -77,6 +97,11 @@ app.include_router(reconciliation.router, prefix=API_PREFIX)
 app.include_router(loss_reports.router, prefix=API_PREFIX)
 app.include_router(dashboard.router, prefix=API_PREFIX)
 app.include_router(ai.router, prefix=API_PREFIX)
+app.include_router(jobs.router, prefix=API_PREFIX)
+app.include_router(loss_rules.router, prefix=API_PREFIX)
+app.include_router(analytics.router, prefix=API_PREFIX)
+app.include_router(bars.router, prefix=API_PREFIX)
+app.include_router(imports.router, prefix=API_PREFIX)
 
 
 @app.get("/")
@@ -8,6 +8,14 @@ from app.models.shift import Shift, ShiftStockCount, ShiftStatus
 from app.models.sales_record import SalesRecord
 from app.models.daily_reconciliation import DailyReconciliation
 from app.models.loss_report import LossReport, LossSeverity, ReasonCode
+from app.models.job import Job, JobStatus
+from app.models.shift_product_ledger import ShiftProductLedger
+from app.models.loss_rule import LossRule, ToleranceType
+from app.models.product_discrepancy_stats import ProductDiscrepancyStats
+from app.models.staff_scorecard import StaffDailyScorecard
+from app.models.daily_product_rollup import DailyProductRollup
+from app.models.import_job import ImportJob, ImportStatus
+from app.models.idempotency_key import IdempotencyKey
 
 __all__ = [
     "Bar", "User", "UserRole",
@@ -19,4 +27,12 @@ __all__ = [
     "SalesRecord",
     "DailyReconciliation",
     "LossReport", "LossSeverity", "ReasonCode",
+    "Job", "JobStatus",
+    "ShiftProductLedger",
+    "LossRule", "ToleranceType",
+    "ProductDiscrepancyStats",
+    "StaffDailyScorecard",
+    "DailyProductRollup",
+    "ImportJob", "ImportStatus",
+    "IdempotencyKey",
 ]
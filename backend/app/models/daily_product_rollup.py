@@ -0,0 +1,45 @@
+import uuid
+from datetime import date, datetime
+from sqlalchemy import Date, DateTime, Integer, Numeric, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class DailyProductRollup(Base):
+    """
+    One product's sales and losses on one day, kept up to date on write and
+    recomputed from the raw rows when the day is compacted. Closing stock is
+    snapshotted at compaction.
+    """
+    __tablename__ = "daily_product_rollups"
+    __table_args__ = (
+        Index("ix_daily_product_rollups_bar_day", "bar_id", "day"),
+    )
+
+    product_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("products.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
+
+    units_sold: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    sales_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+
+    loss_quantity: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    loss_incidents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    loss_value: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    info_incidents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    info_loss_value: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    warning_incidents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    warning_loss_value: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    critical_incidents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    critical_loss_value: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    unresolved_incidents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    closing_stock: Mapped[float | None] = mapped_column(Numeric(12, 2), nullable=True)
+    closing_stock_value: Mapped[float | None] = mapped_column(Numeric(14, 2), nullable=True)
+    compacted_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<DailyProductRollup {self.product_id}/{self.day} revenue:{self.revenue} loss:{self.loss_value}>"
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime, date
-from sqlalchemy import DateTime, Date, Numeric, ForeignKey
+from sqlalchemy import DateTime, Date, Numeric, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -8,6 +8,10 @@ from app.database import Base
 
 class DailyReconciliation(Base):
     __tablename__ = "daily_reconciliations"
+    __table_args__ = (
+        UniqueConstraint("shift_id", "product_id", name="uq_daily_reconciliations_shift_product"),
+        Index("ix_daily_reconciliations_bar_date", "bar_id", "date"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
@@ -0,0 +1,22 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import String, DateTime, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class IdempotencyKey(Base):
+    """A client idempotency key claimed by the row first written under it (see services.idempotency)."""
+    __tablename__ = "idempotency_keys"
+
+    bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), primary_key=True)
+    # Table of the keyed row, e.g. "sales_records"
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    key: Mapped[str] = mapped_column(String(128), primary_key=True)
+    # The keyed row's primary key; its created_at picks the partition
+    record_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), nullable=False)
+    record_created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<IdempotencyKey {self.table_name}/{self.key}>"
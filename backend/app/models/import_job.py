@@ -0,0 +1,57 @@
+import uuid
+import enum
+from datetime import datetime
+from sqlalchemy import String, DateTime, Integer, BigInteger, Enum, ForeignKey, Text, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app.database import Base
+
+
+class ImportStatus(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class ImportJob(Base):
+    """An uploaded file processed in the background by an import parser."""
+    __tablename__ = "import_jobs"
+    __table_args__ = (
+        Index("ix_import_jobs_bar_created_at", "bar_id", "created_at"),
+    )
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
+    created_by: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    # The jobs row currently processing the file
+    job_id: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("jobs.id"), nullable=True)
+    parser: Mapped[str] = mapped_column(String(50), nullable=False)
+    params: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    status: Mapped[ImportStatus] = mapped_column(Enum(ImportStatus), nullable=False, default=ImportStatus.QUEUED)
+    file_name: Mapped[str] = mapped_column(String(255), nullable=False)
+    file_path: Mapped[str] = mapped_column(String(500), nullable=False)
+    file_size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+    # Progress as of the last committed batch; a resumed run starts here
+    bytes_done: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    records_read: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    rows_done: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    rows_failed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    batches_committed: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    parser_state: Mapped[dict] = mapped_column(JSONB, nullable=False, default=dict)
+    error_report_path: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    error_report_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    # Where and when the current run started, for its throughput / ETA
+    run_started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    run_start_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ImportJob {self.parser} {self.id} ({self.status.value})>"
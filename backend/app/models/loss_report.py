@@ -1,7 +1,7 @@
 import uuid
 import enum
-from datetime import datetime
-from sqlalchemy import String, DateTime, Numeric, Enum, ForeignKey, Text
+from datetime import date, datetime
+from sqlalchemy import String, DateTime, Numeric, Enum, ForeignKey, Text, Date, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -23,6 +23,15 @@ class ReasonCode(str, enum.Enum):
 
 class LossReport(Base):
     __tablename__ = "loss_reports"
+    __table_args__ = (
+        Index("ix_loss_reports_bar_business_date", "bar_id", "business_date"),
+        Index("ix_loss_reports_bar_created_at", "bar_id", "created_at"),
+        Index("ix_loss_reports_shift_product", "shift_id", "product_id"),
+        # Only the review queue: stays small however much history is kept
+        Index("ix_loss_reports_unresolved", "bar_id", "created_at", postgresql_where=text("reason_code IS NULL")),
+        # Monthly partitions on created_at (see services.partitions)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
@@ -36,7 +45,10 @@ class LossReport(Base):
     reviewed_by: Mapped[uuid.UUID | None] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
     reviewed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Partition key, so part of the primary key
+    created_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
+    # The bar's local trading day (see services.business_date)
+    business_date: Mapped[date] = mapped_column(Date, nullable=False)
 
     # Relationships
     product = relationship("Product")
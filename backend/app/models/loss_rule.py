@@ -0,0 +1,45 @@
+import uuid
+import enum
+from datetime import datetime
+from sqlalchemy import DateTime, Numeric, Boolean, Enum, ForeignKey, Integer
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+from app.models.product import ProductCategory, ProductUnit
+
+
+class ToleranceType(str, enum.Enum):
+    PERCENT_OF_MIN_STOCK = "percent_of_min_stock"  # tolerance % of the product's min stock threshold
+    PERCENT_OF_EXPECTED = "percent_of_expected"    # tolerance % of the expected closing stock
+    ABSOLUTE = "absolute"                          # tolerance in the product's own counting unit
+    ABSOLUTE_ML = "absolute_ml"                    # tolerance in ml, converted via volume_ml
+
+
+class LossRule(Base):
+    """
+    Per-bar loss severity rule. A rule may target a product category, a
+    counting unit, both, or neither (the bar default); the most specific
+    active rule wins, then the highest priority.
+    """
+    __tablename__ = "loss_rules"
+
+    id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False, index=True)
+    category: Mapped[ProductCategory | None] = mapped_column(Enum(ProductCategory), nullable=True)
+    unit: Mapped[ProductUnit | None] = mapped_column(Enum(ProductUnit), nullable=True)
+    tolerance_type: Mapped[ToleranceType] = mapped_column(
+        Enum(ToleranceType), nullable=False, default=ToleranceType.PERCENT_OF_MIN_STOCK
+    )
+    tolerance: Mapped[float] = mapped_column(Numeric(10, 3), nullable=False, default=10)
+    min_tolerance: Mapped[float] = mapped_column(Numeric(10, 3), nullable=False, default=0.5)
+    warning_multiplier: Mapped[float] = mapped_column(Numeric(6, 2), nullable=False, default=1.5)
+    critical_multiplier: Mapped[float] = mapped_column(Numeric(6, 2), nullable=False, default=3)
+    warning_value: Mapped[float | None] = mapped_column(Numeric(12, 2), nullable=True)
+    critical_value: Mapped[float | None] = mapped_column(Numeric(12, 2), nullable=True)
+    priority: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<LossRule {self.category} {self.unit} {self.tolerance_type.value}:{self.tolerance}>"
@@ -1,7 +1,7 @@
 import uuid
 import enum
 from datetime import datetime
-from sqlalchemy import String, DateTime, Numeric, Boolean, Enum, ForeignKey, Integer, Text
+from sqlalchemy import String, DateTime, Numeric, Boolean, Enum, ForeignKey, Integer, Text, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -27,10 +27,24 @@ class ProductUnit(str, enum.Enum):
 
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_bar_name", "bar_id", "name"),
+        Index("ix_products_bar_lower_name", "bar_id", text("lower(name)")),
+        Index(
+            "uq_products_bar_barcode", "bar_id", "barcode",
+            unique=True, postgresql_where=text("barcode IS NOT NULL"),
+        ),
+        Index(
+            "uq_products_bar_sku", "bar_id", "sku",
+            unique=True, postgresql_where=text("sku IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
+    barcode: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    sku: Mapped[str | None] = mapped_column(String(64), nullable=True)
     category: Mapped[ProductCategory] = mapped_column(Enum(ProductCategory), nullable=False)
     unit: Mapped[ProductUnit] = mapped_column(Enum(ProductUnit), nullable=False, default=ProductUnit.BOTTLE)
     volume_ml: Mapped[int | None] = mapped_column(Integer, nullable=True)
@@ -0,0 +1,25 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import DateTime, Float, Integer, SmallInteger, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class ProductDiscrepancyStats(Base):
+    """
+    Running mean and variance (Welford: n, mean, m2) of a product's closing
+    discrepancies on one weekday (0 = Monday), folded in at each shift close.
+    """
+    __tablename__ = "product_discrepancy_stats"
+
+    product_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("products.id"), primary_key=True)
+    weekday: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False, index=True)
+    n: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    mean: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    m2: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ProductDiscrepancyStats {self.product_id}/{self.weekday} n:{self.n} mean:{self.mean}>"
@@ -1,6 +1,6 @@
 import uuid
-from datetime import datetime
-from sqlalchemy import DateTime, Numeric, ForeignKey
+from datetime import date, datetime
+from sqlalchemy import String, DateTime, Numeric, ForeignKey, Date, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -8,6 +8,15 @@ from app.database import Base
 
 class SalesRecord(Base):
     __tablename__ = "sales_records"
+    __table_args__ = (
+        Index("ix_sales_records_bar_business_date", "bar_id", "business_date"),
+        # Newest-first listings scan these backwards
+        Index("ix_sales_records_bar_created_at", "bar_id", "created_at"),
+        Index("ix_sales_records_product_created_at", "product_id", "created_at"),
+        Index("ix_sales_records_shift_product", "shift_id", "product_id"),
+        # Monthly partitions on created_at (see services.partitions)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
@@ -15,7 +24,13 @@ class SalesRecord(Base):
     shift_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("shifts.id"), nullable=False)
     quantity_sold: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     sale_amount: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Partition key, so part of the primary key
+    created_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
+    # The bar's local trading day (see services.business_date)
+    business_date: Mapped[date] = mapped_column(Date, nullable=False)
+    # Client retries carry the same key; uniqueness lives in idempotency_keys
+    # (see services.idempotency), as partitions cannot enforce it
+    idempotency_key: Mapped[str | None] = mapped_column(String(128), nullable=True)
 
     # Relationships
     product = relationship("Product")
@@ -1,7 +1,7 @@
 import uuid
 import enum
-from datetime import datetime
-from sqlalchemy import String, DateTime, Numeric, Enum, ForeignKey, Text
+from datetime import date, datetime
+from sqlalchemy import String, DateTime, Numeric, Enum, ForeignKey, Text, Date, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -15,6 +15,11 @@ class ShiftStatus(str, enum.Enum):
 
 class Shift(Base):
     __tablename__ = "shifts"
+    __table_args__ = (
+        Index("ix_shifts_bar_business_date", "bar_id", "business_date"),
+        Index("ix_shifts_bar_created_at", "bar_id", "created_at"),
+        Index("ix_shifts_open_staff", "bar_id", "staff_id", postgresql_where=text("status = 'OPEN'")),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
@@ -26,6 +31,8 @@ class Shift(Base):
     status: Mapped[ShiftStatus] = mapped_column(Enum(ShiftStatus), default=ShiftStatus.OPEN)
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # The bar's local trading day (see services.business_date)
+    business_date: Mapped[date] = mapped_column(Date, nullable=False)
 
     # Relationships
     bar = relationship("Bar", back_populates="shifts")
@@ -41,6 +48,9 @@ class Shift(Base):
 
 class ShiftStockCount(Base):
     __tablename__ = "shift_stock_counts"
+    __table_args__ = (
+        Index("ix_shift_stock_counts_shift_product", "shift_id", "product_id"),
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     shift_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("shifts.id"), nullable=False)
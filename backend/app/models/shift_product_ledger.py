@@ -0,0 +1,23 @@
+import uuid
+from datetime import datetime
+from sqlalchemy import DateTime, Numeric, Integer, ForeignKey
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class ShiftProductLedger(Base):
+    """Running per-shift, per-product totals, updated on every sale and stock IN."""
+    __tablename__ = "shift_product_ledger"
+
+    shift_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("shifts.id"), primary_key=True)
+    product_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("products.id"), primary_key=True)
+    bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
+    received: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    sold: Mapped[float] = mapped_column(Numeric(12, 2), nullable=False, default=0)
+    sales_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revenue: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ShiftProductLedger {self.shift_id}/{self.product_id} sold:{self.sold}>"
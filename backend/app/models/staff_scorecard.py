@@ -0,0 +1,35 @@
+import uuid
+from datetime import date, datetime
+from sqlalchemy import Date, DateTime, Float, Integer, Numeric, ForeignKey, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+
+
+class StaffDailyScorecard(Base):
+    """
+    One staff member's closed shifts on one day (the shift's business date,
+    the bar-local day it opened on, see Shift.business_date) with the losses
+    and sales attributed to them. Refreshed when a shift is reconciled and
+    when one of its loss reports is reviewed; windows are answered by
+    summing days.
+    """
+    __tablename__ = "staff_daily_scorecards"
+    __table_args__ = (
+        Index("ix_staff_daily_scorecards_bar_day", "bar_id", "day"),
+    )
+
+    staff_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
+    shifts_worked: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    hours_worked: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    loss_incidents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    reviewed_incidents: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    loss_value: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    sales_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sales_value: Mapped[float] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StaffDailyScorecard {self.staff_id}/{self.day} shifts:{self.shifts_worked} loss:{self.loss_value}>"
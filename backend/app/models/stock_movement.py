@@ -1,7 +1,7 @@
 import uuid
 import enum
-from datetime import datetime
-from sqlalchemy import String, DateTime, Numeric, Enum, ForeignKey, Text
+from datetime import date, datetime
+from sqlalchemy import String, DateTime, Numeric, Enum, ForeignKey, Text, Date, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.database import Base
@@ -24,6 +24,13 @@ class MovementReason(str, enum.Enum):
 
 class StockMovement(Base):
     __tablename__ = "stock_movements"
+    __table_args__ = (
+        Index("ix_stock_movements_bar_business_date", "bar_id", "business_date"),
+        Index("ix_stock_movements_bar_created_at", "bar_id", "created_at"),
+        Index("ix_stock_movements_product_created_at", "product_id", "created_at"),
+        # Monthly partitions on created_at (see services.partitions)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     bar_id: Mapped[uuid.UUID] = mapped_column(UUID(as_uuid=True), ForeignKey("bars.id"), nullable=False)
@@ -33,7 +40,13 @@ class StockMovement(Base):
     reason: Mapped[MovementReason] = mapped_column(Enum(MovementReason), nullable=False, default=MovementReason.OTHER)
     quantity: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # Partition key, so part of the primary key
+    created_at: Mapped[datetime] = mapped_column(DateTime, primary_key=True, default=datetime.utcnow)
+    # The bar's local trading day (see services.business_date)
+    business_date: Mapped[date] = mapped_column(Date, nullable=False)
+    # Client retries carry the same key; uniqueness lives in idempotency_keys
+    # (see services.idempotency), as partitions cannot enforce it
+    idempotency_key: Mapped[str | None] = mapped_column(String(128), nullable=True)
 
     # Relationships
     product = relationship("Product")
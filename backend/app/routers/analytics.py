@@ -0,0 +1,55 @@
+import uuid
+from datetime import date, timedelta
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.database import get_db
+from app.models import User, ProductCategory
+from app.schemas.analytics import TimeseriesResponse
+from app.middleware.auth import require_manager
+from app.services.business_date import business_today
+from app.services.cache import dashboard_cache
+from app.services.timeseries import (
+    TimeBucket, TimeseriesMetric, TimeseriesQuery, choose_source, compute_timeseries,
+)
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+@router.get("/timeseries", response_model=TimeseriesResponse)
+async def get_timeseries(
+    metric: TimeseriesMetric,
+    bucket: TimeBucket = TimeBucket.DAY,
+    date_from: Optional[date] = Query(None, description="First business day (default: 90 days before date_to)"),
+    date_to: Optional[date] = Query(None, description="Last business day, inclusive (default: today)"),
+    product_id: Optional[uuid.UUID] = None,
+    category: Optional[ProductCategory] = None,
+    staff_id: Optional[uuid.UUID] = Query(None, description="Filter by staff member UUID"),
+    max_points: int = Query(500, ge=3, le=5000, description="Downsample longer series to this many points"),
+    compare_previous_year: bool = False,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Metric totals per hour/day/week/month bucket, with empty buckets as
+    zeros, downsampled to max_points (Manager+ only). Cached per bar.
+    """
+    date_to = date_to or await business_today(db, current_user.bar_id)
+    date_from = date_from or date_to - timedelta(days=89)
+    if date_from > date_to:
+        raise HTTPException(status_code=400, detail="date_from must not be after date_to")
+
+    query = TimeseriesQuery(metric, bucket, date_from, date_to, product_id, category, staff_id)
+    try:
+        choose_source(query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    bar_id = current_user.bar_id
+    return await dashboard_cache.get_or_compute(
+        "timeseries",
+        bar_id,
+        lambda: compute_timeseries(db, bar_id, query, max_points, compare_previous_year),
+        variant=f"{query.cache_variant()}:{max_points}:{compare_previous_year}",
+    )
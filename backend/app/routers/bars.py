@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import User, Bar
+from app.schemas.bar import BarResponse, BarUpdate
+from app.middleware.auth import get_current_user, require_owner
+from app.services.business_date import invalidate_bar_clock
+from app.services.cache import mark_bar_dirty
+
+router = APIRouter(prefix="/bar", tags=["Bar"])
+
+
+async def _get_bar(db: AsyncSession, bar_id) -> Bar:
+    result = await db.execute(select(Bar).where(Bar.id == bar_id))
+    bar = result.scalar_one_or_none()
+    if not bar:
+        raise HTTPException(status_code=404, detail="Bar not found")
+    return bar
+
+
+@router.get("", response_model=BarResponse)
+async def get_bar(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Get the current user's bar."""
+    return BarResponse.model_validate(await _get_bar(db, current_user.bar_id))
+
+
+@router.patch("", response_model=BarResponse)
+async def update_bar(
+    data: BarUpdate,
+    current_user: User = Depends(require_owner),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Update the bar's details, time zone or business-day cutover (Owner only).
+    A new time zone or cutover applies to rows recorded from now on; rows
+    already recorded keep their business dates.
+    """
+    bar = await _get_bar(db, current_user.bar_id)
+    update_data = data.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(bar, field, value)
+
+    await db.flush()
+    await db.refresh(bar)
+    if {"timezone", "day_cutover_hour"} & update_data.keys():
+        invalidate_bar_clock(db, bar.id)
+        # Dashboards and series are cut by business date
+        mark_bar_dirty(db, bar.id)
+    return BarResponse.model_validate(bar)
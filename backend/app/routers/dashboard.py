@@ -1,115 +1,150 @@
-from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends
+import asyncio
+from datetime import timedelta
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_db, AsyncSessionLocal
 from app.models import (
     User, Product, Shift, ShiftStatus, LossReport,
-    LossSeverity, SalesRecord, DailyReconciliation,
+    LossSeverity, DailyReconciliation,
 )
 from app.middleware.auth import require_manager, require_role
 from app.models.user import UserRole
+from app.services.business_date import business_today
+from app.services.cache import dashboard_cache
+from app.services.scorecards import staff_scorecards, window_start
+from app.services.rollups import daily_facts
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
 
+async def _in_session(query):
+    """Run `query(session)` on its own pooled session so it can overlap with others."""
+    async with AsyncSessionLocal() as session:
+        return await query(session)
+
+
 @router.get("/manager")
 async def manager_dashboard(
     current_user: User = Depends(require_manager),
-    db: AsyncSession = Depends(get_db),
 ):
-    """Manager dashboard — aggregated daily summary."""
+    """Manager dashboard — aggregated daily summary, cached per bar."""
     bar_id = current_user.bar_id
-    today = datetime.utcnow().date()
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    month_ago = datetime.utcnow() - timedelta(days=30)
-
-    # Live stock levels
-    stock_result = await db.execute(
-        select(Product).where(
-            Product.bar_id == bar_id,
-            Product.is_active == True,
-        ).order_by(Product.current_stock)
+    return await dashboard_cache.get_or_compute(
+        "manager", bar_id, lambda: _compute_manager_dashboard(bar_id),
     )
-    all_products = stock_result.scalars().all()
 
-    low_stock = [
-        {"id": str(p.id), "name": p.name, "current_stock": float(p.current_stock),
-         "min_threshold": float(p.min_stock_threshold), "category": p.category.value}
-        for p in all_products if float(p.current_stock) <= float(p.min_stock_threshold)
-    ]
 
-    # Today's loss summary
-    today_losses = await db.execute(
-        select(LossReport).where(
-            LossReport.bar_id == bar_id,
-            func.date(LossReport.created_at) == today,
+async def _compute_manager_dashboard(bar_id) -> dict:
+    """
+    Every figure is a SQL aggregate or projection, and the independent
+    parts run concurrently on separate sessions, so latency tracks the
+    slowest query rather than the sum of them.
+    """
+    today = await _in_session(lambda session: business_today(session, bar_id))
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+
+    async def stock_summary(session):
+        # Total products & stock value
+        result = await session.execute(
+            select(
+                func.count(),
+                func.coalesce(func.sum(Product.current_stock * Product.cost_price), 0),
+            ).where(Product.bar_id == bar_id, Product.is_active == True)
         )
-    )
-    today_loss_reports = today_losses.scalars().all()
-    today_loss_value = sum(float(r.loss_value) for r in today_loss_reports)
-
-    # Unresolved alerts
-    unresolved_result = await db.execute(
-        select(func.count()).where(
-            LossReport.bar_id == bar_id,
-            LossReport.reason_code.is_(None),
+        return result.one()
+
+    async def low_stock(session):
+        result = await session.execute(
+            select(
+                Product.id, Product.name, Product.current_stock,
+                Product.min_stock_threshold, Product.category,
+            ).where(
+                Product.bar_id == bar_id,
+                Product.is_active == True,
+                Product.current_stock <= Product.min_stock_threshold,
+            ).order_by(Product.current_stock, Product.name)
         )
-    )
-    unresolved_count = unresolved_result.scalar() or 0
-
-    # Weekly loss trend
-    weekly_losses = await db.execute(
-        select(
-            func.date(LossReport.created_at).label("date"),
-            func.sum(LossReport.loss_value).label("total_loss"),
-            func.count().label("incidents"),
-        ).where(
-            LossReport.bar_id == bar_id,
-            LossReport.created_at >= week_ago,
-        ).group_by(func.date(LossReport.created_at))
-        .order_by(func.date(LossReport.created_at))
-    )
-    loss_trend = [
-        {"date": str(row.date), "total_loss": float(row.total_loss), "incidents": row.incidents}
-        for row in weekly_losses
-    ]
-
-    # Total products & stock value
-    total_products = len(all_products)
-    total_stock_value = sum(float(p.current_stock) * float(p.cost_price) for p in all_products)
-
-    # Active shift count
-    active_shifts_result = await db.execute(
-        select(func.count()).where(
-            Shift.bar_id == bar_id,
-            Shift.status == ShiftStatus.OPEN,
+        return result.all()
+
+    async def loss_totals(session):
+        # Today's loss summary and unresolved alerts in one pass
+        today_filter = LossReport.business_date == today
+        result = await session.execute(
+            select(
+                func.coalesce(func.sum(LossReport.loss_value).filter(today_filter), 0),
+                func.count().filter(today_filter),
+                func.count().filter(LossReport.reason_code.is_(None)),
+            ).where(LossReport.bar_id == bar_id)
         )
-    )
-    active_shifts = active_shifts_result.scalar() or 0
+        return result.one()
+
+    async def loss_trend(session):
+        # Weekly loss trend
+        facts = daily_facts(bar_id, week_ago, today)
+        result = await session.execute(
+            select(
+                facts.c.day.label("date"),
+                func.sum(facts.c.loss_value).label("total_loss"),
+                func.sum(facts.c.loss_incidents).label("incidents"),
+            )
+            .group_by(facts.c.day)
+            .having(func.sum(facts.c.loss_incidents) > 0)
+            .order_by(facts.c.day)
+        )
+        return result.all()
 
-    # Monthly total sales
-    monthly_sales = await db.execute(
-        select(func.coalesce(func.sum(SalesRecord.sale_amount), 0)).where(
-            SalesRecord.bar_id == bar_id,
-            SalesRecord.created_at >= month_ago,
+    async def active_shifts(session):
+        result = await session.execute(
+            select(func.count()).where(
+                Shift.bar_id == bar_id,
+                Shift.status == ShiftStatus.OPEN,
+            )
         )
+        return result.scalar() or 0
+
+    async def monthly_revenue(session):
+        facts = daily_facts(bar_id, month_ago, today)
+        result = await session.execute(select(func.coalesce(func.sum(facts.c.revenue), 0)))
+        return float(result.scalar() or 0)
+
+    (
+        (total_products, total_stock_value),
+        low_stock_rows,
+        (today_loss_value, today_loss_incidents, unresolved_count),
+        trend_rows,
+        active_shift_count,
+        revenue,
+    ) = await asyncio.gather(
+        _in_session(stock_summary),
+        _in_session(low_stock),
+        _in_session(loss_totals),
+        _in_session(loss_trend),
+        _in_session(active_shifts),
+        _in_session(monthly_revenue),
     )
-    monthly_revenue = float(monthly_sales.scalar() or 0)
 
     return {
         "summary": {
             "total_products": total_products,
-            "total_stock_value": round(total_stock_value, 2),
-            "active_shifts": active_shifts,
-            "monthly_revenue": round(monthly_revenue, 2),
-            "today_loss_value": round(today_loss_value, 2),
-            "today_loss_incidents": len(today_loss_reports),
+            "total_stock_value": round(float(total_stock_value), 2),
+            "active_shifts": active_shift_count,
+            "monthly_revenue": round(revenue, 2),
+            "today_loss_value": round(float(today_loss_value), 2),
+            "today_loss_incidents": today_loss_incidents,
             "unresolved_alerts": unresolved_count,
         },
-        "low_stock_alerts": low_stock,
-        "loss_trend": loss_trend,
+        "low_stock_alerts": [
+            {"id": str(row.id), "name": row.name, "current_stock": float(row.current_stock),
+             "min_threshold": float(row.min_stock_threshold), "category": row.category.value}
+            for row in low_stock_rows
+        ],
+        "loss_trend": [
+            {"date": str(row.date), "total_loss": float(row.total_loss), "incidents": int(row.incidents)}
+            for row in trend_rows
+        ],
     }
 
 
@@ -118,29 +153,57 @@ async def owner_dashboard(
     current_user: User = Depends(require_role(UserRole.OWNER)),
     db: AsyncSession = Depends(get_db),
 ):
-    """Owner dashboard — financial overview."""
+    """Owner dashboard — financial overview, cached per bar."""
     bar_id = current_user.bar_id
-    month_ago = datetime.utcnow() - timedelta(days=30)
-    prev_month_start = datetime.utcnow() - timedelta(days=60)
-
-    # Current month losses
-    current_losses = await db.execute(
-        select(func.coalesce(func.sum(LossReport.loss_value), 0)).where(
-            LossReport.bar_id == bar_id,
-            LossReport.created_at >= month_ago,
-        )
+    return await dashboard_cache.get_or_compute(
+        "owner", bar_id, lambda: _compute_owner_dashboard(db, bar_id),
     )
-    current_loss_total = float(current_losses.scalar() or 0)
-
-    # Previous month losses
-    prev_losses = await db.execute(
-        select(func.coalesce(func.sum(LossReport.loss_value), 0)).where(
-            LossReport.bar_id == bar_id,
-            LossReport.created_at >= prev_month_start,
-            LossReport.created_at < month_ago,
+
+
+@router.get("/staff")
+async def staff_dashboard(
+    days: int = Query(30, ge=1, le=366),
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """Staff scorecards over the last `days` days, highest loss value first (Manager+ only)."""
+    bar_id = current_user.bar_id
+    date_from = window_start(days, await business_today(db, bar_id))
+
+    async def compute():
+        return {
+            "days": days,
+            "date_from": str(date_from),
+            "staff": await staff_scorecards(db, bar_id, date_from),
+        }
+
+    return await dashboard_cache.get_or_compute("staff", bar_id, compute, variant=str(days))
+
+
+@router.get("/cache-stats")
+async def dashboard_cache_stats(
+    current_user: User = Depends(require_manager),
+):
+    """Dashboard cache hit/miss counters for this app process (Manager+ only)."""
+    return dashboard_cache.stats()
+
+
+async def _compute_owner_dashboard(db: AsyncSession, bar_id) -> dict:
+    today = await business_today(db, bar_id)
+    month_ago = today - timedelta(days=30)
+    prev_month_start = today - timedelta(days=60)
+
+    # Current and previous month losses and current month revenue, from the daily rollups
+    facts = daily_facts(bar_id, prev_month_start, today)
+    current_month = facts.c.day >= month_ago
+    totals_result = await db.execute(
+        select(
+            func.coalesce(func.sum(facts.c.loss_value).filter(current_month), 0),
+            func.coalesce(func.sum(facts.c.loss_value).filter(~current_month), 0),
+            func.coalesce(func.sum(facts.c.revenue).filter(current_month), 0),
         )
     )
-    prev_loss_total = float(prev_losses.scalar() or 0)
+    current_loss_total, prev_loss_total, current_revenue = map(float, totals_result.one())
 
     # Loss improvement %
     if prev_loss_total > 0:
@@ -148,50 +211,25 @@ async def owner_dashboard(
     else:
         loss_improvement = 0
 
-    # Revenue
-    current_revenue_result = await db.execute(
-        select(func.coalesce(func.sum(SalesRecord.sale_amount), 0)).where(
-            SalesRecord.bar_id == bar_id,
-            SalesRecord.created_at >= month_ago,
-        )
-    )
-    current_revenue = float(current_revenue_result.scalar() or 0)
-
     # Stock value
     stock_result = await db.execute(
-        select(Product).where(Product.bar_id == bar_id, Product.is_active == True)
-    )
-    all_products = stock_result.scalars().all()
-    stock_value = sum(float(p.current_stock) * float(p.cost_price) for p in all_products)
-
-    # Staff discrepancy rates
-    from app.models import User as UserModel
-    staff_result = await db.execute(
-        select(UserModel).where(UserModel.bar_id == bar_id)
-    )
-    staff = staff_result.scalars().all()
-
-    staff_performance = []
-    for s in staff:
-        staff_losses = await db.execute(
-            select(func.count(), func.coalesce(func.sum(LossReport.loss_value), 0)).where(
-                LossReport.bar_id == bar_id,
-                LossReport.shift_id.in_(
-                    select(Shift.id).where(Shift.staff_id == s.id)
-                ),
-                LossReport.created_at >= month_ago,
-            )
+        select(func.coalesce(func.sum(Product.current_stock * Product.cost_price), 0)).where(
+            Product.bar_id == bar_id, Product.is_active == True,
         )
-        row = staff_losses.one()
-        staff_performance.append({
-            "id": str(s.id),
-            "name": s.full_name,
-            "role": s.role.value,
-            "loss_incidents": row[0],
-            "total_loss_value": float(row[1]),
-        })
-
-    staff_performance.sort(key=lambda x: x["total_loss_value"], reverse=True)
+    )
+    stock_value = float(stock_result.scalar() or 0)
+
+    # Staff discrepancy rates, summed from the daily scorecards
+    staff_performance = [
+        {
+            "id": card["id"],
+            "name": card["name"],
+            "role": card["role"],
+            "loss_incidents": card["loss_incidents"],
+            "total_loss_value": card["loss_value"],
+        }
+        for card in await staff_scorecards(db, bar_id, window_start(30, today))
+    ]
 
     return {
         "financials": {
@@ -0,0 +1,152 @@
+import json
+import uuid
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import User, ImportJob, ImportStatus
+from app.schemas.import_job import ImportParserInfo, ImportJobResponse
+from app.middleware.auth import get_current_user
+from app.services.import_jobs import create_import, enqueue_import
+from app.services.import_parsers import IMPORT_PARSERS
+from app.services.job_queue import job_pool, run_job_inline
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+
+def _build_import_response(imp: ImportJob) -> ImportJobResponse:
+    """Progress of an import, with an ETA from the current run's throughput."""
+    eta = None
+    if imp.status == ImportStatus.RUNNING and imp.run_started_at and imp.bytes_done > imp.run_start_bytes:
+        elapsed = (datetime.utcnow() - imp.run_started_at).total_seconds()
+        rate = (imp.bytes_done - imp.run_start_bytes) / max(elapsed, 1e-6)
+        eta = round((imp.file_size - imp.bytes_done) / rate, 1)
+
+    return ImportJobResponse(
+        id=imp.id,
+        bar_id=imp.bar_id,
+        job_id=imp.job_id,
+        parser=imp.parser,
+        params=imp.params,
+        status=imp.status,
+        file_name=imp.file_name,
+        file_size=imp.file_size,
+        bytes_done=imp.bytes_done,
+        progress_pct=round(100 * imp.bytes_done / imp.file_size, 1) if imp.file_size else 100.0,
+        rows_done=imp.rows_done,
+        rows_failed=imp.rows_failed,
+        batches_committed=imp.batches_committed,
+        eta_seconds=eta,
+        has_error_report=imp.error_report_bytes > 0,
+        last_error=imp.last_error,
+        started_at=imp.started_at,
+        finished_at=imp.finished_at,
+        created_at=imp.created_at,
+    )
+
+
+async def _get_import(db: AsyncSession, import_id: uuid.UUID, bar_id) -> ImportJob:
+    result = await db.execute(
+        select(ImportJob).where(ImportJob.id == import_id, ImportJob.bar_id == bar_id)
+    )
+    imp = result.scalar_one_or_none()
+    if not imp:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return imp
+
+
+@router.get("/parsers", response_model=list[ImportParserInfo])
+async def list_import_parsers(current_user: User = Depends(get_current_user)):
+    """File formats the import jobs understand."""
+    return [ImportParserInfo(name=name, description=parser.description) for name, parser in IMPORT_PARSERS.items()]
+
+
+@router.post("", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_import(
+    file: UploadFile = File(...),
+    parser: str = Form("sales_csv", description="Registered parser name, see GET /imports/parsers"),
+    params: str = Form("{}", description="JSON object of parser options, e.g. {\"shift_id\": ...}"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload a file for background import. Poll GET /imports/{id} for progress;
+    rows that fail are collected in a downloadable error report.
+    """
+    try:
+        options = json.loads(params)
+        if not isinstance(options, dict):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="params must be a JSON object")
+
+    try:
+        imp, job = await create_import(db, current_user.bar_id, current_user.id, parser, options, file)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not job_pool.running:
+        await run_job_inline(db, job)
+    return _build_import_response(imp)
+
+
+@router.get("", response_model=list[ImportJobResponse])
+async def list_imports(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """The bar's most recent imports."""
+    result = await db.execute(
+        select(ImportJob)
+        .where(ImportJob.bar_id == current_user.bar_id)
+        .order_by(ImportJob.created_at.desc())
+        .limit(limit)
+    )
+    return [_build_import_response(imp) for imp in result.scalars().all()]
+
+
+@router.get("/{import_id}", response_model=ImportJobResponse)
+async def get_import(
+    import_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Progress of an import: rows done and failed, percent of the file and ETA."""
+    return _build_import_response(await _get_import(db, import_id, current_user.bar_id))
+
+
+@router.get("/{import_id}/errors")
+async def download_import_errors(
+    import_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """CSV of the rows that failed (row number, error)."""
+    imp = await _get_import(db, import_id, current_user.bar_id)
+    if not imp.error_report_path or imp.error_report_bytes == 0:
+        raise HTTPException(status_code=404, detail="No errors reported for this import")
+    stem = imp.file_name.rsplit(".", 1)[0] or "import"
+    return FileResponse(imp.error_report_path, media_type="text/csv", filename=f"{stem}-errors.csv")
+
+
+@router.post("/{import_id}/resume", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def resume_import(
+    import_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Queue a failed import again; it continues after its last committed batch."""
+    imp = await _get_import(db, import_id, current_user.bar_id)
+    if imp.status != ImportStatus.FAILED:
+        raise HTTPException(status_code=400, detail="Only failed imports can be resumed")
+
+    job = await enqueue_import(db, imp)
+    if not job_pool.running:
+        await run_job_inline(db, job)
+    return _build_import_response(imp)
@@ -1,6 +1,6 @@
 import uuid
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
@@ -11,6 +11,10 @@ from app.schemas.loss_report import (
     LossReportResponse, LossReportUpdate, LossReportListResponse, LossSummary,
 )
 from app.middleware.auth import require_manager
+from app.services.business_date import business_today
+from app.services.pagination import CountMode, paginate
+from app.services.scorecards import refresh_shift_scorecards
+from app.services.rollups import daily_facts, roll_up_review
 
 router = APIRouter(prefix="/loss-reports", tags=["Loss Reports"])
 
@@ -20,8 +24,10 @@ async def list_loss_reports(
     severity: Optional[LossSeverity] = None,
     reason_code: Optional[ReasonCode] = None,
     unresolved_only: bool = False,
-    page: int = 1,
-    limit: int = 50,
+    page: int = Query(1, ge=1, description="Offset page, used when no cursor is given"),
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: CountMode = Query(CountMode.ESTIMATE, description="How total is computed"),
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db),
 ):
@@ -34,17 +40,20 @@ async def list_loss_reports(
     if unresolved_only:
         query = query.where(LossReport.reason_code.is_(None))
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
-    query = query.order_by(LossReport.created_at.desc()).offset((page - 1) * limit).limit(limit)
-    result = await db.execute(query)
-    reports = result.scalars().all()
+    try:
+        result = await paginate(
+            db, query, (LossReport.created_at, LossReport.id),
+            kind="loss-reports", bar_id=current_user.bar_id,
+            limit=limit, page=page, cursor=cursor, count=count,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return LossReportListResponse(
-        reports=[LossReportResponse.model_validate(r) for r in reports],
-        total=total,
+        reports=[LossReportResponse.model_validate(r) for r in result.rows],
+        total=result.total,
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
     )
 
 
@@ -66,12 +75,15 @@ async def update_loss_report(
     if not report:
         raise HTTPException(status_code=404, detail="Loss report not found")
 
+    was_unresolved = report.reason_code is None
     report.reason_code = data.reason_code
     report.notes = data.notes
     report.reviewed_by = current_user.id
     report.reviewed_at = datetime.utcnow()
 
     await db.flush()
+    await refresh_shift_scorecards(db, current_user.bar_id, [report.shift_id])
+    await roll_up_review(db, report, was_unresolved)
     await db.refresh(report)
     return LossReportResponse.model_validate(report)
 
@@ -82,47 +94,56 @@ async def get_loss_summary(
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get loss summary for the last N days."""
+    """Get loss summary for the last N days, read from the daily rollups."""
     from datetime import timedelta
-    cutoff = datetime.utcnow() - timedelta(days=days)
-
-    base_query = select(LossReport).where(
-        LossReport.bar_id == current_user.bar_id,
-        LossReport.created_at >= cutoff,
+    today = await business_today(db, current_user.bar_id)
+    facts = daily_facts(current_user.bar_id, today - timedelta(days=days), today)
+
+    totals_result = await db.execute(
+        select(
+            func.coalesce(func.sum(facts.c.loss_value), 0),
+            func.coalesce(func.sum(facts.c.loss_incidents), 0),
+            func.coalesce(func.sum(facts.c.critical_incidents), 0),
+            func.coalesce(func.sum(facts.c.warning_incidents), 0),
+            func.coalesce(func.sum(facts.c.info_incidents), 0),
+            func.coalesce(func.sum(facts.c.unresolved_incidents), 0),
+        )
     )
-
-    result = await db.execute(base_query)
-    reports = result.scalars().all()
-
-    total_loss = sum(float(r.loss_value) for r in reports)
-    critical = sum(1 for r in reports if r.severity == LossSeverity.CRITICAL)
-    warning = sum(1 for r in reports if r.severity == LossSeverity.WARNING)
-    info = sum(1 for r in reports if r.severity == LossSeverity.INFO)
-    unresolved = sum(1 for r in reports if r.reason_code is None)
+    total_loss, incidents, critical, warning, info, unresolved = totals_result.one()
 
     # Top loss products
-    product_losses: dict = {}
-    for r in reports:
-        pid = str(r.product_id)
-        if pid not in product_losses:
-            product_losses[pid] = {"product_id": pid, "total_loss": 0, "incidents": 0}
-        product_losses[pid]["total_loss"] += float(r.loss_value)
-        product_losses[pid]["incidents"] += 1
-
-    top_products = sorted(product_losses.values(), key=lambda x: x["total_loss"], reverse=True)[:5]
-
-    # Enrich with product names
-    for tp in top_products:
-        prod_result = await db.execute(select(Product).where(Product.id == uuid.UUID(tp["product_id"])))
-        prod = prod_result.scalar_one_or_none()
-        tp["product_name"] = prod.name if prod else "Unknown"
+    product_totals = (
+        select(
+            facts.c.product_id,
+            func.sum(facts.c.loss_value).label("total_loss"),
+            func.sum(facts.c.loss_incidents).label("incidents"),
+        )
+        .group_by(facts.c.product_id)
+        .having(func.sum(facts.c.loss_incidents) > 0)
+        .subquery()
+    )
+    top_result = await db.execute(
+        select(product_totals, func.coalesce(Product.name, "Unknown"))
+        .outerjoin(Product, Product.id == product_totals.c.product_id)
+        .order_by(product_totals.c.total_loss.desc())
+        .limit(5)
+    )
+    top_products = [
+        {
+            "product_id": str(product_id),
+            "total_loss": float(total),
+            "incidents": int(count),
+            "product_name": name,
+        }
+        for product_id, total, count, name in top_result.all()
+    ]
 
     return LossSummary(
-        total_loss_value=total_loss,
-        total_incidents=len(reports),
-        critical_count=critical,
-        warning_count=warning,
-        info_count=info,
-        unresolved_count=unresolved,
+        total_loss_value=float(total_loss),
+        total_incidents=int(incidents),
+        critical_count=int(critical),
+        warning_count=int(warning),
+        info_count=int(info),
+        unresolved_count=int(unresolved),
         top_loss_products=top_products,
     )
@@ -0,0 +1,161 @@
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import User, LossRule, LossReport, Shift
+from app.schemas.loss_rule import (
+    LossRuleCreate, LossRuleUpdate, LossRuleResponse,
+    LossRulePreviewRequest, LossRulePreviewResponse, LossRulePreviewRow,
+)
+from app.middleware.auth import require_manager
+from app.services.loss_rules import LossRuleSet, get_loss_rules, invalidate_loss_rules
+from app.services.reconciliation_engine import preview_reconciliation
+
+router = APIRouter(prefix="/loss-rules", tags=["Loss Rules"])
+
+
+@router.get("", response_model=list[LossRuleResponse])
+async def list_loss_rules(
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """List the bar's loss severity rules (Manager+ only)."""
+    result = await db.execute(
+        select(LossRule)
+        .where(LossRule.bar_id == current_user.bar_id)
+        .order_by(LossRule.priority.desc(), LossRule.created_at)
+    )
+    return [LossRuleResponse.model_validate(r) for r in result.scalars().all()]
+
+
+@router.post("", response_model=LossRuleResponse, status_code=status.HTTP_201_CREATED)
+async def create_loss_rule(
+    data: LossRuleCreate,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create a loss severity rule (Manager+ only). Applies to the next reconciliation."""
+    rule = LossRule(bar_id=current_user.bar_id, **data.model_dump())
+    db.add(rule)
+    await db.flush()
+    await db.refresh(rule)
+    invalidate_loss_rules(db, current_user.bar_id)
+
+    return LossRuleResponse.model_validate(rule)
+
+
+@router.patch("/{rule_id}", response_model=LossRuleResponse)
+async def update_loss_rule(
+    rule_id: uuid.UUID,
+    data: LossRuleUpdate,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """Update a loss severity rule (Manager+ only)."""
+    result = await db.execute(
+        select(LossRule).where(
+            LossRule.id == rule_id,
+            LossRule.bar_id == current_user.bar_id,
+        )
+    )
+    rule = result.scalar_one_or_none()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Loss rule not found")
+
+    update_data = data.model_dump(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(rule, field, value)
+
+    if float(rule.critical_multiplier) < float(rule.warning_multiplier):
+        raise HTTPException(status_code=400, detail="critical_multiplier must be at least warning_multiplier")
+    if (
+        rule.warning_value is not None
+        and rule.critical_value is not None
+        and float(rule.critical_value) < float(rule.warning_value)
+    ):
+        raise HTTPException(status_code=400, detail="critical_value must be at least warning_value")
+
+    await db.flush()
+    await db.refresh(rule)
+    invalidate_loss_rules(db, current_user.bar_id)
+
+    return LossRuleResponse.model_validate(rule)
+
+
+@router.delete("/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_loss_rule(
+    rule_id: uuid.UUID,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete a loss severity rule (Manager+ only)."""
+    result = await db.execute(
+        select(LossRule).where(
+            LossRule.id == rule_id,
+            LossRule.bar_id == current_user.bar_id,
+        )
+    )
+    rule = result.scalar_one_or_none()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Loss rule not found")
+
+    await db.delete(rule)
+    await db.flush()
+    invalidate_loss_rules(db, current_user.bar_id)
+
+
+@router.post("/preview", response_model=LossRulePreviewResponse)
+async def preview_loss_rules(
+    data: LossRulePreviewRequest,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Evaluate the bar's rules, or a draft rule set, against a past shift's
+    counts and compare with the loss reports it actually produced. Nothing
+    is written.
+    """
+    result = await db.execute(
+        select(Shift).where(
+            Shift.id == data.shift_id,
+            Shift.bar_id == current_user.bar_id,
+        )
+    )
+    shift = result.scalar_one_or_none()
+    if not shift:
+        raise HTTPException(status_code=404, detail="Shift not found")
+
+    if data.rules is None:
+        rule_set = await get_loss_rules(db, current_user.bar_id)
+    else:
+        rule_set = LossRuleSet(rule for rule in data.rules if rule.is_active)
+
+    weekday = shift.business_date.weekday()
+    rows = await preview_reconciliation(db, data.shift_id, weekday, rule_set)
+
+    current_result = await db.execute(
+        select(LossReport.product_id, LossReport.severity).where(
+            LossReport.shift_id == data.shift_id,
+            LossReport.created_at >= shift.start_time,
+        )
+    )
+    current = dict(current_result.all())
+
+    by_severity: dict[str, int] = {}
+    preview_rows = []
+    for row in rows:
+        if row["severity"] is not None:
+            by_severity[row["severity"].value] = by_severity.get(row["severity"].value, 0) + 1
+        preview_rows.append(LossRulePreviewRow(**row, current_severity=current.get(row["product_id"])))
+
+    return LossRulePreviewResponse(
+        shift_id=data.shift_id,
+        rules_applied=len(rule_set),
+        products=len(preview_rows),
+        by_severity=by_severity,
+        total_loss_value=round(sum(r.loss_value for r in preview_rows), 2),
+        changed=sum(1 for r in preview_rows if r.severity != r.current_severity),
+        rows=preview_rows,
+    )
@@ -1,29 +1,63 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from app.database import get_db
 from app.models import User, Product, ProductCategory, ProductUnit
-from app.schemas.product import ProductCreate, ProductUpdate, ProductResponse, ProductListResponse
+from app.schemas.product import (
+    ProductCreate, ProductUpdate, ProductResponse, ProductListResponse, ProductSearchHit, ProductSearchResponse,
+    ProductScanRequest, ProductScanMatch, ProductScanResponse,
+)
 from app.middleware.auth import get_current_user, require_manager
+from app.services.pagination import CountMode, paginate
+from app.services.product_codes import find_code_conflict, normalize_code, resolve_codes
+from app.services.product_search import invalidate_product_index, name_contains, search_products
 from app.utils.file_upload import save_upload_file, delete_upload_file
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
 
+async def _check_codes_free(db: AsyncSession, bar_id, values: dict, exclude_id=None):
+    for field, label in (("barcode", "Barcode"), ("sku", "SKU")):
+        value = values.get(field)
+        if value is None:
+            continue
+        other = await find_code_conflict(db, bar_id, field, value, exclude_id)
+        if other:
+            raise HTTPException(
+                status_code=400, detail=f"{label} '{value}' is already assigned to '{other.name}'",
+            )
+
+
 @router.get("", response_model=ProductListResponse)
 async def list_products(
     category: Optional[ProductCategory] = None,
     search: Optional[str] = None,
     active_only: bool = True,
-    page: int = 1,
-    limit: int = 50,
+    page: int = Query(1, ge=1, description="Offset page, used when no cursor is given"),
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: CountMode = Query(CountMode.ESTIMATE, description="How total is computed"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """List all products for the bar with optional filters."""
+    """
+    List all products for the bar with optional filters. With `search`,
+    active products come back as one page ranked by relevance with typos
+    tolerated, as from GET /products/search; with active_only=false, search
+    is a literal substring match on the name, paginated in name order.
+    """
+    if search and active_only:
+        if cursor is not None or page > 1:
+            raise HTTPException(status_code=400, detail="Search results are a single ranked page; raise limit instead")
+        _, ranked = await search_products(db, current_user.bar_id, search, limit, category)
+        return ProductListResponse(
+            products=[ProductResponse.model_validate(p) for p, _ in ranked],
+            total=len(ranked),
+        )
+
     query = select(Product).where(Product.bar_id == current_user.bar_id)
 
     if active_only:
@@ -31,21 +65,60 @@ async def list_products(
     if category:
         query = query.where(Product.category == category)
     if search:
-        query = query.where(Product.name.ilike(f"%{search}%"))
-
-    # Count total
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
+        query = query.where(name_contains(search))
 
-    # Paginate
-    query = query.order_by(Product.name).offset((page - 1) * limit).limit(limit)
-    result = await db.execute(query)
-    products = result.scalars().all()
+    try:
+        result = await paginate(
+            db, query, (Product.name, Product.id),
+            kind="products", bar_id=current_user.bar_id,
+            limit=limit, page=page, cursor=cursor, count=count,
+            descending=False,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return ProductListResponse(
-        products=[ProductResponse.model_validate(p) for p in products],
-        total=total,
+        products=[ProductResponse.model_validate(p) for p in result.rows],
+        total=result.total,
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
+    )
+
+
+@router.get("/search", response_model=ProductSearchResponse)
+async def search_product_names(
+    q: str = Query(..., min_length=1, description="Name or part of it; typos are tolerated"),
+    category: Optional[ProductCategory] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Ranked type-ahead search over the bar's active products."""
+    source, ranked = await search_products(db, current_user.bar_id, q, limit, category)
+    return ProductSearchResponse(
+        hits=[
+            ProductSearchHit(**ProductResponse.model_validate(p).model_dump(), score=score)
+            for p, score in ranked
+        ],
+        source=source,
+    )
+
+
+@router.post("/scan", response_model=ProductScanResponse)
+async def scan_products(
+    data: ProductScanRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Resolve a batch of scanned barcodes or SKUs to the bar's products in one lookup."""
+    codes = list(dict.fromkeys(code for code in map(normalize_code, data.codes) if code))
+    products = await resolve_codes(db, current_user.bar_id, codes)
+    return ProductScanResponse(
+        matches=[
+            ProductScanMatch(code=code, product=ProductResponse.model_validate(products[code]))
+            for code in codes if code in products
+        ],
+        unknown=[code for code in codes if code not in products],
     )
 
 
@@ -56,9 +129,13 @@ async def create_product(
     db: AsyncSession = Depends(get_db),
 ):
     """Create a new product (Manager+ only)."""
+    await _check_codes_free(db, current_user.bar_id, {"barcode": data.barcode, "sku": data.sku})
+
     product = Product(
         bar_id=current_user.bar_id,
         name=data.name,
+        barcode=data.barcode,
+        sku=data.sku,
         category=data.category,
         unit=data.unit,
         volume_ml=data.volume_ml,
@@ -71,6 +148,7 @@ async def create_product(
     db.add(product)
     await db.flush()
     await db.refresh(product)
+    invalidate_product_index(db, current_user.bar_id)
 
     return ProductResponse.model_validate(product)
 
@@ -113,11 +191,14 @@ async def update_product(
         raise HTTPException(status_code=404, detail="Product not found")
 
     update_data = data.model_dump(exclude_unset=True)
+    await _check_codes_free(db, current_user.bar_id, update_data, exclude_id=product.id)
     for field, value in update_data.items():
         setattr(product, field, value)
 
     await db.flush()
     await db.refresh(product)
+    if {"name", "category", "is_active"} & update_data.keys():
+        invalidate_product_index(db, current_user.bar_id)
     return ProductResponse.model_validate(product)
 
 
@@ -140,6 +221,7 @@ async def delete_product(
 
     product.is_active = False
     await db.flush()
+    invalidate_product_index(db, current_user.bar_id)
 
 
 @router.post("/{product_id}/image", response_model=ProductResponse)
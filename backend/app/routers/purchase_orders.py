@@ -14,6 +14,8 @@ from app.schemas.purchase_order import (
     PurchaseOrderCreate, PurchaseOrderUpdate, PurchaseOrderResponse,
 )
 from app.middleware.auth import require_manager
+from app.services.ledger import record_received
+from app.services.business_date import business_today
 
 router = APIRouter(prefix="/purchase-orders", tags=["Purchase Orders"])
 
@@ -107,6 +109,7 @@ async def receive_purchase_order(
     po.received_at = datetime.utcnow()
 
     # Create stock movements and update product stock for each item
+    business_date = await business_today(db, current_user.bar_id)
     for item in po.items:
         # Create stock IN movement
         movement = StockMovement(
@@ -117,6 +120,7 @@ async def receive_purchase_order(
             reason=MovementReason.DELIVERY,
             quantity=float(item.quantity),
             notes=f"PO #{str(po.id)[:8]} received",
+            business_date=business_date,
         )
         db.add(movement)
 
@@ -128,6 +132,7 @@ async def receive_purchase_order(
         if product:
             product.current_stock = float(product.current_stock or 0) + float(item.quantity)
 
+    await record_received(db, current_user.bar_id, [(item.product_id, item.quantity) for item in po.items])
     await db.flush()
     await db.refresh(po)
     return PurchaseOrderResponse.model_validate(po)
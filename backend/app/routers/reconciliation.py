@@ -1,14 +1,21 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import date
 
 from app.database import get_db
-from app.models import User, DailyReconciliation
-from app.schemas.reconciliation import ReconciliationResponse, ReconciliationListResponse
+from app.models import User, DailyReconciliation, Shift, ShiftStatus
+from app.schemas.reconciliation import (
+    ReconciliationResponse, ReconciliationListResponse, ReplayRequest, ReReconcileSummary,
+)
+from app.schemas.job import JobResponse
 from app.middleware.auth import require_manager
+from app.services.job_queue import enqueue_job, job_pool, run_job_inline
+from app.services.reconciliation_replay import REPLAY_RECONCILIATION_JOB
+from app.services.reconciliation_engine import rereconcile_shift
+from app.services.pagination import CountMode, paginate
 
 router = APIRouter(prefix="/reconciliation", tags=["Reconciliation"])
 
@@ -19,8 +26,10 @@ async def list_reconciliations(
     product_id: Optional[uuid.UUID] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
-    page: int = 1,
-    limit: int = 50,
+    page: int = Query(1, ge=1, description="Offset page, used when no cursor is given"),
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: CountMode = Query(CountMode.ESTIMATE, description="How total is computed"),
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db),
 ):
@@ -37,15 +46,70 @@ async def list_reconciliations(
     if date_to:
         query = query.where(DailyReconciliation.date <= date_to)
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
-    query = query.order_by(DailyReconciliation.date.desc()).offset((page - 1) * limit).limit(limit)
-    result = await db.execute(query)
-    records = result.scalars().all()
+    try:
+        result = await paginate(
+            db, query, (DailyReconciliation.date, DailyReconciliation.id),
+            kind="reconciliations", bar_id=current_user.bar_id,
+            limit=limit, page=page, cursor=cursor, count=count,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return ReconciliationListResponse(
-        reconciliations=[ReconciliationResponse.model_validate(r) for r in records],
-        total=total,
+        reconciliations=[ReconciliationResponse.model_validate(r) for r in result.rows],
+        total=result.total,
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
+    )
+
+
+@router.post("/replay", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def replay_reconciliations(
+    data: ReplayRequest,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Recompute reconciliation and loss reports for the bar's closed shifts in a
+    date range (Manager+ only). Runs as a background job; existing loss report
+    reviews are kept.
+    """
+    if data.date_from > data.date_to:
+        raise HTTPException(status_code=400, detail="date_from must be on or before date_to")
+
+    job = await enqueue_job(
+        db,
+        REPLAY_RECONCILIATION_JOB,
+        {"date_from": data.date_from.isoformat(), "date_to": data.date_to.isoformat()},
+        bar_id=current_user.bar_id,
     )
+    if not job_pool.running:
+        await run_job_inline(db, job)
+    return JobResponse.model_validate(job)
+
+
+@router.post("/shifts/{shift_id}/rereconcile", response_model=ReReconcileSummary)
+async def rereconcile(
+    shift_id: uuid.UUID,
+    current_user: User = Depends(require_manager),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Re-run reconciliation for a closed shift after a correction (Manager+ only).
+    Safe to repeat: only products whose inputs changed are rewritten, and loss
+    report reviews are kept.
+    """
+    result = await db.execute(
+        select(Shift).where(
+            Shift.id == shift_id,
+            Shift.bar_id == current_user.bar_id,
+        )
+    )
+    shift = result.scalar_one_or_none()
+    if not shift:
+        raise HTTPException(status_code=404, detail="Shift not found")
+    if shift.status != ShiftStatus.CLOSED:
+        raise HTTPException(status_code=400, detail="Shift is still open")
+
+    summary = await rereconcile_shift(db, current_user.bar_id, shift.id, shift.business_date)
+    return ReReconcileSummary(**summary)
@@ -1,17 +1,21 @@
 import uuid
-import csv
-import io
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, UploadFile, File, Query
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from app.database import get_db
-from app.models import User, SalesRecord, Product, Shift
+from app.models import User, SalesRecord, Shift
 from app.schemas.sales_record import (
     SalesRecordCreate, SalesRecordBulkCreate, SalesRecordResponse, SalesRecordListResponse,
 )
 from app.middleware.auth import get_current_user
+from app.services.idempotency import unseen_rows
+from app.services.sales_writer import SALES_TABLE, check_sales_refs, write_sales
+from app.services.sales_stream import stream_sales
+from app.utils.streaming import DuplexStreamingResponse
+from app.services.pagination import CountMode, paginate
+from app.services import sales_import
 
 router = APIRouter(prefix="/sales", tags=["Sales Records"])
 
@@ -20,8 +24,10 @@ router = APIRouter(prefix="/sales", tags=["Sales Records"])
 async def list_sales(
     shift_id: Optional[uuid.UUID] = None,
     product_id: Optional[uuid.UUID] = None,
-    page: int = 1,
-    limit: int = 50,
+    page: int = Query(1, ge=1, description="Offset page, used when no cursor is given"),
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: CountMode = Query(CountMode.ESTIMATE, description="How total is computed"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
@@ -31,37 +37,43 @@ async def list_sales(
     if product_id:
         query = query.where(SalesRecord.product_id == product_id)
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
-    query = query.order_by(SalesRecord.created_at.desc()).offset((page - 1) * limit).limit(limit)
-    result = await db.execute(query)
-    records = result.scalars().all()
+    try:
+        result = await paginate(
+            db, query, (SalesRecord.created_at, SalesRecord.id),
+            kind="sales", bar_id=current_user.bar_id,
+            limit=limit, page=page, cursor=cursor, count=count,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return SalesRecordListResponse(
-        records=[SalesRecordResponse.model_validate(r) for r in records],
-        total=total,
+        records=[SalesRecordResponse.model_validate(r) for r in result.rows],
+        total=result.total,
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
     )
 
 
 @router.post("", response_model=SalesRecordResponse, status_code=status.HTTP_201_CREATED)
 async def create_sales_record(
     data: SalesRecordCreate,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Create a single sales record."""
-    record = SalesRecord(
-        bar_id=current_user.bar_id,
-        product_id=data.product_id,
-        shift_id=data.shift_id,
-        quantity_sold=data.quantity_sold,
-        sale_amount=data.sale_amount,
-    )
-    db.add(record)
-    await db.flush()
-    await db.refresh(record)
+    """
+    Create a single sales record. Retrying with the same idempotency_key
+    returns the stored record (200, replayed=true) instead of a duplicate.
+    """
+    rows = [data.model_dump()]
+    try:
+        await check_sales_refs(db, current_user.bar_id, unseen_rows(SALES_TABLE, current_user.bar_id, rows))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    [record] = await write_sales(db, current_user.bar_id, rows)
+    if record["replayed"]:
+        response.status_code = status.HTTP_200_OK
     return SalesRecordResponse.model_validate(record)
 
 
@@ -71,24 +83,37 @@ async def create_bulk_sales(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Create multiple sales records at once."""
-    records = []
-    for item in data.records:
-        record = SalesRecord(
-            bar_id=current_user.bar_id,
-            product_id=item.product_id,
-            shift_id=item.shift_id,
-            quantity_sold=item.quantity_sold,
-            sale_amount=item.sale_amount,
-        )
-        db.add(record)
-        records.append(record)
+    """
+    Create multiple sales records at once. Every product and shift must
+    belong to the caller's bar; otherwise nothing is written. Records whose
+    idempotency_key is already stored come back as stored, with
+    replayed=true; the others are new.
+    """
+    rows = [item.model_dump() for item in data.records]
+    try:
+        await check_sales_refs(db, current_user.bar_id, unseen_rows(SALES_TABLE, current_user.bar_id, rows))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    records = await write_sales(db, current_user.bar_id, rows)
+    return [SalesRecordResponse.model_validate(r) for r in records]
 
-    await db.flush()
-    for r in records:
-        await db.refresh(r)
 
-    return [SalesRecordResponse.model_validate(r) for r in records]
+@router.post("/stream", response_class=DuplexStreamingResponse)
+async def stream_sales_ndjson(request: Request, current_user: User = Depends(get_current_user)):
+    """
+    Long-lived POS ingestion: send one sale object per line (NDJSON) and
+    read acknowledgements back as NDJSON while sending. Each ack covers one
+    committed batch: {"seq", "batch", "through", "accepted", "replayed",
+    "rejected": [{"line", "error"}]}, where `through` is the last line it covers. A
+    final {"done": true, ...} line closes the response. Lines not yet
+    acknowledged when a connection drops should be sent again.
+    """
+    return DuplexStreamingResponse(
+        stream_sales(current_user.bar_id, request.stream()),
+        status_code=status.HTTP_200_OK,
+        media_type="application/x-ndjson",
+    )
 
 
 @router.post("/import-csv", status_code=status.HTTP_201_CREATED)
@@ -98,43 +123,17 @@ async def import_sales_csv(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Import sales from CSV. Expected columns: product_name, quantity_sold, sale_amount"""
-    content = await file.read()
-    decoded = content.decode("utf-8")
-    reader = csv.DictReader(io.StringIO(decoded))
-
-    created = 0
-    errors = []
-
-    for row_num, row in enumerate(reader, start=2):
-        try:
-            product_name = row.get("product_name", "").strip()
-            qty = float(row.get("quantity_sold", 0))
-            amount = float(row.get("sale_amount", 0))
-
-            # Find product by name
-            result = await db.execute(
-                select(Product).where(
-                    Product.bar_id == current_user.bar_id,
-                    Product.name.ilike(product_name),
-                )
-            )
-            product = result.scalar_one_or_none()
-            if not product:
-                errors.append(f"Row {row_num}: Product '{product_name}' not found")
-                continue
-
-            record = SalesRecord(
-                bar_id=current_user.bar_id,
-                product_id=product.id,
-                shift_id=shift_id,
-                quantity_sold=qty,
-                sale_amount=amount,
-            )
-            db.add(record)
-            created += 1
-        except Exception as e:
-            errors.append(f"Row {row_num}: {str(e)}")
-
-    await db.flush()
-    return {"created": created, "errors": errors}
+    """
+    Import sales from CSV. Expected columns: product_name, quantity_sold, sale_amount.
+    Rows that fail are reported in `errors` (capped, see `error_count`) and skipped.
+    """
+    shift = await db.execute(
+        select(Shift.id).where(Shift.id == shift_id, Shift.bar_id == current_user.bar_id)
+    )
+    if shift.scalar_one_or_none() is None:
+        raise HTTPException(status_code=404, detail="Shift not found")
+
+    try:
+        return await sales_import.import_sales_csv(db, current_user.bar_id, shift_id, file)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -7,14 +7,17 @@ from sqlalchemy.orm import selectinload
 from typing import Optional
 
 from app.database import get_db
-from app.models import User, Shift, ShiftStockCount, ShiftStatus, Product
-from app.models.sales_record import SalesRecord
+from app.models import User, Shift, ShiftStockCount, ShiftStatus, Product, ShiftProductLedger
 from app.schemas.shift import (
-    ShiftOpenRequest, ShiftCloseRequest, ShiftResponse, ShiftListResponse,
+    StockCountEntry, ShiftOpenRequest, ShiftCloseRequest, ShiftResponse, ShiftListResponse,
     DailyShiftEntry, DailyShiftsResponse,
 )
 from app.middleware.auth import get_current_user, require_manager
-from app.services.reconciliation_engine import run_reconciliation
+from app.services.reconciliation_engine import RECONCILE_SHIFT_JOB
+from app.services.job_queue import enqueue_job, job_pool, run_job_inline
+from app.services.business_date import business_today
+from app.services.pagination import CountMode, paginate
+from app.services.product_codes import normalize_code, resolve_codes
 
 router = APIRouter(prefix="/shifts", tags=["Shifts"])
 
@@ -63,26 +66,26 @@ SHIFT_LOAD_OPTIONS = [
 
 @router.get("/daily", response_model=DailyShiftsResponse)
 async def get_daily_shifts(
-    date_str: Optional[str] = Query(None, alias="date", description="Date in YYYY-MM-DD format (default: today)"),
+    date_str: Optional[str] = Query(None, alias="date", description="Business date in YYYY-MM-DD format (default: today)"),
     staff_id: Optional[uuid.UUID] = Query(None, description="Filter by staff member UUID"),
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db),
 ):
-    """Get all shifts for a specific date with duration & audit info. Manager+ only."""
+    """
+    Get all shifts opened on a business date (the bar's local trading day)
+    with duration & audit info. Manager+ only.
+    """
     try:
-        target_date = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else datetime.utcnow().date()
+        target_date = datetime.strptime(date_str, "%Y-%m-%d").date() if date_str else None
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD.")
-
-    day_start = datetime.combine(target_date, datetime.min.time())
-    day_end = datetime.combine(target_date, datetime.max.time())
+    target_date = target_date or await business_today(db, current_user.bar_id)
 
     query = (
         select(Shift)
         .where(
             Shift.bar_id == current_user.bar_id,
-            Shift.start_time >= day_start,
-            Shift.start_time <= day_end,
+            Shift.business_date == target_date,
         )
         .options(*SHIFT_LOAD_OPTIONS)
         .order_by(Shift.start_time)
@@ -94,14 +97,14 @@ async def get_daily_shifts(
     result = await db.execute(query)
     shifts = result.scalars().all()
 
-    # Get sales counts per shift
+    # Get sales counts per shift from the shift ledger
     shift_ids = [s.id for s in shifts]
     sales_counts: dict = {}
     if shift_ids:
         sales_q = await db.execute(
-            select(SalesRecord.shift_id, func.count(SalesRecord.id).label("cnt"))
-            .where(SalesRecord.shift_id.in_(shift_ids))
-            .group_by(SalesRecord.shift_id)
+            select(ShiftProductLedger.shift_id, func.sum(ShiftProductLedger.sales_count).label("cnt"))
+            .where(ShiftProductLedger.shift_id.in_(shift_ids))
+            .group_by(ShiftProductLedger.shift_id)
         )
         for row in sales_q.all():
             sales_counts[row.shift_id] = row.cnt
@@ -148,8 +151,10 @@ async def get_daily_shifts(
 async def list_shifts(
     shift_status: Optional[ShiftStatus] = None,
     staff_id: Optional[uuid.UUID] = Query(None, description="Filter by staff member UUID"),
-    page: int = 1,
-    limit: int = 20,
+    page: int = Query(1, ge=1, description="Offset page, used when no cursor is given"),
+    limit: int = Query(20, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: CountMode = Query(CountMode.ESTIMATE, description="How total is computed"),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
@@ -162,25 +167,39 @@ async def list_shifts(
     if staff_id:
         query = query.where(Shift.staff_id == staff_id)
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
-    query = (
-        query.options(*SHIFT_LOAD_OPTIONS)
-        .order_by(Shift.created_at.desc())
-        .offset((page - 1) * limit)
-        .limit(limit)
-    )
-    result = await db.execute(query)
-    shifts = result.scalars().all()
+    try:
+        result = await paginate(
+            db, query.options(*SHIFT_LOAD_OPTIONS), (Shift.created_at, Shift.id),
+            kind="shifts", bar_id=current_user.bar_id,
+            limit=limit, page=page, cursor=cursor, count=count,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return ShiftListResponse(
-        shifts=[_build_shift_response(s) for s in shifts],
-        total=total,
+        shifts=[_build_shift_response(s) for s in result.rows],
+        total=result.total,
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
     )
 
 
+async def _resolve_stock_counts(db: AsyncSession, bar_id, entries: list[StockCountEntry]) -> dict[uuid.UUID, float]:
+    """Counts per product id, with barcode-keyed entries resolved in one lookup."""
+    products = await resolve_codes(db, bar_id, [e.barcode for e in entries if e.barcode is not None])
+    unknown = sorted({
+        e.barcode for e in entries if e.barcode is not None and normalize_code(e.barcode) not in products
+    })
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown barcode(s): {', '.join(unknown)}")
+
+    counts: dict[uuid.UUID, float] = {}
+    for entry in entries:
+        product_id = entry.product_id or products[normalize_code(entry.barcode)].id
+        counts[product_id] = counts.get(product_id, 0) + entry.count
+    return counts
+
+
 @router.post("/open", response_model=ShiftResponse, status_code=status.HTTP_201_CREATED)
 async def open_shift(
     data: ShiftOpenRequest,
@@ -199,21 +218,24 @@ async def open_shift(
     if existing.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="You already have an open shift. Close it first.")
 
+    opening_counts = await _resolve_stock_counts(db, current_user.bar_id, data.stock_counts)
+
     shift = Shift(
         bar_id=current_user.bar_id,
         staff_id=current_user.id,
         opened_by=current_user.id,
         notes=data.notes,
+        business_date=await business_today(db, current_user.bar_id),
     )
     db.add(shift)
     await db.flush()
 
     # Create opening stock counts
-    for stock in data.stock_counts:
+    for product_id, quantity in opening_counts.items():
         count = ShiftStockCount(
             shift_id=shift.id,
-            product_id=stock.product_id,
-            opening_count=stock.count,
+            product_id=product_id,
+            opening_count=quantity,
         )
         db.add(count)
 
@@ -234,7 +256,10 @@ async def close_shift(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Close a shift with closing stock counts. Triggers reconciliation synchronously."""
+    """
+    Close a shift with closing stock counts. Reconciliation is queued as a
+    background job; poll GET /jobs/{reconciliation_job_id} for its status.
+    """
     result = await db.execute(
         select(Shift)
         .where(
@@ -250,17 +275,18 @@ async def close_shift(
         raise HTTPException(status_code=400, detail="Shift already closed")
 
     # Update closing counts
-    for stock_entry in data.stock_counts:
+    closing_counts = await _resolve_stock_counts(db, current_user.bar_id, data.stock_counts)
+    for product_id, quantity in closing_counts.items():
         for count in shift.stock_counts:
-            if count.product_id == stock_entry.product_id:
-                count.closing_count = stock_entry.count
+            if count.product_id == product_id:
+                count.closing_count = quantity
                 break
         else:
             count = ShiftStockCount(
                 shift_id=shift.id,
-                product_id=stock_entry.product_id,
+                product_id=product_id,
                 opening_count=0,
-                closing_count=stock_entry.count,
+                closing_count=quantity,
             )
             db.add(count)
 
@@ -272,15 +298,21 @@ async def close_shift(
 
     await db.flush()
 
-    # Run reconciliation synchronously
-    await run_reconciliation(db, current_user.bar_id, shift.id)
+    # Queue reconciliation; without a worker pool it runs in this request
+    job = await enqueue_job(
+        db, RECONCILE_SHIFT_JOB, {"shift_id": str(shift.id)}, bar_id=current_user.bar_id,
+    )
+    if not job_pool.running:
+        await run_job_inline(db, job)
 
     # Reload
     result = await db.execute(
         select(Shift).where(Shift.id == shift.id).options(*SHIFT_LOAD_OPTIONS)
     )
     shift = result.scalar_one()
-    return _build_shift_response(shift)
+    response = _build_shift_response(shift)
+    response.reconciliation_job_id = job.id
+    return response
 
 
 @router.get("/{shift_id}", response_model=ShiftResponse)
@@ -1,6 +1,8 @@
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import select, func
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
@@ -10,16 +12,25 @@ from app.schemas.stock_movement import (
     StockMovementCreate, StockMovementResponse, StockMovementListResponse,
 )
 from app.middleware.auth import get_current_user, require_manager
+from app.services.ledger import record_received
+from app.services.business_date import business_today
+from app.services.cache import mark_bar_dirty
+from app.services.idempotency import claim_keys, recent_keys, remember_keys, stored_rows
+from app.services.pagination import CountMode, paginate
 
 router = APIRouter(prefix="/stock-movements", tags=["Stock Movements"])
 
+MOVEMENTS_TABLE = "stock_movements"
+
 
 @router.get("", response_model=StockMovementListResponse)
 async def list_stock_movements(
     product_id: Optional[uuid.UUID] = None,
     movement_type: Optional[MovementType] = None,
-    page: int = 1,
-    limit: int = 50,
+    page: int = Query(1, ge=1, description="Offset page, used when no cursor is given"),
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    count: CountMode = Query(CountMode.ESTIMATE, description="How total is computed"),
     current_user: User = Depends(require_manager),
     db: AsyncSession = Depends(get_db),
 ):
@@ -31,27 +42,41 @@ async def list_stock_movements(
     if movement_type:
         query = query.where(StockMovement.type == movement_type)
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total_result = await db.execute(count_query)
-    total = total_result.scalar() or 0
-
-    query = query.order_by(StockMovement.created_at.desc()).offset((page - 1) * limit).limit(limit)
-    result = await db.execute(query)
-    movements = result.scalars().all()
+    try:
+        result = await paginate(
+            db, query, (StockMovement.created_at, StockMovement.id),
+            kind="stock-movements", bar_id=current_user.bar_id,
+            limit=limit, page=page, cursor=cursor, count=count,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return StockMovementListResponse(
-        movements=[StockMovementResponse.model_validate(m) for m in movements],
-        total=total,
+        movements=[StockMovementResponse.model_validate(m) for m in result.rows],
+        total=result.total,
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
     )
 
 
 @router.post("", response_model=StockMovementResponse, status_code=status.HTTP_201_CREATED)
 async def create_stock_movement(
     data: StockMovementCreate,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Log a stock IN or OUT event. Updates product current_stock."""
+    """
+    Log a stock IN or OUT event. Updates product current_stock. Retrying
+    with the same idempotency_key returns the stored movement (200,
+    replayed=true) and leaves stock untouched.
+    """
+    if data.idempotency_key is not None:
+        cached = recent_keys.get(MOVEMENTS_TABLE, current_user.bar_id, data.idempotency_key)
+        if cached is not None:
+            response.status_code = status.HTTP_200_OK
+            return StockMovementResponse.model_validate({**cached, "replayed": True})
+
     # Verify product belongs to bar
     product_result = await db.execute(
         select(Product).where(
@@ -63,23 +88,44 @@ async def create_stock_movement(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    movement = StockMovement(
-        bar_id=current_user.bar_id,
-        product_id=data.product_id,
-        staff_id=current_user.id,
-        type=data.type,
-        reason=data.reason,
-        quantity=data.quantity,
-        notes=data.notes,
+    record_id, created_at = uuid.uuid4(), datetime.utcnow()
+    if data.idempotency_key is not None:
+        claimed = await claim_keys(db, MOVEMENTS_TABLE, current_user.bar_id, [
+            {"idempotency_key": data.idempotency_key, "id": record_id, "created_at": created_at},
+        ])
+        if not claimed:
+            # The key is already stored: report that movement, apply nothing
+            stored = await stored_rows(db, StockMovement, current_user.bar_id, [data.idempotency_key])
+            movement = stored[data.idempotency_key]
+            response.status_code = status.HTTP_200_OK
+            remember_keys(db, MOVEMENTS_TABLE, current_user.bar_id, [movement])
+            return StockMovementResponse.model_validate({**movement, "replayed": True})
+
+    result = await db.execute(
+        insert(StockMovement).values(
+            id=record_id,
+            bar_id=current_user.bar_id,
+            product_id=data.product_id,
+            staff_id=current_user.id,
+            type=data.type,
+            reason=data.reason,
+            quantity=data.quantity,
+            notes=data.notes,
+            created_at=created_at,
+            business_date=await business_today(db, current_user.bar_id),
+            idempotency_key=data.idempotency_key,
+        ).returning(*StockMovement.__table__.c)
     )
-    db.add(movement)
+    movement = result.mappings().one()
 
     # Update product stock
     if data.type == MovementType.IN:
         product.current_stock = float(product.current_stock or 0) + data.quantity
+        await record_received(db, current_user.bar_id, [(data.product_id, data.quantity)])
     else:
         product.current_stock = float(product.current_stock or 0) - data.quantity
 
+    mark_bar_dirty(db, current_user.bar_id)
+    remember_keys(db, MOVEMENTS_TABLE, current_user.bar_id, [movement])
     await db.flush()
-    await db.refresh(movement)
-    return StockMovementResponse.model_validate(movement)
+    return StockMovementResponse.model_validate(dict(movement))
@@ -0,0 +1,22 @@
+from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Optional
+from app.services.timeseries import TimeseriesMetric, TimeBucket
+
+
+class TimeseriesPoint(BaseModel):
+    t: datetime
+    v: float
+
+
+class TimeseriesResponse(BaseModel):
+    metric: TimeseriesMetric
+    bucket: TimeBucket
+    date_from: date
+    date_to: date
+    source: str
+    max_points: int
+    total_points: int
+    downsampled: bool
+    points: list[TimeseriesPoint]
+    previous_year: Optional[list[TimeseriesPoint]] = None
@@ -1,8 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from uuid import UUID
 from datetime import datetime
 from typing import Optional
 
+from app.services.business_date import is_valid_timezone
+
 
 class BarCreate(BaseModel):
     name: str
@@ -14,6 +16,15 @@ class BarUpdate(BaseModel):
     name: Optional[str] = None
     address: Optional[str] = None
     phone: Optional[str] = None
+    timezone: Optional[str] = None
+    day_cutover_hour: Optional[int] = Field(None, ge=0, le=23)
+
+    @field_validator("timezone")
+    @classmethod
+    def check_timezone(cls, value):
+        if value is not None and not is_valid_timezone(value):
+            raise ValueError(f"Unknown time zone: {value}")
+        return value
 
 
 class BarResponse(BaseModel):
@@ -22,6 +33,8 @@ class BarResponse(BaseModel):
     address: Optional[str]
     phone: Optional[str]
     logo_url: Optional[str]
+    timezone: str
+    day_cutover_hour: int
     created_at: datetime
 
     class Config:
@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from uuid import UUID
+from datetime import datetime
+from typing import Optional
+from app.models.import_job import ImportStatus
+
+
+class ImportParserInfo(BaseModel):
+    name: str
+    description: str
+
+
+class ImportJobResponse(BaseModel):
+    id: UUID
+    bar_id: UUID
+    job_id: Optional[UUID]
+    parser: str
+    params: dict
+    status: ImportStatus
+    file_name: str
+    file_size: int
+    bytes_done: int
+    progress_pct: float
+    rows_done: int
+    rows_failed: int
+    batches_committed: int
+    eta_seconds: Optional[float] = None
+    has_error_report: bool
+    last_error: Optional[str]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    created_at: datetime
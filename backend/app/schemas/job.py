@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from uuid import UUID
+from datetime import datetime
+from typing import Optional
+from app.models.job import JobStatus
+
+
+class JobResponse(BaseModel):
+    id: UUID
+    bar_id: Optional[UUID]
+    kind: str
+    status: JobStatus
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    last_error: Optional[str]
+    result: Optional[dict]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
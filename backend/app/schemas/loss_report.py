@@ -3,6 +3,7 @@ from uuid import UUID
 from datetime import datetime
 from typing import Optional
 from app.models.loss_report import LossSeverity, ReasonCode
+from app.schemas.pagination import PaginatedResponse
 
 
 class LossReportResponse(BaseModel):
@@ -29,9 +30,8 @@ class LossReportUpdate(BaseModel):
     notes: Optional[str] = None
 
 
-class LossReportListResponse(BaseModel):
+class LossReportListResponse(PaginatedResponse):
     reports: list[LossReportResponse]
-    total: int
 
 
 class LossSummary(BaseModel):
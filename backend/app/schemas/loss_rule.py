@@ -0,0 +1,99 @@
+from pydantic import BaseModel, Field, model_validator
+from uuid import UUID
+from datetime import datetime
+from typing import Optional
+from app.models.product import ProductCategory, ProductUnit
+from app.models.loss_rule import ToleranceType
+from app.models.loss_report import LossSeverity
+
+
+class LossRuleCreate(BaseModel):
+    category: Optional[ProductCategory] = None
+    unit: Optional[ProductUnit] = None
+    tolerance_type: ToleranceType = ToleranceType.PERCENT_OF_MIN_STOCK
+    tolerance: float = Field(10.0, ge=0)
+    min_tolerance: float = Field(0.5, ge=0)
+    warning_multiplier: float = Field(1.5, ge=1)
+    critical_multiplier: float = Field(3.0, ge=1)
+    warning_value: Optional[float] = Field(None, ge=0)
+    critical_value: Optional[float] = Field(None, ge=0)
+    priority: int = 0
+    is_active: bool = True
+
+    @model_validator(mode="after")
+    def check_ordering(self):
+        if self.critical_multiplier < self.warning_multiplier:
+            raise ValueError("critical_multiplier must be at least warning_multiplier")
+        if (
+            self.warning_value is not None
+            and self.critical_value is not None
+            and self.critical_value < self.warning_value
+        ):
+            raise ValueError("critical_value must be at least warning_value")
+        return self
+
+
+class LossRuleUpdate(BaseModel):
+    category: Optional[ProductCategory] = None
+    unit: Optional[ProductUnit] = None
+    tolerance_type: Optional[ToleranceType] = None
+    tolerance: Optional[float] = Field(None, ge=0)
+    min_tolerance: Optional[float] = Field(None, ge=0)
+    warning_multiplier: Optional[float] = Field(None, ge=1)
+    critical_multiplier: Optional[float] = Field(None, ge=1)
+    warning_value: Optional[float] = Field(None, ge=0)
+    critical_value: Optional[float] = Field(None, ge=0)
+    priority: Optional[int] = None
+    is_active: Optional[bool] = None
+
+
+class LossRuleResponse(BaseModel):
+    id: UUID
+    bar_id: UUID
+    category: Optional[ProductCategory]
+    unit: Optional[ProductUnit]
+    tolerance_type: ToleranceType
+    tolerance: float
+    min_tolerance: float
+    warning_multiplier: float
+    critical_multiplier: float
+    warning_value: Optional[float]
+    critical_value: Optional[float]
+    priority: int
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class LossRulePreviewRequest(BaseModel):
+    shift_id: UUID
+    # Draft rules to evaluate instead of the bar's stored rules
+    rules: Optional[list[LossRuleCreate]] = None
+
+
+class LossRulePreviewRow(BaseModel):
+    product_id: UUID
+    product_name: str
+    category: ProductCategory
+    unit: ProductUnit
+    expected_closing: float
+    actual_closing: float
+    discrepancy: float
+    threshold: float
+    z_score: Optional[float]
+    severity: Optional[LossSeverity]
+    current_severity: Optional[LossSeverity]
+    loss_value: float
+
+
+class LossRulePreviewResponse(BaseModel):
+    shift_id: UUID
+    rules_applied: int
+    products: int
+    by_severity: dict[str, int]
+    total_loss_value: float
+    changed: int
+    rows: list[LossRulePreviewRow]
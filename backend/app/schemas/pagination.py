@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import Optional
+
+
+class PaginatedResponse(BaseModel):
+    """Totals and continuation shared by the list responses (see services.pagination)."""
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+    next_cursor: Optional[str] = None
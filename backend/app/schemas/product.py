@@ -1,12 +1,16 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from uuid import UUID
 from datetime import datetime
 from typing import Optional
 from app.models.product import ProductCategory, ProductUnit
+from app.schemas.pagination import PaginatedResponse
+from app.services.product_codes import normalize_code
 
 
 class ProductCreate(BaseModel):
     name: str
+    barcode: Optional[str] = Field(None, max_length=64)
+    sku: Optional[str] = Field(None, max_length=64)
     category: ProductCategory
     unit: ProductUnit = ProductUnit.BOTTLE
     volume_ml: Optional[int] = None
@@ -16,9 +20,16 @@ class ProductCreate(BaseModel):
     min_stock_threshold: float = 5.0
     current_stock: float = 0.0
 
+    @field_validator("barcode", "sku")
+    @classmethod
+    def strip_codes(cls, value):
+        return normalize_code(value)
+
 
 class ProductUpdate(BaseModel):
     name: Optional[str] = None
+    barcode: Optional[str] = Field(None, max_length=64)
+    sku: Optional[str] = Field(None, max_length=64)
     category: Optional[ProductCategory] = None
     unit: Optional[ProductUnit] = None
     volume_ml: Optional[int] = None
@@ -29,11 +40,18 @@ class ProductUpdate(BaseModel):
     current_stock: Optional[float] = None
     is_active: Optional[bool] = None
 
+    @field_validator("barcode", "sku")
+    @classmethod
+    def strip_codes(cls, value):
+        return normalize_code(value)
+
 
 class ProductResponse(BaseModel):
     id: UUID
     bar_id: UUID
     name: str
+    barcode: Optional[str] = None
+    sku: Optional[str] = None
     category: ProductCategory
     unit: ProductUnit
     volume_ml: Optional[int]
@@ -51,6 +69,28 @@ class ProductResponse(BaseModel):
         from_attributes = True
 
 
-class ProductListResponse(BaseModel):
+class ProductListResponse(PaginatedResponse):
     products: list[ProductResponse]
-    total: int
+
+
+class ProductSearchHit(ProductResponse):
+    score: float
+
+
+class ProductSearchResponse(BaseModel):
+    hits: list[ProductSearchHit]
+    source: str
+
+
+class ProductScanRequest(BaseModel):
+    codes: list[str] = Field(..., min_length=1, max_length=500)
+
+
+class ProductScanMatch(BaseModel):
+    code: str
+    product: ProductResponse
+
+
+class ProductScanResponse(BaseModel):
+    matches: list[ProductScanMatch]
+    unknown: list[str]
@@ -2,6 +2,8 @@ from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime, date
 from typing import Optional
+from app.models.loss_report import LossSeverity
+from app.schemas.pagination import PaginatedResponse
 
 
 class ReconciliationResponse(BaseModel):
@@ -22,6 +24,30 @@ class ReconciliationResponse(BaseModel):
         from_attributes = True
 
 
-class ReconciliationListResponse(BaseModel):
+class ReconciliationListResponse(PaginatedResponse):
     reconciliations: list[ReconciliationResponse]
-    total: int
+
+
+class ReplayRequest(BaseModel):
+    date_from: date
+    date_to: date
+
+
+class ReconciliationChange(BaseModel):
+    product_id: UUID
+    discrepancy_before: Optional[float]
+    discrepancy_after: float
+    severity_before: Optional[LossSeverity]
+    severity_after: Optional[LossSeverity]
+
+
+class ReReconcileSummary(BaseModel):
+    shift_id: UUID
+    unchanged: int
+    created: int
+    updated: int
+    loss_reports_created: int
+    loss_reports_updated: int
+    loss_reports_removed: int
+    reviews_kept: int
+    changes: list[ReconciliationChange]
@@ -1,7 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
 from typing import Optional
+from app.schemas.pagination import PaginatedResponse
 
 
 class SalesRecordCreate(BaseModel):
@@ -9,6 +10,8 @@ class SalesRecordCreate(BaseModel):
     shift_id: UUID
     quantity_sold: float
     sale_amount: float
+    # Same key on a retry = same sale; the stored record is returned instead
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=128)
 
 
 class SalesRecordBulkCreate(BaseModel):
@@ -23,11 +26,13 @@ class SalesRecordResponse(BaseModel):
     quantity_sold: float
     sale_amount: float
     created_at: datetime
+    idempotency_key: Optional[str] = None
+    # True when the idempotency key was already stored and nothing was written
+    replayed: bool = False
 
     class Config:
         from_attributes = True
 
 
-class SalesRecordListResponse(BaseModel):
+class SalesRecordListResponse(PaginatedResponse):
     records: list[SalesRecordResponse]
-    total: int
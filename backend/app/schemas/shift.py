@@ -1,14 +1,27 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from uuid import UUID
 from datetime import datetime
 from typing import Optional
 from app.models.shift import ShiftStatus
+from app.schemas.pagination import PaginatedResponse
 
 
 class StockCountEntry(BaseModel):
-    product_id: UUID
+    """
+    A counted quantity keyed by product id or by a scanned barcode / SKU.
+    Entries for the same product are added up, so a scanner can send one
+    entry per scan.
+    """
+    product_id: Optional[UUID] = None
+    barcode: Optional[str] = Field(None, max_length=64)
     count: float
 
+    @model_validator(mode="after")
+    def check_key(self):
+        if (self.product_id is None) == (self.barcode is None):
+            raise ValueError("Give exactly one of product_id or barcode")
+        return self
+
 
 class ShiftOpenRequest(BaseModel):
     stock_counts: list[StockCountEntry]
@@ -46,14 +59,14 @@ class ShiftResponse(BaseModel):
     created_at: datetime
     duration_hours: Optional[float] = None
     stock_counts: list[ShiftStockCountResponse] = []
+    reconciliation_job_id: Optional[UUID] = None
 
     class Config:
         from_attributes = True
 
 
-class ShiftListResponse(BaseModel):
+class ShiftListResponse(PaginatedResponse):
     shifts: list[ShiftResponse]
-    total: int
 
 
 class DailyShiftEntry(BaseModel):
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from uuid import UUID
 from datetime import datetime
 from typing import Optional
 from app.models.stock_movement import MovementType, MovementReason
+from app.schemas.pagination import PaginatedResponse
 
 
 class StockMovementCreate(BaseModel):
@@ -11,6 +12,8 @@ class StockMovementCreate(BaseModel):
     reason: MovementReason = MovementReason.OTHER
     quantity: float
     notes: Optional[str] = None
+    # Same key on a retry = same movement; the stored one is returned instead
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=128)
 
 
 class StockMovementResponse(BaseModel):
@@ -23,11 +26,13 @@ class StockMovementResponse(BaseModel):
     quantity: float
     notes: Optional[str]
     created_at: datetime
+    idempotency_key: Optional[str] = None
+    # True when the idempotency key was already stored and nothing was applied
+    replayed: bool = False
 
     class Config:
         from_attributes = True
 
 
-class StockMovementListResponse(BaseModel):
+class StockMovementListResponse(PaginatedResponse):
     movements: list[StockMovementResponse]
-    total: int
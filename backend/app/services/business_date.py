@@ -0,0 +1,100 @@
+"""
+Bar-local business dates.
+
+A bar's trading day runs from its cutover hour to the next day's cutover
+hour in the bar's time zone, so a night that closes at 3am with a 6am
+cutover stays on one date. Sales, stock movements and shifts store the
+business date of the moment they were recorded (shifts: when opened); loss
+reports take the business date of their shift. Day queries are then plain
+equality and range lookups on the (bar_id, business_date) indexes.
+
+Bar clocks are cached per bar for BAR_CLOCK_CACHE_TTL_SECONDS; bar updates
+in this process invalidate the entry when they commit.
+"""
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from typing import NamedTuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError, available_timezones
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import Bar
+
+settings = get_settings()
+
+
+class BarClock(NamedTuple):
+    timezone: str = "UTC"
+    cutover_hour: int = 0
+
+    def business_date(self, moment: datetime | None = None) -> date:
+        """Business date of a naive UTC moment (default: now)."""
+        moment = (moment or datetime.utcnow()).replace(tzinfo=dt_timezone.utc)
+        local = moment.astimezone(ZoneInfo(self.timezone))
+        return (local - timedelta(hours=self.cutover_hour)).date()
+
+    def day_start(self, day: date) -> datetime:
+        """Naive UTC moment a business date starts."""
+        local = datetime.combine(day, datetime.min.time()).replace(
+            hour=self.cutover_hour, tzinfo=ZoneInfo(self.timezone),
+        )
+        return local.astimezone(dt_timezone.utc).replace(tzinfo=None)
+
+    def hours_offset(self, day: date) -> float:
+        """Hours from UTC midnight to the local start of a business date."""
+        start = self.day_start(day)
+        return (start - datetime.combine(day, datetime.min.time())).total_seconds() / 3600
+
+
+UTC_CLOCK = BarClock()
+
+
+def is_valid_timezone(name: str) -> bool:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return name in available_timezones() or name == "UTC"
+
+
+_cache: dict = {}
+_STALE_CLOCKS = "bar_clock_stale_bars"
+
+
+def invalidate_bar_clock(db, bar_id) -> None:
+    """Drop a bar's cached clock once the session commits; call after changing its time zone or cutover."""
+    session = db.sync_session if hasattr(db, "sync_session") else db
+    session.info.setdefault(_STALE_CLOCKS, set()).add(bar_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_committed_clocks(session):
+    # Not before: a request between the flush and the commit would re-cache the old clock
+    for bar_id in session.info.pop(_STALE_CLOCKS, ()):
+        _cache.pop(bar_id, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_clocks(session):
+    session.info.pop(_STALE_CLOCKS, None)
+
+
+async def get_bar_clock(db: AsyncSession, bar_id) -> BarClock:
+    """The bar's clock, served from the per-bar cache when fresh."""
+    cached = _cache.get(bar_id)
+    if cached is not None and time.monotonic() - cached[0] < settings.BAR_CLOCK_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    result = await db.execute(select(Bar.timezone, Bar.day_cutover_hour).where(Bar.id == bar_id))
+    row = result.one_or_none()
+    clock = BarClock(row.timezone, row.day_cutover_hour) if row else UTC_CLOCK
+    _cache[bar_id] = (time.monotonic(), clock)
+    return clock
+
+
+async def business_today(db: AsyncSession, bar_id) -> date:
+    """The bar's current business date."""
+    return (await get_bar_clock(db, bar_id)).business_date()
@@ -0,0 +1,264 @@
+"""
+Per-bar result cache for dashboard endpoints.
+
+Entries are keyed by bar, dashboard kind and the bar's cache version. Any
+committed change to a watched model (sales, stock movements, loss reports,
+shifts, products, users) bumps the version of the bar it belongs to, so
+the bar's old entries are never read again and age out of the backend.
+ORM writes are picked up automatically from the session's flushes; code
+that writes those tables with Core statements calls mark_bar_dirty().
+
+Two backends: an in-process LRU with TTL (default) and Redis, for sharing
+entries and versions between app processes (CACHE_BACKEND=redis, needs the
+optional `redis` package). Concurrent misses on one key within a process
+share a single computation.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import SalesRecord, StockMovement, LossReport, Shift, Product, User
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # optional dependency
+    redis_asyncio = None
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+WATCHED_MODELS = (SalesRecord, StockMovement, LossReport, Shift, Product, User)
+
+_DIRTY_BARS_KEY = "cache_dirty_bars"
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry. Counters live outside the LRU."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get(self, key: str):
+        if key in self._counters:
+            return self._counters[key]
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value, ttl: float | None = None) -> None:
+        expires_at = time.monotonic() + ttl if ttl else None
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def incr_now(self, key: str) -> int:
+        # An evicted version would reset and could resurrect stale entries,
+        # so counters are never evicted
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def incr(self, key: str) -> int:
+        return self.incr_now(key)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+        self._counters.clear()
+
+
+class RedisBackend:
+    """Redis (or compatible) backend; values are stored as JSON."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        if redis_asyncio is None:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+        self._client = redis_asyncio.from_url(url)
+
+    def __len__(self) -> int:
+        return -1  # not tracked locally
+
+    async def get(self, key: str):
+        raw = await self._client.get(key)
+        return None if raw is None else json.loads(raw)
+
+    async def set(self, key: str, value, ttl: float | None = None) -> None:
+        await self._client.set(key, json.dumps(value, default=str), ex=int(ttl) if ttl else None)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+    async def clear(self) -> None:
+        await self._client.flushdb()
+
+
+class DashboardCache:
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._pending_invalidations: set[asyncio.Task] = set()
+        self.metrics: dict[str, dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        )
+        self.invalidations = 0
+
+    @staticmethod
+    def _version_key(bar_id) -> str:
+        return f"bar-version:{bar_id}"
+
+    async def get_or_compute(
+        self, kind: str, bar_id, compute: Callable[[], Awaitable[Any]], variant: str | None = None,
+    ):
+        """
+        Return the cached value for (kind, bar, variant), computing it at most
+        once per miss. `variant` distinguishes parameterised results of one
+        kind, which share its hit/miss counters.
+        """
+        stats = self.metrics[kind]
+        try:
+            version = await self.backend.get(self._version_key(bar_id)) or 0
+            key = f"dashboard:{kind}:{bar_id}:v{version}"
+            if variant is not None:
+                key = f"{key}:{variant}"
+            value = await self.backend.get(key)
+        except Exception:
+            # A broken cache must not take the dashboard down with it
+            logger.exception("Cache read failed for %s", kind)
+            stats["errors"] += 1
+            return await compute()
+
+        if value is not None:
+            stats["hits"] += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                # The computing request was cancelled (client went away); compute here
+                return await compute()
+
+        stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            future.set_result(value)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            # Mark retrieved so a miss nobody else waited on does not log a warning
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception:
+            logger.exception("Cache write failed for %s", kind)
+            stats["errors"] += 1
+        return value
+
+    async def invalidate(self, bar_id) -> None:
+        self.invalidations += 1
+        await self.backend.incr(self._version_key(bar_id))
+
+    def invalidate_soon(self, bar_ids) -> None:
+        """
+        Bump bar versions from synchronous code (session events): at once
+        for the memory backend, as background tasks for remote backends.
+        """
+        if hasattr(self.backend, "incr_now"):
+            for bar_id in bar_ids:
+                self.invalidations += 1
+                self.backend.incr_now(self._version_key(bar_id))
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no running loop to schedule on; entries expire with the TTL
+        for bar_id in bar_ids:
+            task = loop.create_task(self.invalidate(bar_id))
+            self._pending_invalidations.add(task)
+            task.add_done_callback(self._pending_invalidations.discard)
+
+    def stats(self) -> dict:
+        totals = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+        for kind_stats in self.metrics.values():
+            for name, value in kind_stats.items():
+                totals[name] += value
+        lookups = totals["hits"] + totals["misses"] + totals["coalesced"]
+        return {
+            "backend": self.backend.name,
+            "ttl_seconds": self.ttl,
+            "entries": len(self.backend),
+            "invalidations": self.invalidations,
+            "hit_ratio": round(totals["hits"] / lookups, 4) if lookups else None,
+            **totals,
+            "by_kind": dict(self.metrics),
+        }
+
+
+def _build_cache() -> DashboardCache:
+    if settings.CACHE_BACKEND == "redis":
+        backend = RedisBackend(settings.CACHE_REDIS_URL)
+    else:
+        backend = MemoryBackend(settings.CACHE_MAX_ENTRIES)
+    return DashboardCache(backend, settings.DASHBOARD_CACHE_TTL_SECONDS)
+
+
+dashboard_cache = _build_cache()
+
+
+def mark_bar_dirty(db, bar_id) -> None:
+    """Invalidate a bar's dashboards once the session commits (for Core writes)."""
+    session = db.sync_session if hasattr(db, "sync_session") else db
+    session.info.setdefault(_DIRTY_BARS_KEY, set()).add(bar_id)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_bars(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, WATCHED_MODELS) and getattr(obj, "bar_id", None) is not None:
+            session.info.setdefault(_DIRTY_BARS_KEY, set()).add(obj.bar_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_dirty_bars(session):
+    bar_ids = session.info.pop(_DIRTY_BARS_KEY, None)
+    if bar_ids:
+        dashboard_cache.invalidate_soon(bar_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty_bars(session):
+    session.info.pop(_DIRTY_BARS_KEY, None)
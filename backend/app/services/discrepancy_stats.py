@@ -0,0 +1,81 @@
+"""
+Learned per-product discrepancy statistics.
+
+Each (product, weekday) keeps a Welford running mean and variance of its
+closing discrepancies in product_discrepancy_stats. Every shift close folds
+its discrepancies in with one chunked upsert whose ON CONFLICT clause does
+the Welford step in SQL, so an update is O(1) per product and never reads
+daily_reconciliations. Reconciliation scores a shift against the stats as
+they stood before that close.
+"""
+from datetime import datetime
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import ProductDiscrepancyStats
+
+settings = get_settings()
+
+# Keeps multi-row VALUES well under the 32,767 bind-parameter limit
+UPSERT_CHUNK_SIZE = 1000
+
+
+def learned_threshold_params() -> dict:
+    """Kernel keyword arguments for z-score classification, from settings."""
+    return {
+        "min_samples": settings.LOSS_STATS_MIN_SAMPLES,
+        "min_std": settings.LOSS_STATS_MIN_STD,
+        "z_info": settings.LOSS_Z_INFO,
+        "z_warning": settings.LOSS_Z_WARNING,
+        "z_critical": settings.LOSS_Z_CRITICAL,
+    }
+
+
+def stats_columns(rows) -> dict[str, list]:
+    """Kernel stats columns for rows exposing stats_n, stats_mean and stats_m2 (None when unseen)."""
+    return {
+        "stats_n": [row.stats_n or 0 for row in rows],
+        "stats_mean": [float(row.stats_mean or 0) for row in rows],
+        "stats_m2": [float(row.stats_m2 or 0) for row in rows],
+    }
+
+
+async def record_discrepancies(db: AsyncSession, bar_id, weekday: int, observations: list[tuple]) -> None:
+    """Fold (product_id, discrepancy) observations from one close into the weekday's stats."""
+    if not observations:
+        return
+
+    now = datetime.utcnow()
+    rows = [
+        {
+            "product_id": product_id,
+            "weekday": weekday,
+            "bar_id": bar_id,
+            "n": 1,
+            "mean": float(discrepancy),
+            "m2": 0.0,
+            "updated_at": now,
+        }
+        for product_id, discrepancy in sorted(observations, key=lambda o: str(o[0]))
+    ]
+
+    table = ProductDiscrepancyStats.__table__
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = pg_insert(ProductDiscrepancyStats).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        # Welford step: x = excluded.mean, delta = x - mean, mean' = mean + delta / (n + 1),
+        # m2' = m2 + delta * (x - mean'). All right-hand sides see the pre-update row.
+        x = stmt.excluded.mean
+        delta = x - table.c.mean
+        new_mean = table.c.mean + delta / (table.c.n + 1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.product_id, table.c.weekday],
+            set_={
+                "n": table.c.n + 1,
+                "mean": new_mean,
+                "m2": table.c.m2 + delta * (x - new_mean),
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt)
@@ -0,0 +1,141 @@
+"""
+Idempotency keys for client writes.
+
+Sales (POST /sales, /sales/bulk, /sales/stream) and stock movements
+(POST /stock-movements) take an optional client-chosen idempotency_key per
+record. Keys are unique per bar and table. Before a keyed row is inserted
+its key is claimed in idempotency_keys (INSERT ... ON CONFLICT DO NOTHING,
+one statement per batch); the keyed tables are partitioned by month, and
+partitions can only enforce uniqueness that includes the partition key. A
+key that is already claimed resolves to the row stored first: it comes back
+marked `replayed` and nothing is written or applied again (ledger, rollups,
+stock levels). Concurrent writers of one key wait on the claim, so the
+loser sees the winner's row once it commits.
+
+recent_keys remembers the rows of recently committed keys in an in-process
+LRU, so a retry storm is answered without touching the database. Keys are
+only added once their transaction commits, so a rolled-back write is never
+mistaken for a stored one; the claims table stays the source of truth
+across processes.
+"""
+from collections import OrderedDict
+from typing import Iterable
+
+from sqlalchemy import and_, bindparam, event, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import IdempotencyKey
+
+settings = get_settings()
+
+_PENDING_KEYS = "idempotency_pending_keys"
+
+
+class RecentKeys:
+    """LRU of (table, bar_id, key) -> the row stored under the key."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._rows: OrderedDict = OrderedDict()
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, table: str, bar_id, key: str) -> dict | None:
+        row = self._rows.get((table, bar_id, key))
+        if row is not None:
+            self._rows.move_to_end((table, bar_id, key))
+            self.hits += 1
+        return row
+
+    def put(self, table: str, bar_id, key: str, row: dict) -> None:
+        self._rows[(table, bar_id, key)] = row
+        self._rows.move_to_end((table, bar_id, key))
+        while len(self._rows) > self.max_keys:
+            self._rows.popitem(last=False)
+
+    def clear(self) -> None:
+        self._rows.clear()
+
+
+recent_keys = RecentKeys(settings.IDEMPOTENCY_CACHE_MAX_KEYS)
+
+
+def unseen_rows(table: str, bar_id, rows: Iterable[dict]) -> list[dict]:
+    """Rows without a key, or whose key is not among the recently committed ones."""
+    return [
+        row for row in rows
+        if row.get("idempotency_key") is None or recent_keys.get(table, bar_id, row["idempotency_key"]) is None
+    ]
+
+
+CLAIM_COLUMNS = ("bar_id", "table_name", "key", "record_id", "record_created_at")
+
+
+def _build_claim():
+    table = IdempotencyKey.__table__
+    source = select(*[
+        func.unnest(bindparam(name, type_=ARRAY(table.c[name].type))).label(name)
+        for name in CLAIM_COLUMNS
+    ])
+    return insert(table).from_select(list(CLAIM_COLUMNS), source).on_conflict_do_nothing().returning(table.c.key)
+
+
+_CLAIM_KEYS = _build_claim()
+
+
+async def claim_keys(db, table: str, bar_id, rows: Iterable[dict]) -> set[str]:
+    """
+    Claim the keys of `rows` (mappings with idempotency_key, id and
+    created_at) for the bar. Returns the keys claimed; the others are taken.
+    """
+    rows = [row for row in rows if row.get("idempotency_key") is not None]
+    if not rows:
+        return set()
+    result = await db.execute(_CLAIM_KEYS, {
+        "bar_id": [bar_id] * len(rows),
+        "table_name": [table] * len(rows),
+        "key": [row["idempotency_key"] for row in rows],
+        "record_id": [row["id"] for row in rows],
+        "record_created_at": [row["created_at"] for row in rows],
+    })
+    return set(result.scalars().all())
+
+
+async def stored_rows(db, model, bar_id, keys: Iterable[str]) -> dict[str, dict]:
+    """Rows of the bar already stored under `keys`, by key."""
+    keys = set(keys)
+    if not keys:
+        return {}
+    table = model.__table__
+    claims = IdempotencyKey.__table__
+    result = await db.execute(
+        select(table)
+        .join(claims, and_(claims.c.record_id == table.c.id, claims.c.record_created_at == table.c.created_at))
+        .where(claims.c.bar_id == bar_id, claims.c.table_name == table.name, claims.c.key.in_(keys))
+    )
+    return {row["idempotency_key"]: dict(row) for row in result.mappings()}
+
+
+def remember_keys(db, table: str, bar_id, rows: Iterable[dict]) -> None:
+    """Add the keyed rows to recent_keys once the session commits."""
+    session = db.sync_session if hasattr(db, "sync_session") else db
+    pending = session.info.setdefault(_PENDING_KEYS, [])
+    pending.extend(
+        (table, bar_id, row["idempotency_key"], row)
+        for row in rows if row.get("idempotency_key") is not None
+    )
+
+
+@event.listens_for(Session, "after_commit")
+def _commit_keys(session):
+    for table, bar_id, key, row in session.info.pop(_PENDING_KEYS, ()):
+        recent_keys.put(table, bar_id, key, {k: v for k, v in row.items() if k != "replayed"})
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_keys(session):
+    session.info.pop(_PENDING_KEYS, None)
@@ -0,0 +1,206 @@
+"""
+Background file imports.
+
+Uploads are streamed to IMPORT_DIR (not the public UPLOAD_DIR) and processed by an
+"import_file" job running the import's parser (services.import_parsers).
+Each batch commits together with the import's progress: the position
+reached (byte offset and record number), row counters, parser state and
+the error report's length. Every commit also refreshes the job's lock, so
+a long import is never reclaimed as stale while it is still running.
+
+When a worker dies mid-file, the queue reclaims the job once
+JOB_STALE_AFTER_SECONDS pass and the import resumes at its last committed
+batch. The error report is cut back to its committed length, so no row is
+reported twice. A file the parser rejects outright (a bad header, say)
+fails the import without retries. Other errors are retried by the queue
+and fail the import once attempts run out; a FAILED import can be resumed
+by hand. The uploaded file is deleted once the import succeeds.
+"""
+import csv
+import io
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import aiofiles
+from fastapi import UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import ImportJob, ImportStatus, Job
+from app.services.import_parsers import READ_CHUNK_BYTES, get_parser
+from app.services.job_queue import enqueue_job, register_job
+
+# Register the sales parsers
+import app.services.sales_columnar  # noqa: F401
+import app.services.sales_import  # noqa: F401
+
+settings = get_settings()
+
+IMPORT_FILE_JOB = "import_file"
+
+
+def get_import_dir() -> Path:
+    path = Path(settings.IMPORT_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+async def save_import_upload(upload: UploadFile) -> tuple[str, int]:
+    """
+    Stream an upload to the imports folder; returns (path, size in bytes).
+    Raises ValueError for files over IMPORT_MAX_FILE_BYTES.
+    """
+    ext = os.path.splitext(upload.filename or "")[1].lower()[:10]
+    path = get_import_dir() / f"{uuid.uuid4().hex}{ext}"
+    size = 0
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            while chunk := await upload.read(READ_CHUNK_BYTES):
+                size += len(chunk)
+                if size > settings.IMPORT_MAX_FILE_BYTES:
+                    raise ValueError(
+                        f"File too large. Max size: {settings.IMPORT_MAX_FILE_BYTES // (1024 * 1024)}MB"
+                    )
+                await f.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return str(path), size
+
+
+async def enqueue_import(db: AsyncSession, imp: ImportJob) -> Job:
+    """Queue a job that processes (or resumes) the import."""
+    job = await enqueue_job(db, IMPORT_FILE_JOB, {"import_id": str(imp.id)}, bar_id=imp.bar_id)
+    imp.job_id = job.id
+    imp.status = ImportStatus.QUEUED
+    imp.last_error = None
+    imp.finished_at = None
+    await db.flush()
+    return job
+
+
+async def create_import(
+    db: AsyncSession, bar_id, user_id, parser_name: str, params: dict, upload: UploadFile,
+) -> tuple[ImportJob, Job]:
+    """
+    Validate the parser parameters, save the upload and queue its import.
+    Raises ValueError (or LookupError for a missing referenced row).
+    """
+    parser = get_parser(parser_name)
+    params = await parser.validate_params(db, bar_id, params)
+    path, size = await save_import_upload(upload)
+
+    imp = ImportJob(
+        bar_id=bar_id,
+        created_by=user_id,
+        parser=parser_name,
+        params=params,
+        file_name=upload.filename or Path(path).name,
+        file_path=path,
+        file_size=size,
+    )
+    db.add(imp)
+    await db.flush()
+    job = await enqueue_import(db, imp)
+    return imp, job
+
+
+def error_report_path(imp: ImportJob) -> Path:
+    return get_import_dir() / f"{imp.id}.errors.csv"
+
+
+async def _append_errors(imp: ImportJob, errors: list[tuple[int, str]]) -> int:
+    """Append (record, error) rows to the import's error report; returns its new length."""
+    path = Path(imp.error_report_path or error_report_path(imp))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if imp.error_report_bytes == 0:
+        writer.writerow(["row", "error"])
+    writer.writerows(errors)
+    data = buffer.getvalue().encode()
+
+    async with aiofiles.open(path, "ab") as f:
+        await f.write(data)
+    imp.error_report_path = str(path)
+    return imp.error_report_bytes + len(data)
+
+
+def _rewind_error_report(imp: ImportJob) -> None:
+    # Drop rows a crashed run appended after its last committed batch
+    if imp.error_report_path and os.path.exists(imp.error_report_path):
+        os.truncate(imp.error_report_path, imp.error_report_bytes)
+
+
+async def run_import(db: AsyncSession, imp: ImportJob, job: Job) -> dict:
+    """Process the import from its last committed batch, committing per batch."""
+    parser = get_parser(imp.parser)(db, imp.bar_id, imp.params, dict(imp.parser_state))
+    now = datetime.utcnow()
+    imp.status = ImportStatus.RUNNING
+    imp.job_id = job.id
+    imp.started_at = imp.started_at or now
+    imp.run_started_at = now
+    imp.run_start_bytes = imp.bytes_done
+    _rewind_error_report(imp)
+    await db.commit()
+
+    await parser.prepare()
+    batches = parser.file_batches(imp.file_path, imp.bytes_done, imp.records_read + 1, settings.IMPORT_BATCH_ROWS)
+    async for batch in batches:
+        written, errors = await parser.write_batch(batch.records)
+        if errors:
+            imp.error_report_bytes = await _append_errors(imp, errors)
+        imp.bytes_done = batch.end_offset
+        imp.records_read = batch.last_record
+        imp.rows_done += written
+        imp.rows_failed += len(errors)
+        imp.batches_committed += 1
+        imp.parser_state = dict(parser.state)
+        await db.commit()
+    await parser.finish()
+
+    imp.status = ImportStatus.SUCCEEDED
+    # Columnar positions are estimates; the whole file has been read
+    imp.bytes_done = imp.file_size
+    imp.last_error = None
+    imp.finished_at = datetime.utcnow()
+    Path(imp.file_path).unlink(missing_ok=True)
+    await db.flush()
+    return {
+        "import_id": str(imp.id),
+        "rows_done": imp.rows_done,
+        "rows_failed": imp.rows_failed,
+        "bytes_done": imp.bytes_done,
+    }
+
+
+async def _record_failure(db: AsyncSession, imp: ImportJob, error: str, final: bool) -> None:
+    # The failed batch's writes are discarded; committed batches stay
+    await db.rollback()
+    await db.refresh(imp)
+    imp.last_error = error
+    if final:
+        imp.status = ImportStatus.FAILED
+        imp.finished_at = datetime.utcnow()
+    else:
+        imp.status = ImportStatus.QUEUED
+    await db.commit()
+
+
+@register_job(IMPORT_FILE_JOB)
+async def import_file_job(db: AsyncSession, job: Job) -> dict:
+    """Job handler: run (or resume) the payload's import."""
+    imp = await db.get(ImportJob, uuid.UUID(job.payload["import_id"]))
+    if imp is None:
+        raise LookupError(f"Import {job.payload['import_id']} not found")
+
+    try:
+        return await run_import(db, imp, job)
+    except ValueError as e:
+        # The file itself is unusable; a retry would fail the same way
+        await _record_failure(db, imp, str(e), final=True)
+        return {"import_id": str(imp.id), "error": str(e)}
+    except Exception as e:
+        await _record_failure(db, imp, f"{type(e).__name__}: {e}", final=job.attempts >= job.max_attempts)
+        raise
@@ -0,0 +1,173 @@
+"""
+File parsers for imports.
+
+A parser turns an uploaded file into batches of numbered records and
+writes each batch for one bar. Raising ValueError from file_batches,
+write_batch or finish rejects the whole file; row-level problems are
+returned instead. Batches end on record boundaries and carry the byte
+offset just past them and their last record number, so an import job can
+commit a batch together with that position and, after a crash, reopen the
+file there. Stream formats (CSV) read through read_batches from that byte
+offset; formats that need random access (Parquet, Arrow) override
+file_batches and resume by record number instead.
+
+Parsers register under a name with @register_parser; import jobs and the
+synchronous import endpoints look them up in IMPORT_PARSERS. A parser
+instance serves one import: `params` are the caller's options (validated
+by validate_params) and `state` is a JSON-ready dict the parser may update
+while writing (a CSV header, say), persisted with each committed batch.
+"""
+import csv
+from typing import AsyncIterator, Awaitable, Callable, NamedTuple
+
+import aiofiles
+from sqlalchemy.ext.asyncio import AsyncSession
+
+READ_CHUNK_BYTES = 64 * 1024
+
+Reader = Callable[[int], Awaitable[bytes]]
+
+
+class RecordBatch(NamedTuple):
+    # What the parser's write_batch takes; for CSV, a list of
+    # (record number, parsed record or the ValueError it failed with)
+    records: object
+    end_offset: int
+    last_record: int
+
+
+class ImportParser:
+    """Base class for import parsers; see the module docstring."""
+
+    name: str = ""
+    description: str = ""
+
+    def __init__(self, db: AsyncSession, bar_id, params: dict, state: dict | None = None):
+        self.db = db
+        self.bar_id = bar_id
+        self.params = params
+        self.state = state if state is not None else {}
+
+    @classmethod
+    async def validate_params(cls, db: AsyncSession, bar_id, params: dict) -> dict:
+        """Checked, JSON-ready parameters for a new import; raises ValueError."""
+        return {}
+
+    async def prepare(self) -> None:
+        """Load whatever the batches are resolved against (catalog lookups, ...)."""
+
+    def read_batches(
+        self, read: Reader, offset: int = 0, first_record: int = 1, batch_rows: int = 1000,
+    ) -> AsyncIterator[RecordBatch]:
+        """Batches of records from `read`, an async read(size) positioned at byte `offset`."""
+        raise NotImplementedError
+
+    async def file_batches(
+        self, path: str, offset: int = 0, first_record: int = 1, batch_rows: int = 1000,
+    ) -> AsyncIterator[RecordBatch]:
+        """Batches of a stored file from byte `offset` / record `first_record` on."""
+        async with aiofiles.open(path, "rb") as f:
+            await f.seek(offset)
+            async for batch in self.read_batches(f.read, offset, first_record, batch_rows):
+                yield batch
+
+    async def write_batch(self, records) -> tuple[int, list[tuple[int, str]]]:
+        """Write a batch in the current transaction; (rows written, [(record number, error)])."""
+        raise NotImplementedError
+
+    async def finish(self) -> None:
+        """Called after the last batch; raises ValueError if the file as a whole was unusable."""
+
+
+IMPORT_PARSERS: dict[str, type[ImportParser]] = {}
+
+
+def register_parser(name: str, description: str = ""):
+    """Class decorator registering an ImportParser subclass under `name`."""
+    def decorator(parser: type[ImportParser]) -> type[ImportParser]:
+        parser.name = name
+        parser.description = description or (parser.__doc__ or "").strip().splitlines()[0]
+        IMPORT_PARSERS[name] = parser
+        return parser
+    return decorator
+
+
+def get_parser(name: str) -> type[ImportParser]:
+    try:
+        return IMPORT_PARSERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown import parser '{name}'")
+
+
+async def _read_lines(read: Reader, chunk_bytes: int) -> AsyncIterator[bytes]:
+    # Splitting bytes on b"\n" is safe for UTF-8: it never occurs inside a multi-byte character
+    buffer = b""
+    while True:
+        chunk = await read(chunk_bytes)
+        if not chunk:
+            break
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if buffer:
+        yield buffer
+
+
+def _parse_csv_record(raw: bytes) -> list[str] | ValueError:
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return ValueError("Not valid UTF-8")
+    try:
+        return next(csv.reader([text]), [])
+    except csv.Error as e:
+        return ValueError(f"Malformed CSV: {e}")
+
+
+async def read_csv_batches(
+    read: Reader,
+    offset: int = 0,
+    first_record: int = 1,
+    batch_rows: int = 1000,
+    chunk_bytes: int = READ_CHUNK_BYTES,
+) -> AsyncIterator[RecordBatch]:
+    """
+    CSV records as field lists, numbered from `first_record`. Quoted fields
+    may span lines, and a UTF-8 byte order mark at offset 0 is skipped.
+    """
+    batch, record, quotes = [], [], 0
+    position, number = offset, first_record
+
+    def take(raw: bytes) -> None:
+        nonlocal position, number
+        if position == 0 and raw.startswith(b"\xef\xbb\xbf"):
+            position, raw = 3, raw[3:]
+        position += len(raw)
+        batch.append((number, _parse_csv_record(raw)))
+        number += 1
+
+    async for line in _read_lines(read, chunk_bytes):
+        record.append(line)
+        # An odd quote count means a quoted field continues on the next line
+        quotes += line.count(b'"')
+        if quotes % 2:
+            continue
+        take(b"".join(record))
+        record, quotes = [], 0
+        if len(batch) >= batch_rows:
+            yield RecordBatch(batch, position, number - 1)
+            batch = []
+    if record:
+        take(b"".join(record))
+    if batch:
+        yield RecordBatch(batch, position, number - 1)
+
+
+class CsvImportParser(ImportParser):
+    """Base for parsers of CSV files with a header row."""
+
+    def read_batches(
+        self, read: Reader, offset: int = 0, first_record: int = 1, batch_rows: int = 1000,
+    ) -> AsyncIterator[RecordBatch]:
+        return read_csv_batches(read, offset, first_record, batch_rows)
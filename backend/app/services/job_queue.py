@@ -0,0 +1,259 @@
+"""
+Durable background job queue backed by the Postgres `jobs` table.
+
+Jobs are enqueued inside the caller's transaction, so they only become
+visible once the request commits. An in-process pool of asyncio workers
+claims them with SELECT ... FOR UPDATE SKIP LOCKED, which lets several
+app processes share one queue without double-processing a job.
+"""
+import asyncio
+import logging
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from sqlalchemy import select, update, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models import Job, JobStatus
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[AsyncSession, Job], Awaitable[dict | None]]
+
+JOB_HANDLERS: dict[str, JobHandler] = {}
+
+
+def register_job(kind: str):
+    """Decorator registering an async handler(db, job) for a job kind."""
+    def decorator(handler: JobHandler) -> JobHandler:
+        JOB_HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+
+async def enqueue_job(
+    db: AsyncSession,
+    kind: str,
+    payload: dict,
+    bar_id: uuid.UUID | None = None,
+    max_attempts: int | None = None,
+) -> Job:
+    """Add a job to the queue as part of the current transaction."""
+    if kind not in JOB_HANDLERS:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+
+    job = Job(
+        bar_id=bar_id,
+        kind=kind,
+        payload=payload,
+        status=JobStatus.QUEUED,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_after=datetime.utcnow(),
+    )
+    db.add(job)
+    await db.flush()
+    job_pool.notify()
+    return job
+
+
+async def run_job_inline(db: AsyncSession, job: Job) -> dict | None:
+    """Run a queued job immediately in the caller's transaction (no worker pool)."""
+    job.status = JobStatus.RUNNING
+    job.attempts += 1
+    job.started_at = datetime.utcnow()
+    job.result = await JOB_HANDLERS[job.kind](db, job)
+    job.status = JobStatus.SUCCEEDED
+    job.finished_at = datetime.utcnow()
+    await db.flush()
+    return job.result
+
+
+async def claim_next_job() -> Job | None:
+    """
+    Claim the oldest runnable job, committing the claim straight away so the
+    row lock is only held for the claim itself. Jobs left RUNNING by a worker
+    that died are reclaimed once their claim is older than
+    JOB_STALE_AFTER_SECONDS; live runs refresh it every JOB_HEARTBEAT_SECONDS.
+    """
+    now = datetime.utcnow()
+    stale_cutoff = now - timedelta(seconds=settings.JOB_STALE_AFTER_SECONDS)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Job)
+            .where(
+                or_(
+                    and_(Job.status == JobStatus.QUEUED, Job.run_after <= now),
+                    and_(Job.status == JobStatus.RUNNING, Job.locked_at < stale_cutoff),
+                )
+            )
+            .order_by(Job.run_after)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = result.scalar_one_or_none()
+        if job is None:
+            return None
+
+        job.status = JobStatus.RUNNING
+        job.attempts += 1
+        job.locked_at = now
+        job.started_at = job.started_at or now
+        await db.commit()
+        return job
+
+
+async def _heartbeat(job: Job) -> None:
+    """Keep a running job's claim fresh so it is not reclaimed as stale while it runs."""
+    while True:
+        await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(Job)
+                    .where(_current_run(job))
+                    .values(locked_at=datetime.utcnow())
+                )
+                await db.commit()
+        except Exception:
+            logger.exception("Heartbeat of job %s failed", job.id)
+
+
+def _current_run(job: Job):
+    """Matches the job row only while this claim of it is still the current one."""
+    return and_(Job.id == job.id, Job.status == JobStatus.RUNNING, Job.attempts == job.attempts)
+
+
+async def execute_job(job: Job) -> None:
+    """
+    Run a claimed job. The handler's writes and the success mark commit
+    together, and only if the job was not reclaimed from under this run in
+    the meantime.
+    """
+    handler = JOB_HANDLERS.get(job.kind)
+    heartbeat = asyncio.create_task(_heartbeat(job), name=f"job-heartbeat-{job.id}")
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+
+        async with AsyncSessionLocal() as db:
+            result = await handler(db, job)
+            marked = await db.execute(
+                update(Job)
+                .where(_current_run(job))
+                .values(
+                    status=JobStatus.SUCCEEDED,
+                    result=result,
+                    last_error=None,
+                    finished_at=datetime.utcnow(),
+                    updated_at=datetime.utcnow(),
+                )
+            )
+            if marked.rowcount == 0:
+                await db.rollback()
+                logger.warning("Job %s (%s) attempt %s was superseded, discarding its result", job.id, job.kind, job.attempts)
+                return
+            await db.commit()
+    except Exception:
+        error = traceback.format_exc(limit=5)
+        logger.exception("Job %s (%s) failed on attempt %s", job.id, job.kind, job.attempts)
+        try:
+            await _record_failure(job, error)
+        except Exception:
+            # The claim goes stale and the job is retried
+            logger.exception("Failed to record the failure of job %s", job.id)
+    finally:
+        heartbeat.cancel()
+
+
+async def _record_failure(job: Job, error: str) -> None:
+    """Requeue with linear backoff, or mark FAILED once attempts are exhausted."""
+    now = datetime.utcnow()
+    if job.attempts < job.max_attempts:
+        values = {
+            "status": JobStatus.QUEUED,
+            "run_after": now + timedelta(seconds=settings.JOB_RETRY_BACKOFF_SECONDS * job.attempts),
+        }
+    else:
+        values = {"status": JobStatus.FAILED, "finished_at": now}
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(Job)
+            .where(_current_run(job))
+            .values(**values, last_error=error, locked_at=None, updated_at=now)
+        )
+        await db.commit()
+
+
+class JobWorkerPool:
+    """In-process pool of asyncio workers draining the jobs table."""
+
+    def __init__(self):
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self, concurrency: int | None = None) -> None:
+        concurrency = settings.JOB_WORKER_CONCURRENCY if concurrency is None else concurrency
+        if self._tasks or concurrency <= 0:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(concurrency)
+        ]
+
+    def notify(self) -> None:
+        """Wake idle workers early, e.g. right after a job is enqueued."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """Stop claiming new jobs and wait for in-flight jobs to finish."""
+        if not self._tasks:
+            return
+        timeout = settings.JOB_DRAIN_TIMEOUT_SECONDS if timeout is None else timeout
+        self._stopping = True
+        self.notify()
+
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in pending:
+            # Jobs interrupted here stay RUNNING and are reclaimed as stale later
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        while not self._stopping:
+            try:
+                job = await claim_next_job()
+            except Exception:
+                logger.exception("Failed to claim job")
+                job = None
+
+            if job is not None:
+                try:
+                    await execute_job(job)
+                except Exception:
+                    logger.exception("Job %s (%s) crashed its worker", job.id, job.kind)
+                continue
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+
+job_pool = JobWorkerPool()
@@ -0,0 +1,215 @@
+"""
+Per-shift product ledger.
+
+Every write that changes what a shift sold or received also bumps the
+matching shift_product_ledger row in the same transaction, so
+reconciliation and shift listings read O(products) ledger rows instead of
+re-aggregating sales and stock movements.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import select, func, delete, insert, and_, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    Shift, ShiftStatus, SalesRecord, StockMovement, MovementType, ShiftProductLedger,
+)
+from app.services.partitions import history_start
+from app.services.rollups import roll_up_sales
+
+LEDGER_FIELDS = ("received", "sold", "sales_count", "revenue")
+
+# Keeps multi-row VALUES well under the 32,767 bind-parameter limit
+UPSERT_CHUNK_SIZE = 1000
+
+
+def _field(row, name):
+    return row[name] if isinstance(row, dict) else getattr(row, name)
+
+
+async def _upsert_increments(db: AsyncSession, bar_id, increments: dict) -> None:
+    """Add {(shift_id, product_id): {field: delta}} onto the ledger with chunked upserts."""
+    if not increments:
+        return
+
+    # Sorted keys give concurrent writers a consistent lock order
+    rows = [
+        {
+            "shift_id": shift_id,
+            "product_id": product_id,
+            "bar_id": bar_id,
+            "received": deltas.get("received", 0),
+            "sold": deltas.get("sold", 0),
+            "sales_count": deltas.get("sales_count", 0),
+            "revenue": deltas.get("revenue", 0),
+            "updated_at": datetime.utcnow(),
+        }
+        for (shift_id, product_id), deltas in sorted(increments.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1])))
+    ]
+
+    table = ShiftProductLedger.__table__
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = pg_insert(ShiftProductLedger).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.shift_id, table.c.product_id],
+            set_={
+                **{field: table.c[field] + stmt.excluded[field] for field in LEDGER_FIELDS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt)
+
+
+async def record_sales(db: AsyncSession, bar_id, sales: Iterable) -> None:
+    """
+    Add sales to the ledger and the daily product rollups. `sales` yields
+    objects or mappings with shift_id, product_id, quantity_sold and
+    sale_amount (and optionally created_at).
+    """
+    sales = list(sales)
+    increments: dict = defaultdict(lambda: defaultdict(float))
+    for sale in sales:
+        key = (_field(sale, "shift_id"), _field(sale, "product_id"))
+        increments[key]["sold"] += float(_field(sale, "quantity_sold"))
+        increments[key]["revenue"] += float(_field(sale, "sale_amount"))
+        increments[key]["sales_count"] += 1
+    await _upsert_increments(db, bar_id, increments)
+    await roll_up_sales(db, bar_id, sales)
+
+
+async def record_received(db: AsyncSession, bar_id, received: Iterable[tuple]) -> None:
+    """
+    Add stock IN quantities, given as (product_id, quantity) pairs, to every
+    shift currently open at the bar — the same shifts whose time window the
+    movement falls into.
+    """
+    totals: dict = defaultdict(float)
+    for product_id, quantity in received:
+        totals[product_id] += float(quantity)
+    if not totals:
+        return
+
+    open_result = await db.execute(
+        select(Shift.id).where(Shift.bar_id == bar_id, Shift.status == ShiftStatus.OPEN)
+    )
+    shift_ids = open_result.scalars().all()
+
+    increments = {
+        (shift_id, product_id): {"received": quantity}
+        for shift_id in shift_ids
+        for product_id, quantity in totals.items()
+    }
+    await _upsert_increments(db, bar_id, increments)
+
+
+async def compute_ledger_from_raw(db: AsyncSession, bar_id=None, since: datetime | None = None) -> dict:
+    """
+    Aggregate sales and IN movements into {(shift_id, product_id): totals},
+    optionally only for shifts opened at or after `since`.
+    """
+    expected: dict = defaultdict(lambda: dict.fromkeys(LEDGER_FIELDS, 0.0))
+    bar_ids: dict = {}
+
+    sales_query = select(
+        SalesRecord.shift_id,
+        SalesRecord.product_id,
+        SalesRecord.bar_id,
+        func.sum(SalesRecord.quantity_sold),
+        func.count(SalesRecord.id),
+        func.sum(SalesRecord.sale_amount),
+    ).group_by(SalesRecord.shift_id, SalesRecord.product_id, SalesRecord.bar_id)
+    if bar_id is not None:
+        sales_query = sales_query.where(SalesRecord.bar_id == bar_id)
+    if since is not None:
+        sales_query = sales_query.where(
+            SalesRecord.created_at >= since,
+            SalesRecord.shift_id.in_(select(Shift.id).where(Shift.start_time >= since)),
+        )
+
+    for shift_id, product_id, row_bar_id, sold, sales_count, revenue in (await db.execute(sales_query)).all():
+        key = (shift_id, product_id)
+        expected[key]["sold"] = float(sold or 0)
+        expected[key]["sales_count"] = sales_count
+        expected[key]["revenue"] = float(revenue or 0)
+        bar_ids[key] = row_bar_id
+
+    received_query = (
+        select(Shift.id, StockMovement.product_id, Shift.bar_id, func.sum(StockMovement.quantity))
+        .join(
+            StockMovement,
+            and_(
+                StockMovement.bar_id == Shift.bar_id,
+                StockMovement.type == MovementType.IN,
+                StockMovement.created_at >= Shift.start_time,
+                or_(Shift.end_time.is_(None), StockMovement.created_at <= Shift.end_time),
+            ),
+        )
+        .group_by(Shift.id, StockMovement.product_id, Shift.bar_id)
+    )
+    if bar_id is not None:
+        received_query = received_query.where(Shift.bar_id == bar_id)
+    if since is not None:
+        received_query = received_query.where(Shift.start_time >= since, StockMovement.created_at >= since)
+
+    for shift_id, product_id, row_bar_id, received in (await db.execute(received_query)).all():
+        key = (shift_id, product_id)
+        expected[key]["received"] = float(received or 0)
+        bar_ids[key] = row_bar_id
+
+    return {key: {**totals, "bar_id": bar_ids[key]} for key, totals in expected.items()}
+
+
+async def check_ledger(db: AsyncSession, bar_id=None, fix: bool = False) -> dict:
+    """
+    Rebuild the ledger from raw rows and report drift against the stored
+    ledger. With fix=True the stored rows in scope are replaced. Shifts
+    opened before the oldest attached sales partition are out of scope,
+    since archived months no longer have raw rows to rebuild from.
+    """
+    start = await history_start(db)
+    since = datetime.combine(start, datetime.min.time()) if start else None
+    expected = await compute_ledger_from_raw(db, bar_id, since)
+
+    in_scope = []
+    if bar_id is not None:
+        in_scope.append(ShiftProductLedger.bar_id == bar_id)
+    if since is not None:
+        in_scope.append(ShiftProductLedger.shift_id.in_(select(Shift.id).where(Shift.start_time >= since)))
+    stored_query = select(ShiftProductLedger).where(*in_scope)
+    stored = {
+        (row.shift_id, row.product_id): row
+        for row in (await db.execute(stored_query)).scalars().all()
+    }
+
+    missing = [key for key in expected if key not in stored]
+    extra = [key for key in stored if key not in expected and any(float(getattr(stored[key], f)) for f in LEDGER_FIELDS)]
+    mismatched = [
+        key for key in expected
+        if key in stored and any(
+            round(float(getattr(stored[key], field)), 2) != round(float(expected[key][field]), 2)
+            for field in LEDGER_FIELDS
+        )
+    ]
+
+    drift = {
+        "expected_rows": len(expected),
+        "stored_rows": len(stored),
+        "missing": len(missing),
+        "extra": len(extra),
+        "mismatched": len(mismatched),
+        "fixed": False,
+    }
+
+    if fix and (missing or extra or mismatched):
+        await db.execute(delete(ShiftProductLedger).where(*in_scope))
+        if expected:
+            await db.execute(insert(ShiftProductLedger), [
+                {"shift_id": shift_id, "product_id": product_id, **totals}
+                for (shift_id, product_id), totals in expected.items()
+            ])
+        drift["fixed"] = True
+
+    return drift
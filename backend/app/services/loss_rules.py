@@ -0,0 +1,158 @@
+"""
+Per-bar loss severity rules.
+
+Rules are stored in the loss_rules table and resolved per product by
+(category, unit): a rule naming both beats one naming either, which beats
+the bar default (neither); ties go to the higher priority. Products no
+rule matches use the built-in defaults, which reproduce the original
+hard-coded thresholds. Resolved rules are turned into per-row columns for
+the NumPy kernel, so a whole shift is judged in one vectorized pass.
+
+Rule sets are cached per bar for LOSS_RULE_CACHE_TTL_SECONDS; writes in
+this process invalidate the bar's entry as they commit, other processes
+pick changes up when their entry expires.
+"""
+import math
+import time
+from typing import Iterable, NamedTuple
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import LossRule, ToleranceType, ProductCategory, ProductUnit
+from app.services.reconciliation_kernel import (
+    TOLERANCE_PERCENT_OF_MIN_STOCK, TOLERANCE_PERCENT_OF_EXPECTED,
+    TOLERANCE_ABSOLUTE, TOLERANCE_ABSOLUTE_ML,
+)
+
+settings = get_settings()
+
+TOLERANCE_CODES = {
+    ToleranceType.PERCENT_OF_MIN_STOCK: TOLERANCE_PERCENT_OF_MIN_STOCK,
+    ToleranceType.PERCENT_OF_EXPECTED: TOLERANCE_PERCENT_OF_EXPECTED,
+    ToleranceType.ABSOLUTE: TOLERANCE_ABSOLUTE,
+    ToleranceType.ABSOLUTE_ML: TOLERANCE_ABSOLUTE_ML,
+}
+
+
+class ResolvedRule(NamedTuple):
+    tolerance_type: ToleranceType
+    tolerance: float
+    min_tolerance: float
+    warning_multiplier: float
+    critical_multiplier: float
+    warning_value: float | None
+    critical_value: float | None
+
+
+DEFAULT_RULE = ResolvedRule(ToleranceType.PERCENT_OF_MIN_STOCK, 10.0, 0.5, 1.5, 3.0, None, None)
+
+
+def _optional_float(value) -> float | None:
+    return None if value is None else float(value)
+
+
+def resolve_rule_fields(rule) -> ResolvedRule:
+    """Build a ResolvedRule from a LossRule row or a schema object with the same fields."""
+    return ResolvedRule(
+        tolerance_type=rule.tolerance_type,
+        tolerance=float(rule.tolerance),
+        min_tolerance=float(rule.min_tolerance),
+        warning_multiplier=float(rule.warning_multiplier),
+        critical_multiplier=float(rule.critical_multiplier),
+        warning_value=_optional_float(rule.warning_value),
+        critical_value=_optional_float(rule.critical_value),
+    )
+
+
+class LossRuleSet:
+    """A bar's active rules, resolvable per (category, unit)."""
+
+    def __init__(self, rules: Iterable = ()):
+        # Snapshot to plain tuples (the set outlives the session), most
+        # specific first, then highest priority
+        self._rules = sorted(
+            ((r.category, r.unit, r.priority or 0, resolve_rule_fields(r)) for r in rules),
+            key=lambda r: ((r[0] is not None) + (r[1] is not None), r[2]),
+            reverse=True,
+        )
+        self._resolved: dict[tuple, ResolvedRule] = {}
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def resolve(self, category: ProductCategory, unit: ProductUnit) -> ResolvedRule:
+        key = (category, unit)
+        if key not in self._resolved:
+            self._resolved[key] = next(
+                (
+                    rule for rule_category, rule_unit, _, rule in self._rules
+                    if rule_category in (None, category) and rule_unit in (None, unit)
+                ),
+                DEFAULT_RULE,
+            )
+        return self._resolved[key]
+
+    def rule_columns(self, products: Iterable[tuple]) -> dict[str, list]:
+        """
+        Kernel rule columns for (category, unit, volume_ml) rows, in order.
+        Rules are resolved once per distinct (category, unit) pair.
+        """
+        columns = {
+            name: [] for name in (
+                "tolerance_type", "tolerance", "min_tolerance", "warning_multiplier",
+                "critical_multiplier", "warning_value", "critical_value", "volume_ml",
+            )
+        }
+        for category, unit, volume_ml in products:
+            rule = self.resolve(category, unit)
+            columns["tolerance_type"].append(TOLERANCE_CODES[rule.tolerance_type])
+            columns["tolerance"].append(rule.tolerance)
+            columns["min_tolerance"].append(rule.min_tolerance)
+            columns["warning_multiplier"].append(rule.warning_multiplier)
+            columns["critical_multiplier"].append(rule.critical_multiplier)
+            columns["warning_value"].append(math.nan if rule.warning_value is None else rule.warning_value)
+            columns["critical_value"].append(math.nan if rule.critical_value is None else rule.critical_value)
+            if unit == ProductUnit.ML:
+                columns["volume_ml"].append(1.0)
+            else:
+                columns["volume_ml"].append(float(volume_ml) if volume_ml else math.nan)
+        return columns
+
+
+_cache: dict = {}
+_STALE_RULE_SETS = "loss_rules_stale_bars"
+
+
+def invalidate_loss_rules(db, bar_id) -> None:
+    """Drop a bar's cached rule set once the session commits; call after any rule write."""
+    session = db.sync_session if hasattr(db, "sync_session") else db
+    session.info.setdefault(_STALE_RULE_SETS, set()).add(bar_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_committed_rule_sets(session):
+    # Not before: a read between the flush and the commit would re-cache the old rules
+    for bar_id in session.info.pop(_STALE_RULE_SETS, ()):
+        _cache.pop(bar_id, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_rule_sets(session):
+    session.info.pop(_STALE_RULE_SETS, None)
+
+
+async def get_loss_rules(db: AsyncSession, bar_id) -> LossRuleSet:
+    """Active rule set for a bar, served from the per-bar cache when fresh."""
+    cached = _cache.get(bar_id)
+    if cached is not None and time.monotonic() - cached[0] < settings.LOSS_RULE_CACHE_TTL_SECONDS:
+        return cached[1]
+
+    result = await db.execute(
+        select(LossRule).where(LossRule.bar_id == bar_id, LossRule.is_active == True)
+    )
+    rule_set = LossRuleSet(result.scalars().all())
+    _cache[bar_id] = (time.monotonic(), rule_set)
+    return rule_set
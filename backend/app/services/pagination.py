@@ -0,0 +1,177 @@
+"""
+Keyset pagination and list totals.
+
+List endpoints order by a sort key plus id and hand out opaque cursors:
+`next_cursor` encodes the last row's key, and the page after it is the
+rows strictly beyond that key, one index range however deep the client
+has scrolled. `page` (OFFSET) is still honoured when no cursor is sent.
+
+Totals are picked per request with CountMode:
+
+- estimate (default): the planner's row estimate for the filtered query,
+  replaced by an exact count when it is under
+  PAGINATION_EXACT_COUNT_THRESHOLD (small results are cheap to count and
+  estimates are least reliable there);
+- cached: an exact count kept in the dashboard cache until the bar's next
+  committed write;
+- exact: count(*) on every call;
+- none: no total at all.
+"""
+import base64
+import enum
+import hashlib
+import json
+import uuid
+from datetime import date, datetime
+from typing import NamedTuple
+
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from app.config import get_settings
+from app.services.cache import dashboard_cache
+
+settings = get_settings()
+
+
+class CountMode(str, enum.Enum):
+    ESTIMATE = "estimate"
+    CACHED = "cached"
+    EXACT = "exact"
+    NONE = "none"
+
+
+class Page(NamedTuple):
+    rows: list
+    total: int | None
+    total_is_estimate: bool
+    next_cursor: str | None
+
+
+class _Explain(Executable, ClauseElement):
+    """EXPLAIN (FORMAT JSON) of a statement, with its parameters still bound."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(_Explain, "postgresql")
+def _compile_explain(element, compiler, **kw):
+    return "EXPLAIN (FORMAT JSON) " + compiler.process(element.statement, **kw)
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _decode_value(value, python_type):
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    if not isinstance(value, python_type):
+        raise TypeError(value)
+    return value
+
+
+def encode_cursor(kind: str, values: tuple) -> str:
+    payload = json.dumps({"k": kind, "v": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(kind: str, token: str, sort_key: tuple) -> tuple:
+    """Key values of a cursor for `kind`; raises ValueError for anything else."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        values = payload["v"]
+        if payload["k"] != kind or len(values) != len(sort_key):
+            raise ValueError
+        return tuple(_decode_value(v, column.type.python_type) for v, column in zip(values, sort_key))
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise ValueError("Invalid cursor")
+
+
+async def _estimate_rows(db: AsyncSession, query) -> int:
+    plan = (await db.execute(_Explain(query))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def _exact_rows(db: AsyncSession, query) -> int:
+    result = await db.execute(select(func.count()).select_from(query.subquery()))
+    return result.scalar() or 0
+
+
+def _query_fingerprint(query) -> str:
+    compiled = query.compile(dialect=postgresql.dialect())
+    params = sorted((name, repr(value)) for name, value in compiled.params.items())
+    return hashlib.sha1(f"{compiled}|{params}".encode()).hexdigest()[:16]
+
+
+async def count_rows(db: AsyncSession, query, mode: CountMode, kind: str, bar_id) -> tuple[int | None, bool]:
+    """(total, is_estimate) of a filtered list query under the given count mode."""
+    if mode == CountMode.NONE:
+        return None, False
+    if mode == CountMode.EXACT:
+        return await _exact_rows(db, query), False
+    if mode == CountMode.CACHED:
+        total = await dashboard_cache.get_or_compute(
+            f"count:{kind}", bar_id, lambda: _exact_rows(db, query), variant=_query_fingerprint(query),
+        )
+        return total, False
+
+    estimate = await _estimate_rows(db, query)
+    if estimate < settings.PAGINATION_EXACT_COUNT_THRESHOLD:
+        return await _exact_rows(db, query), False
+    return estimate, True
+
+
+async def paginate(
+    db: AsyncSession,
+    query,
+    sort_key: tuple,
+    *,
+    kind: str,
+    bar_id,
+    limit: int,
+    page: int = 1,
+    cursor: str | None = None,
+    descending: bool = True,
+    count: CountMode = CountMode.ESTIMATE,
+) -> Page:
+    """
+    One page of the ORM entities `query` selects, ordered by `sort_key`
+    (sort column(s) ending with the primary key). Starts after `cursor`
+    when one is given, otherwise at OFFSET (page - 1) * limit. Raises
+    ValueError for a malformed cursor or one from another listing.
+    """
+    total, is_estimate = await count_rows(db, query, count, kind, bar_id)
+
+    ordered = query.order_by(*(column.desc() if descending else column for column in sort_key))
+    if cursor is not None:
+        after = decode_cursor(kind, cursor, sort_key)
+        key = tuple_(*sort_key)
+        ordered = ordered.where(key < after if descending else key > after)
+    else:
+        ordered = ordered.offset((page - 1) * limit)
+
+    # One extra row tells whether a next page exists
+    result = await db.execute(ordered.limit(limit + 1))
+    rows = list(result.scalars().all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(kind, tuple(getattr(rows[-1], column.key) for column in sort_key))
+    return Page(rows, total, is_estimate, next_cursor)
@@ -0,0 +1,194 @@
+"""
+Monthly partitions of the history tables.
+
+sales_records, stock_movements and loss_reports only grow, and every
+query on them is scoped to a bar and a period, so they are range-partitioned
+by month on created_at (declared on the models; migrate_partition_history.py
+converts an existing database). Each month is a plain table named
+<table>_pYYYYMM. There is no default partition: a row whose month has no
+partition fails to insert rather than landing somewhere it would later
+block creating that month.
+
+ensure_partitions creates the current month through PARTITION_MONTHS_AHEAD
+months ahead. It runs at startup and every PARTITION_CHECK_INTERVAL_SECONDS
+(start_partition_maintenance), serialised across processes with an
+advisory lock. detach_partitions_before detaches old months for archival
+(archive_partitions.py); detached tables keep their data until dropped.
+
+Postgres prunes partitions from created_at conditions. Queries scoped by
+business date add business_date_window, and shift-scoped queries bound
+created_at by the shift's start (sales, movements and loss reports are
+never recorded before their shift opens), so the months they read stay
+the same however much history accumulates.
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import and_, text
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("sales_records", "stock_movements", "loss_reports")
+
+# Widest gap between a row's created_at (UTC) and midnight of its business
+# date: time zone offsets, the cutover hour and later clock changes
+CREATED_AT_SLACK = timedelta(days=3)
+
+_PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<month>\d{6})$")
+_LOCK_ID = "partition_maintenance"
+
+
+def month_start(moment: date) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def partition_parent(name: str) -> str | None:
+    """The partitioned table a <table>_pYYYYMM name belongs to, if any."""
+    match = _PARTITION_NAME.match(name)
+    if match and match["table"] in PARTITIONED_TABLES:
+        return match["table"]
+    return None
+
+
+def business_date_window(model, first: date, last: date | None = None):
+    """
+    created_at bounds implied by business_date between first and last, for
+    partition pruning. Loss reports are created when their shift is
+    reconciled, any time after its business date, so they only get a lower
+    bound.
+    """
+    lower = model.created_at >= datetime.combine(first, time.min) - CREATED_AT_SLACK
+    if model.__tablename__ == "loss_reports":
+        return lower
+    upper = model.created_at < datetime.combine(last or first, time.min) + timedelta(days=1) + CREATED_AT_SLACK
+    return and_(lower, upper)
+
+
+async def list_partitions(conn) -> dict[str, list[str]]:
+    """
+    Attached partitions of each partitioned table, oldest first. Tables
+    not (yet) partitioned, on a database awaiting the migration, are left out.
+    """
+    result = await conn.execute(text("""
+        SELECT parent.relname, child.relname
+        FROM pg_class parent
+        LEFT JOIN pg_inherits ON pg_inherits.inhparent = parent.oid
+        LEFT JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = ANY(:tables) AND parent.relkind = 'p'
+        ORDER BY child.relname
+    """), {"tables": list(PARTITIONED_TABLES)})
+    partitions: dict[str, list[str]] = {}
+    for parent, child in result.all():
+        names = partitions.setdefault(parent, [])
+        if child is not None:
+            names.append(child)
+    return partitions
+
+
+async def history_start(conn, table: str = "sales_records") -> date | None:
+    """First day of the table's oldest attached month, None when it has no partitions."""
+    names = (await list_partitions(conn)).get(table)
+    if not names:
+        return None
+    month = _PARTITION_NAME.match(names[0])["month"]
+    return date(int(month[:4]), int(month[4:]), 1)
+
+
+async def ensure_partitions(conn, first: date | None = None, months_ahead: int | None = None) -> list[str]:
+    """
+    Create missing monthly partitions from `first`'s month (default: this
+    month) through `months_ahead` months from now, in the caller's
+    transaction. Returns the names created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.PARTITION_MONTHS_AHEAD
+    this_month = month_start(datetime.utcnow().date())
+    month = month_start(first or this_month)
+    last = add_months(this_month, months_ahead)
+
+    await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:lock))"), {"lock": _LOCK_ID})
+    partitions = await list_partitions(conn)
+    existing = {name for names in partitions.values() for name in names}
+    created = []
+    while month <= last:
+        for table in partitions:
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            await conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+            ))
+            created.append(name)
+        month = add_months(month, 1)
+    return created
+
+
+async def detach_partitions_before(conn, before: date) -> list[str]:
+    """
+    Detach every partition of a month before `before`'s month and forget
+    the idempotency keys of its rows. `conn` must be in AUTOCOMMIT mode
+    (DETACH ... CONCURRENTLY). Returns the names detached.
+    """
+    cutoff = month_start(before)
+    detached = []
+    for table, names in (await list_partitions(conn)).items():
+        for name in names:
+            month = _PARTITION_NAME.match(name)["month"]
+            if date(int(month[:4]), int(month[4:]), 1) >= cutoff:
+                continue
+            await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} CONCURRENTLY"))
+            detached.append(name)
+        await conn.execute(
+            text("DELETE FROM idempotency_keys WHERE table_name = :table AND record_created_at < :cutoff"),
+            {"table": table, "cutoff": datetime.combine(cutoff, time.min)},
+        )
+    return detached
+
+
+async def _maintain_partitions() -> None:
+    while True:
+        await asyncio.sleep(settings.PARTITION_CHECK_INTERVAL_SECONDS)
+        try:
+            async with AsyncSessionLocal() as db:
+                created = await ensure_partitions(db)
+                await db.commit()
+            if created:
+                logger.info("Created partitions %s", ", ".join(created))
+        except Exception:
+            logger.exception("Partition maintenance failed")
+
+
+_maintenance: asyncio.Task | None = None
+
+
+def start_partition_maintenance() -> None:
+    global _maintenance
+    if _maintenance is None:
+        _maintenance = asyncio.create_task(_maintain_partitions(), name="partition-maintenance")
+
+
+async def stop_partition_maintenance() -> None:
+    global _maintenance
+    if _maintenance is not None:
+        _maintenance.cancel()
+        try:
+            await _maintenance
+        except asyncio.CancelledError:
+            pass
+        _maintenance = None
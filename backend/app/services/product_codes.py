@@ -0,0 +1,50 @@
+"""
+Barcode / SKU resolution for scanner-driven stock counts.
+
+Codes are matched against a bar's products in one query, served by the
+unique (bar_id, barcode) and (bar_id, sku) indexes. A code that is one
+product's barcode and another's SKU resolves to the barcode match.
+"""
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Product
+
+
+def normalize_code(value: str | None) -> str | None:
+    """Scanned or typed code with surrounding whitespace removed; blank means none."""
+    if value is None:
+        return None
+    value = value.strip()
+    return value or None
+
+
+async def resolve_codes(db: AsyncSession, bar_id, codes) -> dict[str, Product]:
+    """Products of the bar keyed by the codes that matched them; unknown codes are absent."""
+    codes = {code for code in (normalize_code(c) for c in codes) if code}
+    if not codes:
+        return {}
+
+    result = await db.execute(
+        select(Product).where(
+            Product.bar_id == bar_id,
+            or_(Product.barcode.in_(codes), Product.sku.in_(codes)),
+        )
+    )
+    by_sku, by_barcode = {}, {}
+    for product in result.scalars().all():
+        if product.sku in codes:
+            by_sku[product.sku] = product
+        if product.barcode in codes:
+            by_barcode[product.barcode] = product
+    return {**by_sku, **by_barcode}
+
+
+async def find_code_conflict(db: AsyncSession, bar_id, field: str, value: str, exclude_id=None) -> Product | None:
+    """Another product of the bar already holding `value` as its barcode or sku."""
+    column = getattr(Product, field)
+    query = select(Product).where(Product.bar_id == bar_id, column == value)
+    if exclude_id is not None:
+        query = query.where(Product.id != exclude_id)
+    result = await db.execute(query.limit(1))
+    return result.scalar_one_or_none()
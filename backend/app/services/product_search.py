@@ -0,0 +1,238 @@
+"""
+Product search with typo tolerance.
+
+Two backends rank active products against a free-text query:
+
+- trigram: Postgres pg_trgm. A GIN index over products.name
+  (migrate_add_product_search.py) serves both substring matches and word
+  similarity, so misspellings like "jamesen" still find "Jameson".
+- memory: an in-process per-bar index of the same trigrams plus a sorted
+  word list for prefixes, for databases without pg_trgm. A type-ahead
+  lookup stays within a few milliseconds at 10k+ SKUs.
+
+PRODUCT_SEARCH_BACKEND picks one ("trigram" or "memory"). The default,
+"auto", uses pg_trgm when the extension is installed. In-process indexes
+only hold ids, names and categories; they are cached per bar for
+PRODUCT_SEARCH_INDEX_TTL_SECONDS and dropped when product writes in this
+process commit. Stock and prices are always read fresh for the ranked hits.
+"""
+import bisect
+import heapq
+import math
+import re
+import time
+import uuid
+from collections import Counter
+from typing import NamedTuple
+
+from sqlalchemy import case, event, func, literal, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models import Product, ProductCategory
+
+settings = get_settings()
+
+_WORD = re.compile(r"\w+")
+
+# Share of the query's trigrams a name must contain to count as a match,
+# pg_trgm's default word_similarity_threshold
+MATCH_THRESHOLD = 0.6
+
+
+class IndexedProduct(NamedTuple):
+    id: uuid.UUID
+    name: str
+    category: ProductCategory
+
+
+def words(value: str) -> list[str]:
+    return _WORD.findall(value.lower())
+
+
+def trigrams(value: str) -> set[str]:
+    """pg_trgm-style trigrams: each word padded with two leading blanks and one trailing."""
+    grams = set()
+    for word in words(value):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class ProductSearchIndex:
+    """Trigram postings and a sorted word list over one bar's active products."""
+
+    def __init__(self, products: list[IndexedProduct]):
+        self.products = products
+        self.names = [product.name.lower() for product in products]
+        self.postings: dict[str, list[int]] = {}
+        word_entries = []
+        for position, product in enumerate(products):
+            for gram in trigrams(product.name):
+                self.postings.setdefault(gram, []).append(position)
+            word_entries.extend((word, position) for word in set(words(product.name)))
+        word_entries.sort()
+        self.words = [word for word, _ in word_entries]
+        self.word_positions = [position for _, position in word_entries]
+
+    def _prefixed(self, prefix: str) -> set[int]:
+        start = bisect.bisect_left(self.words, prefix)
+        end = bisect.bisect_left(self.words, prefix + "￿")
+        return set(self.word_positions[start:end])
+
+    def search(
+        self, query: str, limit: int = 20, category: ProductCategory | None = None,
+    ) -> list[tuple[IndexedProduct, float]]:
+        """
+        (product, score) pairs, best first. The score is the share of the
+        query's trigrams the name contains, plus 1 when the name starts
+        with the query or 0.5 when one of its words does.
+        """
+        query = query.strip().lower()
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+
+        shared = Counter()
+        for gram in query_grams:
+            shared.update(self.postings.get(gram, ()))
+        # The last word is the one still being typed
+        prefixed = self._prefixed(words(query)[-1])
+        min_shared = math.ceil(MATCH_THRESHOLD * len(query_grams))
+        candidates = prefixed.union(position for position, count in shared.items() if count >= min_shared)
+
+        scored = []
+        for position in candidates:
+            if category is not None and self.products[position].category != category:
+                continue
+            score = shared.get(position, 0) / len(query_grams)
+            if self.names[position].startswith(query):
+                score += 1.0
+            elif position in prefixed:
+                score += 0.5
+            scored.append((-score, self.names[position], position))
+        best = heapq.nsmallest(limit, scored)
+        return [(self.products[position], round(-score, 3)) for score, _, position in best]
+
+
+_cache: dict = {}
+_trigram_available: bool | None = None
+_STALE_INDEXES = "product_search_stale_bars"
+
+
+def invalidate_product_index(db, bar_id) -> None:
+    """Drop a bar's in-process search index once the session commits; call after product writes."""
+    session = db.sync_session if hasattr(db, "sync_session") else db
+    session.info.setdefault(_STALE_INDEXES, set()).add(bar_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _drop_committed_indexes(session):
+    # Not before: a search between the flush and the commit would rebuild from the old catalog
+    for bar_id in session.info.pop(_STALE_INDEXES, ()):
+        _cache.pop(bar_id, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_indexes(session):
+    session.info.pop(_STALE_INDEXES, None)
+
+
+async def get_product_index(db: AsyncSession, bar_id) -> ProductSearchIndex:
+    """The bar's in-process search index, rebuilt when stale."""
+    cached = _cache.get(bar_id)
+    if cached is not None and time.monotonic() - cached[0] < settings.PRODUCT_SEARCH_INDEX_TTL_SECONDS:
+        return cached[1]
+
+    result = await db.execute(
+        select(Product.id, Product.name, Product.category)
+        .where(Product.bar_id == bar_id, Product.is_active == True)
+    )
+    index = ProductSearchIndex([IndexedProduct(*row) for row in result.all()])
+    _cache[bar_id] = (time.monotonic(), index)
+    return index
+
+
+async def _has_pg_trgm(db: AsyncSession) -> bool:
+    global _trigram_available
+    if _trigram_available is None:
+        result = await db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'"))
+        _trigram_available = result.scalar() is not None
+    return _trigram_available
+
+
+async def search_backend(db: AsyncSession) -> str:
+    if settings.PRODUCT_SEARCH_BACKEND != "auto":
+        return settings.PRODUCT_SEARCH_BACKEND
+    return "trigram" if await _has_pg_trgm(db) else "memory"
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def name_contains(value: str):
+    """Filter for product names containing `value` literally, case-insensitive (% and _ included)."""
+    return Product.name.ilike(f"%{_like_escape(value.strip())}%", escape="\\")
+
+
+async def _trigram_search(
+    db: AsyncSession, bar_id, query: str, limit: int, category: ProductCategory | None,
+) -> list[tuple[Product, float]]:
+    query = query.strip().lower()
+    escaped = _like_escape(query)
+    # Same shape as ProductSearchIndex.search: similarity plus a prefix boost
+    score = func.word_similarity(query, Product.name) + case(
+        (Product.name.ilike(f"{escaped}%", escape="\\"), 1.0), else_=0.0,
+    )
+    stmt = (
+        select(Product, score)
+        .where(
+            Product.bar_id == bar_id,
+            Product.is_active == True,
+            # Both predicates are served by the gin_trgm_ops index on name
+            or_(Product.name.ilike(f"%{escaped}%", escape="\\"), literal(query).op("<%")(Product.name)),
+        )
+        .order_by(score.desc(), func.lower(Product.name))
+        .limit(limit)
+    )
+    if category is not None:
+        stmt = stmt.where(Product.category == category)
+    result = await db.execute(stmt)
+    return [(product, round(float(value), 3)) for product, value in result.all()]
+
+
+async def _memory_search(
+    db: AsyncSession, bar_id, query: str, limit: int, category: ProductCategory | None,
+) -> list[tuple[Product, float]]:
+    index = await get_product_index(db, bar_id)
+    ranked = index.search(query, limit, category)
+    if not ranked:
+        return []
+    result = await db.execute(
+        select(Product).where(
+            Product.id.in_([entry.id for entry, _ in ranked]),
+            Product.bar_id == bar_id,
+            Product.is_active == True,
+        )
+    )
+    products = {product.id: product for product in result.scalars().all()}
+    return [(products[entry.id], score) for entry, score in ranked if entry.id in products]
+
+
+async def search_products(
+    db: AsyncSession, bar_id, query: str, limit: int = 20, category: ProductCategory | None = None,
+) -> tuple[str, list[tuple[Product, float]]]:
+    """(backend used, ranked (product, score) pairs) for a free-text product query."""
+    backend = await search_backend(db)
+    if backend == "trigram":
+        return backend, await _trigram_search(db, bar_id, query, limit, category)
+    return backend, await _memory_search(db, bar_id, query, limit, category)
+
+
+async def suggest_product_name(db: AsyncSession, bar_id, name: str) -> str | None:
+    """Closest active product name for an unknown one, from the in-process index."""
+    index = await get_product_index(db, bar_id)
+    ranked = index.search(name, limit=1)
+    return ranked[0][0].name if ranked else None
@@ -1,29 +1,404 @@
+import math
+import uuid
 from datetime import datetime
-from decimal import Decimal
-from sqlalchemy import select, func
+from sqlalchemy import select, func, insert, update, delete, and_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.config import get_settings
 from app.models import (
     Product, Shift, ShiftStockCount, SalesRecord,
     StockMovement, MovementType, DailyReconciliation,
-    LossReport, LossSeverity,
+    LossReport, LossSeverity, Job, ShiftProductLedger, ProductDiscrepancyStats,
 )
+from app.services.job_queue import register_job
+from app.services.cache import mark_bar_dirty
+from app.services.loss_rules import LossRuleSet, get_loss_rules
+from app.services.partitions import business_date_window
+from app.services.discrepancy_stats import learned_threshold_params, record_discrepancies, stats_columns
+from app.services.scorecards import refresh_shift_scorecards
+from app.services.rollups import refresh_rollup_days, roll_up_losses
+from app.services.reconciliation_kernel import SEVERITY_BY_CODE, compute_discrepancies
 
+settings = get_settings()
 
-async def run_reconciliation(db: AsyncSession, bar_id, shift_id):
+RECONCILE_SHIFT_JOB = "reconcile_shift"
+
+
+def loss_threshold(min_stock_threshold: float) -> float:
+    """Loss threshold for a product: 10% of its min stock threshold, never below 0.5."""
+    threshold = float(min_stock_threshold) * 0.1
+    if threshold < 0.5:
+        threshold = 0.5
+    return threshold
+
+
+def classify_discrepancy(discrepancy: float, threshold: float) -> LossSeverity | None:
+    """Return the loss severity for a discrepancy, or None if it is within threshold."""
+    if abs(discrepancy) <= threshold:
+        return None
+    if abs(discrepancy) > threshold * 3:
+        return LossSeverity.CRITICAL
+    if abs(discrepancy) > threshold * 1.5:
+        return LossSeverity.WARNING
+    return LossSeverity.INFO
+
+
+async def _load_shift_inputs(db: AsyncSession, shift_id, weekday: int) -> list:
+    """
+    Counted products with their product fields, shift ledger totals and
+    discrepancy stats for the weekday, in one query.
+    """
+    counts_result = await db.execute(
+        select(
+            ShiftStockCount.product_id,
+            ShiftStockCount.opening_count,
+            ShiftStockCount.closing_count,
+            Product.name,
+            Product.category,
+            Product.unit,
+            Product.volume_ml,
+            Product.cost_price,
+            Product.min_stock_threshold,
+            func.coalesce(ShiftProductLedger.received, 0).label("received"),
+            func.coalesce(ShiftProductLedger.sold, 0).label("sold"),
+            ProductDiscrepancyStats.n.label("stats_n"),
+            ProductDiscrepancyStats.mean.label("stats_mean"),
+            ProductDiscrepancyStats.m2.label("stats_m2"),
+        )
+        .join(Product, Product.id == ShiftStockCount.product_id)
+        .outerjoin(
+            ShiftProductLedger,
+            and_(
+                ShiftProductLedger.shift_id == ShiftStockCount.shift_id,
+                ShiftProductLedger.product_id == ShiftStockCount.product_id,
+            ),
+        )
+        .outerjoin(
+            ProductDiscrepancyStats,
+            and_(
+                ProductDiscrepancyStats.product_id == ShiftStockCount.product_id,
+                ProductDiscrepancyStats.weekday == weekday,
+            ),
+        )
+        .where(
+            ShiftStockCount.shift_id == shift_id,
+            ShiftStockCount.closing_count.is_not(None),
+        )
+    )
+    return counts_result.all()
+
+
+def _reconcile_counts(counts: list, rule_set: LossRuleSet) -> list[tuple]:
+    """
+    Reconciliation column values, loss severity, loss value, rule threshold
+    and z-score (None during warm-up) for every counted product, judged in
+    one kernel pass by learned stats where available, else the bar's rules.
+    """
+    if not counts:
+        return []
+    learned = {**stats_columns(counts), **learned_threshold_params()} if settings.LOSS_STATS_ENABLED else {}
+    computed = compute_discrepancies(
+        opening=[float(c.opening_count) for c in counts],
+        received=[float(c.received) for c in counts],
+        sold=[float(c.sold) for c in counts],
+        actual_closing=[float(c.closing_count) for c in counts],
+        min_stock_threshold=[float(c.min_stock_threshold) for c in counts],
+        cost_price=[float(c.cost_price) for c in counts],
+        **rule_set.rule_columns((c.category, c.unit, c.volume_ml) for c in counts),
+        **learned,
+    )
+    expected_closing = computed["expected_closing"].tolist()
+    discrepancy = computed["discrepancy"].tolist()
+    threshold = computed["threshold"].tolist()
+    z_score = computed["z_score"].tolist()
+    severity = computed["severity"].tolist()
+    loss_value = computed["loss_value"].tolist()
+
+    results = []
+    for i, count in enumerate(counts):
+        values = {
+            "opening_stock": float(count.opening_count),
+            "received": float(count.received),
+            "sold": float(count.sold),
+            "expected_closing": expected_closing[i],
+            "actual_closing": float(count.closing_count),
+            "discrepancy": discrepancy[i],
+        }
+        z = None if math.isnan(z_score[i]) else z_score[i]
+        results.append((values, SEVERITY_BY_CODE[severity[i]], loss_value[i], threshold[i], z))
+    return results
+
+
+async def run_reconciliation(db: AsyncSession, bar_id, shift_id, set_based: bool = True):
     """
     Run the reconciliation engine for a specific shift.
     Calculates expected vs actual closing stock for every product
     and generates loss reports for discrepancies above threshold.
 
-    This runs SYNCHRONOUSLY on shift close. (Celery deferred to Phase 2)
+    The default set-based mode reads counts, product fields and the shift's
+    received/sold totals from shift_product_ledger in a single query, judges
+    every product against its learned discrepancy stats (or, during warm-up,
+    the bar's loss rules) in one kernel pass and writes each output table
+    with a single bulk statement. The shift's discrepancies are then folded
+    into the weekday stats and the shift's staff scorecard is refreshed.
+    Pass set_based=False to use the original per-product loop, which only
+    knows the built-in default thresholds.
+
+    On shift close this runs in the background job queue
+    (see reconcile_shift_job).
     """
+    if not set_based:
+        return await _run_reconciliation_per_product(db, bar_id, shift_id)
+
+    shift_result = await db.execute(select(Shift.business_date).where(Shift.id == shift_id))
+    business_date = shift_result.scalar_one()
+    counts = await _load_shift_inputs(db, shift_id, business_date.weekday())
+    if not counts:
+        return [], []
+    rule_set = await get_loss_rules(db, bar_id)
+
+    reconciliation_rows = []
+    loss_rows = []
+
+    for count, (values, severity, loss_value, _, _) in zip(counts, _reconcile_counts(counts, rule_set)):
+        recon_id = uuid.uuid4()
+        reconciliation_rows.append({
+            "id": recon_id,
+            "bar_id": bar_id,
+            "shift_id": shift_id,
+            "product_id": count.product_id,
+            "date": business_date,
+            **values,
+        })
+
+        if severity is not None:
+            loss_rows.append({
+                "id": uuid.uuid4(),
+                "bar_id": bar_id,
+                "reconciliation_id": recon_id,
+                "product_id": count.product_id,
+                "shift_id": shift_id,
+                "discrepancy_quantity": abs(values["discrepancy"]),
+                "loss_value": loss_value,
+                "severity": severity,
+                "business_date": business_date,
+            })
+
+    await db.execute(insert(DailyReconciliation), reconciliation_rows)
+    if loss_rows:
+        await db.execute(insert(LossReport), loss_rows)
+        await roll_up_losses(db, bar_id, loss_rows)
+
+    mark_bar_dirty(db, bar_id)
+
+    await record_discrepancies(
+        db, bar_id, business_date.weekday(),
+        [(row["product_id"], row["discrepancy"]) for row in reconciliation_rows],
+    )
+
+    # Update product current stock to actual closing count, in one UPDATE ... FROM
+    await db.execute(
+        update(Product)
+        .where(
+            Product.id == ShiftStockCount.product_id,
+            ShiftStockCount.shift_id == shift_id,
+            ShiftStockCount.closing_count.is_not(None),
+        )
+        .values(current_stock=ShiftStockCount.closing_count, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+    await refresh_shift_scorecards(db, bar_id, [shift_id])
+
+    return reconciliation_rows, loss_rows
+
+
+@register_job(RECONCILE_SHIFT_JOB)
+async def reconcile_shift_job(db: AsyncSession, job: Job) -> dict:
+    """Job handler: reconcile the shift named in the job payload."""
+    shift_id = uuid.UUID(job.payload["shift_id"])
+    reconciliation_rows, loss_rows = await run_reconciliation(db, job.bar_id, shift_id)
+    return {
+        "shift_id": str(shift_id),
+        "reconciled_products": len(reconciliation_rows),
+        "loss_reports": len(loss_rows),
+    }
+
+
+def _money(value) -> float:
+    return round(float(value), 2)
+
+
+async def rereconcile_shift(db: AsyncSession, bar_id, shift_id, business_date) -> dict:
+    """
+    Idempotently re-run reconciliation for one shift after a correction.
+
+    Reconciliation rows are upserted on (shift_id, product_id) and only
+    products whose inputs or results changed are written. Loss reports of
+    changed products are updated in place, keeping reason codes and review
+    fields; unreviewed reports whose discrepancy is now within threshold are
+    removed, reviewed ones are kept. Product stock and discrepancy stats
+    are not touched; the stats keep the discrepancy as seen at close. The
+    staff scorecard and the daily rollups of the affected days are
+    refreshed when loss reports change.
+    """
+    counts = await _load_shift_inputs(db, shift_id, business_date.weekday())
+    rule_set = await get_loss_rules(db, bar_id)
+
+    existing_recon = await db.execute(
+        select(DailyReconciliation).where(DailyReconciliation.shift_id == shift_id)
+    )
+    recon_by_product = {r.product_id: r for r in existing_recon.scalars().all()}
+
+    existing_losses = await db.execute(
+        select(LossReport).where(
+            LossReport.shift_id == shift_id,
+            business_date_window(LossReport, business_date),
+        )
+    )
+    loss_by_product = {r.product_id: r for r in existing_losses.scalars().all()}
+
+    summary = {
+        "shift_id": shift_id,
+        "unchanged": 0,
+        "created": 0,
+        "updated": 0,
+        "loss_reports_created": 0,
+        "loss_reports_updated": 0,
+        "loss_reports_removed": 0,
+        "reviews_kept": 0,
+        "changes": [],
+    }
+
+    upserts = []
+    pending_losses = []
+    for count, (values, severity, loss_value, _, _) in zip(counts, _reconcile_counts(counts, rule_set)):
+        recon = recon_by_product.get(count.product_id)
+        loss = loss_by_product.get(count.product_id)
+
+        recon_changed = recon is None or any(
+            _money(getattr(recon, field)) != _money(value) for field, value in values.items()
+        )
+        if severity is None:
+            # Reviewed reports are kept even once the discrepancy is within threshold
+            loss_changed = loss is not None and loss.reviewed_by is None
+        else:
+            loss_changed = loss is None or (
+                loss.severity != severity
+                or _money(loss.loss_value) != _money(loss_value)
+                or _money(loss.discrepancy_quantity) != _money(abs(values["discrepancy"]))
+            )
+        if not recon_changed and not loss_changed:
+            summary["unchanged"] += 1
+            continue
+
+        summary["created" if recon is None else "updated"] += 1
+        summary["changes"].append({
+            "product_id": count.product_id,
+            "discrepancy_before": float(recon.discrepancy) if recon else None,
+            "discrepancy_after": values["discrepancy"],
+            "severity_before": loss.severity if loss else None,
+            "severity_after": severity,
+        })
+        upserts.append({
+            "id": recon.id if recon else uuid.uuid4(),
+            "bar_id": bar_id,
+            "shift_id": shift_id,
+            "product_id": count.product_id,
+            "date": recon.date if recon else business_date,
+            **values,
+        })
+        pending_losses.append((count.product_id, values, severity, loss_value, loss))
+
+    if upserts:
+        stmt = pg_insert(DailyReconciliation).values(upserts)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DailyReconciliation.shift_id, DailyReconciliation.product_id],
+            set_={
+                field: stmt.excluded[field]
+                for field in ("opening_stock", "received", "sold", "expected_closing", "actual_closing", "discrepancy")
+            },
+        ).returning(DailyReconciliation.product_id, DailyReconciliation.id)
+        recon_ids = dict((await db.execute(stmt)).all())
+
+    new_losses = []
+    removed_loss_ids = []
+    for product_id, values, severity, loss_value, loss in pending_losses:
+        if severity is not None and loss is None:
+            new_losses.append({
+                "id": uuid.uuid4(),
+                "bar_id": bar_id,
+                "reconciliation_id": recon_ids[product_id],
+                "product_id": product_id,
+                "shift_id": shift_id,
+                "discrepancy_quantity": abs(values["discrepancy"]),
+                "loss_value": loss_value,
+                "severity": severity,
+                "business_date": business_date,
+            })
+        elif severity is not None:
+            loss.discrepancy_quantity = abs(values["discrepancy"])
+            loss.loss_value = loss_value
+            loss.severity = severity
+            summary["loss_reports_updated"] += 1
+            if loss.reviewed_by is not None:
+                summary["reviews_kept"] += 1
+        elif loss is not None and loss.reviewed_by is None:
+            removed_loss_ids.append(loss.id)
+        elif loss is not None:
+            summary["reviews_kept"] += 1
+
+    if new_losses:
+        await db.execute(insert(LossReport), new_losses)
+    if removed_loss_ids:
+        await db.execute(delete(LossReport).where(LossReport.id.in_(removed_loss_ids)))
+    if new_losses or removed_loss_ids:
+        mark_bar_dirty(db, bar_id)
+    await db.flush()
+    if new_losses or removed_loss_ids or summary["loss_reports_updated"]:
+        await refresh_shift_scorecards(db, bar_id, [shift_id])
+        await refresh_rollup_days(
+            db, bar_id, {loss.business_date for loss in loss_by_product.values()} | {business_date},
+        )
+
+    summary["loss_reports_created"] = len(new_losses)
+    summary["loss_reports_removed"] = len(removed_loss_ids)
+    return summary
+
+
+async def preview_reconciliation(db: AsyncSession, shift_id, weekday: int, rule_set: LossRuleSet) -> list[dict]:
+    """Evaluate a shift's counts against a rule set without writing anything."""
+    counts = await _load_shift_inputs(db, shift_id, weekday)
+    return [
+        {
+            "product_id": count.product_id,
+            "product_name": count.name,
+            "category": count.category,
+            "unit": count.unit,
+            "expected_closing": values["expected_closing"],
+            "actual_closing": values["actual_closing"],
+            "discrepancy": values["discrepancy"],
+            "threshold": threshold,
+            "z_score": z_score,
+            "severity": severity,
+            "loss_value": loss_value if severity is not None else 0.0,
+        }
+        for count, (values, severity, loss_value, threshold, z_score) in zip(counts, _reconcile_counts(counts, rule_set))
+    ]
+
+
+async def _run_reconciliation_per_product(db: AsyncSession, bar_id, shift_id):
+    """Original row-at-a-time engine, kept for comparison benchmarks."""
     # Get all stock counts for this shift
     counts_result = await db.execute(
         select(ShiftStockCount).where(ShiftStockCount.shift_id == shift_id)
     )
     stock_counts = counts_result.scalars().all()
 
+    shift_result = await db.execute(select(Shift.business_date).where(Shift.id == shift_id))
+    business_date = shift_result.scalar_one()
+
     reconciliation_records = []
     loss_reports = []
 
@@ -73,7 +448,7 @@ async def run_reconciliation(db: AsyncSession, bar_id, shift_id):
             bar_id=bar_id,
             shift_id=shift_id,
             product_id=count.product_id,
-            date=datetime.utcnow().date(),
+            date=business_date,
             opening_stock=opening,
             received=received,
             sold=sold,
@@ -86,19 +461,8 @@ async def run_reconciliation(db: AsyncSession, bar_id, shift_id):
         reconciliation_records.append(recon)
 
         # Check if discrepancy exceeds threshold
-        threshold = float(product.min_stock_threshold) * 0.1  # 10% of min threshold as loss threshold
-        if threshold < 0.5:
-            threshold = 0.5  # Minimum threshold of 0.5
-
-        if abs(discrepancy) > threshold:
-            # Determine severity
-            if abs(discrepancy) > threshold * 3:
-                severity = LossSeverity.CRITICAL
-            elif abs(discrepancy) > threshold * 1.5:
-                severity = LossSeverity.WARNING
-            else:
-                severity = LossSeverity.INFO
-
+        severity = classify_discrepancy(discrepancy, loss_threshold(product.min_stock_threshold))
+        if severity is not None:
             loss_value = abs(discrepancy) * float(product.cost_price)
 
             loss = LossReport(
@@ -109,6 +473,7 @@ async def run_reconciliation(db: AsyncSession, bar_id, shift_id):
                 discrepancy_quantity=abs(discrepancy),
                 loss_value=loss_value,
                 severity=severity,
+                business_date=business_date,
             )
             db.add(loss)
             loss_reports.append(loss)
@@ -116,5 +481,6 @@ async def run_reconciliation(db: AsyncSession, bar_id, shift_id):
         # Update product current stock to actual closing count
         product.current_stock = actual_closing
 
+    await roll_up_losses(db, bar_id, loss_reports)
     await db.flush()
     return reconciliation_records, loss_reports
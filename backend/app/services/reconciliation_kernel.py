@@ -0,0 +1,177 @@
+"""
+Vectorized reconciliation kernel.
+
+Pure NumPy functions over aligned per-(shift, product) arrays, with no
+database access, so they can run in worker processes. Without rule
+columns the results match loss_threshold() / classify_discrepancy() in
+reconciliation_engine row for row; with them, each row is judged by its
+own resolved loss rule (see services.loss_rules). Rows with enough
+discrepancy history (see services.discrepancy_stats) are judged by a
+z-score against it instead.
+"""
+import numpy as np
+
+from app.models.loss_report import LossSeverity
+
+# Severity codes returned by the kernel; index into SEVERITY_BY_CODE
+SEVERITY_NONE, SEVERITY_INFO, SEVERITY_WARNING, SEVERITY_CRITICAL = 0, 1, 2, 3
+SEVERITY_BY_CODE = (None, LossSeverity.INFO, LossSeverity.WARNING, LossSeverity.CRITICAL)
+
+# Tolerance type codes used in the tolerance_type rule column
+TOLERANCE_PERCENT_OF_MIN_STOCK, TOLERANCE_PERCENT_OF_EXPECTED, TOLERANCE_ABSOLUTE, TOLERANCE_ABSOLUTE_ML = 0, 1, 2, 3
+
+
+def _column(values, default: float, size: int) -> np.ndarray:
+    if values is None:
+        return np.full(size, default, dtype=np.float64)
+    return np.asarray(values, dtype=np.float64)
+
+
+def compute_thresholds(
+    min_stock_threshold,
+    expected_closing,
+    tolerance_type=None,
+    tolerance=None,
+    min_tolerance=None,
+    volume_ml=None,
+) -> np.ndarray:
+    """
+    Per-row loss threshold in the product's counting unit. volume_ml is the
+    ml per counting unit (1 for ml-counted products, NaN when unknown);
+    ml tolerances on products of unknown volume fall back to min_tolerance.
+    """
+    min_stock_threshold = np.asarray(min_stock_threshold, dtype=np.float64)
+    size = min_stock_threshold.shape[0]
+    tolerance_type = np.zeros(size, dtype=np.int8) if tolerance_type is None else np.asarray(tolerance_type)
+    tolerance = _column(tolerance, 10.0, size)
+    min_tolerance = _column(min_tolerance, 0.5, size)
+    volume_ml = _column(volume_ml, np.nan, size)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        threshold = np.select(
+            [
+                tolerance_type == TOLERANCE_PERCENT_OF_MIN_STOCK,
+                tolerance_type == TOLERANCE_PERCENT_OF_EXPECTED,
+                tolerance_type == TOLERANCE_ABSOLUTE,
+                tolerance_type == TOLERANCE_ABSOLUTE_ML,
+            ],
+            [
+                min_stock_threshold * (tolerance / 100),
+                np.abs(expected_closing) * (tolerance / 100),
+                tolerance,
+                tolerance / volume_ml,
+            ],
+            default=np.nan,
+        )
+    # fmax ignores NaN, so an unusable tolerance degrades to the floor
+    return np.fmax(threshold, min_tolerance)
+
+
+def compute_discrepancies(
+    opening,
+    received,
+    sold,
+    actual_closing,
+    min_stock_threshold,
+    cost_price,
+    tolerance_type=None,
+    tolerance=None,
+    min_tolerance=None,
+    warning_multiplier=None,
+    critical_multiplier=None,
+    warning_value=None,
+    critical_value=None,
+    volume_ml=None,
+    stats_n=None,
+    stats_mean=None,
+    stats_m2=None,
+    min_samples: int = 8,
+    min_std: float = 0.1,
+    z_info: float = 2.0,
+    z_warning: float = 3.0,
+    z_critical: float = 4.0,
+) -> dict[str, np.ndarray]:
+    """
+    Compute expected closing, discrepancy, threshold, z-score, severity code
+    and loss value for every row at once. Inputs are equal-length sequences
+    of numbers; omitted rule columns take the built-in defaults.
+
+    Rows whose stats hold at least min_samples observations are classified
+    by |z| against z_info / z_warning / z_critical, with the standard
+    deviation floored at min_std; the rest (z-score NaN) fall back to the
+    rule threshold. Value limits (NaN for none) can raise a row's severity
+    once it counts as a loss either way.
+    """
+    opening = np.asarray(opening, dtype=np.float64)
+    received = np.asarray(received, dtype=np.float64)
+    sold = np.asarray(sold, dtype=np.float64)
+    actual_closing = np.asarray(actual_closing, dtype=np.float64)
+    cost_price = np.asarray(cost_price, dtype=np.float64)
+
+    expected_closing = opening + received - sold
+    discrepancy = expected_closing - actual_closing
+    magnitude = np.abs(discrepancy)
+
+    size = magnitude.shape[0]
+    loss_value = magnitude * cost_price
+
+    threshold = compute_thresholds(
+        min_stock_threshold, expected_closing, tolerance_type, tolerance, min_tolerance, volume_ml,
+    )
+    warning_multiplier = _column(warning_multiplier, 1.5, size)
+    critical_multiplier = _column(critical_multiplier, 3.0, size)
+    warning_value = _column(warning_value, np.nan, size)
+    critical_value = _column(critical_value, np.nan, size)
+
+    above = magnitude > threshold
+    severity = np.select(
+        [
+            magnitude > threshold * critical_multiplier,
+            magnitude > threshold * warning_multiplier,
+            above,
+        ],
+        [SEVERITY_CRITICAL, SEVERITY_WARNING, SEVERITY_INFO],
+        default=SEVERITY_NONE,
+    )
+
+    z_score = np.full(size, np.nan)
+    if stats_n is not None:
+        stats_n = np.asarray(stats_n, dtype=np.float64)
+        stats_mean = np.asarray(stats_mean, dtype=np.float64)
+        stats_m2 = np.asarray(stats_m2, dtype=np.float64)
+        learned = stats_n >= max(min_samples, 2)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            std = np.fmax(np.sqrt(np.fmax(stats_m2, 0) / (stats_n - 1)), min_std)
+            z_score = np.where(learned, (discrepancy - stats_mean) / std, np.nan)
+        z_magnitude = np.abs(z_score)
+        with np.errstate(invalid="ignore"):
+            learned_severity = np.select(
+                [z_magnitude > z_critical, z_magnitude > z_warning, z_magnitude > z_info],
+                [SEVERITY_CRITICAL, SEVERITY_WARNING, SEVERITY_INFO],
+                default=SEVERITY_NONE,
+            )
+            above = np.where(learned, z_magnitude > z_info, above)
+        severity = np.where(learned, learned_severity, severity)
+    # NaN limits compare False, leaving the quantity-based severity alone
+    with np.errstate(invalid="ignore"):
+        value_severity = np.select(
+            [above & (loss_value >= critical_value), above & (loss_value >= warning_value)],
+            [SEVERITY_CRITICAL, SEVERITY_WARNING],
+            default=SEVERITY_NONE,
+        )
+    severity = np.maximum(severity, value_severity).astype(np.int8)
+
+    return {
+        "expected_closing": expected_closing,
+        "discrepancy": discrepancy,
+        "threshold": threshold,
+        "z_score": z_score,
+        "severity": severity,
+        "loss_value": loss_value,
+    }
+
+
+def compute_discrepancies_as_lists(columns: dict[str, list]) -> dict[str, list]:
+    """Process-pool entry point: plain lists in, plain lists out (cheap to pickle)."""
+    result = compute_discrepancies(**columns)
+    return {name: values.tolist() for name, values in result.items()}
@@ -0,0 +1,307 @@
+"""
+Historical reconciliation replay.
+
+Recomputes DailyReconciliation and LossReport rows for every closed shift
+of a bar in a date range, e.g. after a cost price fix or a late POS
+import. Inputs for all affected shifts are pulled with one query per
+table, discrepancies are computed by the NumPy kernel in a process pool
+(one task per bar), and results are written back in batches. Review
+fields (reason code, reviewer, notes) of existing loss reports survive
+the replay; a reviewed report whose discrepancy is now within threshold is
+kept, downgraded to info, rather than deleted. Severities follow the bar's current learned discrepancy stats
+and loss rules; the stats themselves are not updated by a replay.
+"""
+import asyncio
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from sqlalchemy import select, func, delete, insert, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models import (
+    Product, Shift, ShiftStatus, ShiftStockCount, SalesRecord,
+    StockMovement, MovementType, DailyReconciliation, LossReport, LossSeverity, Job,
+    ProductDiscrepancyStats,
+)
+from app.services.job_queue import register_job
+from app.services.cache import mark_bar_dirty
+from app.services.loss_rules import LossRuleSet, get_loss_rules
+from app.services.discrepancy_stats import learned_threshold_params
+from app.services.scorecards import refresh_shift_scorecards
+from app.services.rollups import refresh_rollup_days
+from app.services.reconciliation_kernel import (
+    SEVERITY_BY_CODE, SEVERITY_NONE, compute_discrepancies_as_lists,
+)
+
+settings = get_settings()
+
+REPLAY_RECONCILIATION_JOB = "replay_reconciliation"
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_replay_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=settings.REPLAY_WORKERS)
+    return _executor
+
+
+def shutdown_replay_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def load_replay_inputs(db: AsyncSession, bar_id, date_from: date, date_to: date) -> dict:
+    """Bulk-load counts, received and sold totals for closed shifts with business dates in [date_from, date_to]."""
+    shifts_result = await db.execute(
+        select(Shift.id, Shift.start_time, Shift.end_time, Shift.business_date).where(
+            Shift.bar_id == bar_id,
+            Shift.status == ShiftStatus.CLOSED,
+            Shift.business_date >= date_from,
+            Shift.business_date <= date_to,
+        )
+    )
+    shift_rows = shifts_result.all()
+    if not shift_rows:
+        return {"shift_end": {}, "shift_day": {}, "rows": [], "since": None}
+    shift_end = {row.id: row.end_time for row in shift_rows}
+    # Nothing of these shifts was recorded before the first opened; prunes older partitions
+    since = min(row.start_time for row in shift_rows)
+    shift_day = {row.id: row.business_date for row in shift_rows}
+    shift_ids = list(shift_end)
+
+    counts_result = await db.execute(
+        select(
+            ShiftStockCount.shift_id,
+            ShiftStockCount.product_id,
+            ShiftStockCount.opening_count,
+            ShiftStockCount.closing_count,
+            Product.category,
+            Product.unit,
+            Product.volume_ml,
+            Product.cost_price,
+            Product.min_stock_threshold,
+        )
+        .join(Product, Product.id == ShiftStockCount.product_id)
+        .where(
+            ShiftStockCount.shift_id.in_(shift_ids),
+            ShiftStockCount.closing_count.is_not(None),
+        )
+    )
+
+    sold_result = await db.execute(
+        select(SalesRecord.shift_id, SalesRecord.product_id, func.sum(SalesRecord.quantity_sold))
+        .where(SalesRecord.shift_id.in_(shift_ids), SalesRecord.created_at >= since)
+        .group_by(SalesRecord.shift_id, SalesRecord.product_id)
+    )
+    sold = {(shift_id, product_id): float(qty) for shift_id, product_id, qty in sold_result.all()}
+
+    received_result = await db.execute(
+        select(Shift.id, StockMovement.product_id, func.sum(StockMovement.quantity))
+        .join(
+            StockMovement,
+            and_(
+                StockMovement.bar_id == Shift.bar_id,
+                StockMovement.type == MovementType.IN,
+                StockMovement.created_at >= Shift.start_time,
+                StockMovement.created_at <= Shift.end_time,
+            ),
+        )
+        .where(Shift.id.in_(shift_ids), StockMovement.created_at >= since)
+        .group_by(Shift.id, StockMovement.product_id)
+    )
+    received = {(shift_id, product_id): float(qty) for shift_id, product_id, qty in received_result.all()}
+
+    stats_result = await db.execute(
+        select(
+            ProductDiscrepancyStats.product_id, ProductDiscrepancyStats.weekday,
+            ProductDiscrepancyStats.n, ProductDiscrepancyStats.mean, ProductDiscrepancyStats.m2,
+        ).where(ProductDiscrepancyStats.bar_id == bar_id)
+    )
+    stats = {(row.product_id, row.weekday): (row.n, row.mean, row.m2) for row in stats_result.all()}
+
+    rows = []
+    for row in counts_result.all():
+        n, mean, m2 = stats.get((row.product_id, shift_day[row.shift_id].weekday()), (0, 0.0, 0.0))
+        rows.append({
+            "shift_id": row.shift_id,
+            "product_id": row.product_id,
+            "opening": float(row.opening_count),
+            "received": received.get((row.shift_id, row.product_id), 0.0),
+            "sold": sold.get((row.shift_id, row.product_id), 0.0),
+            "actual_closing": float(row.closing_count),
+            "min_stock_threshold": float(row.min_stock_threshold),
+            "cost_price": float(row.cost_price),
+            "category": row.category,
+            "unit": row.unit,
+            "volume_ml": row.volume_ml,
+            "stats_n": n,
+            "stats_mean": mean,
+            "stats_m2": m2,
+        })
+    return {"shift_end": shift_end, "shift_day": shift_day, "rows": rows, "since": since}
+
+
+async def _run_kernel(
+    rows: list[dict], rule_set: LossRuleSet, executor: ProcessPoolExecutor | None
+) -> dict[str, list]:
+    columns = {
+        name: [row[name] for row in rows]
+        for name in ("opening", "received", "sold", "actual_closing", "min_stock_threshold", "cost_price")
+    }
+    columns.update(rule_set.rule_columns((row["category"], row["unit"], row["volume_ml"]) for row in rows))
+    if settings.LOSS_STATS_ENABLED:
+        columns.update({name: [row[name] for row in rows] for name in ("stats_n", "stats_mean", "stats_m2")})
+        columns.update(learned_threshold_params())
+    if executor is None:
+        return compute_discrepancies_as_lists(columns)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, compute_discrepancies_as_lists, columns)
+
+
+async def _insert_batched(db: AsyncSession, model, rows: list[dict]) -> None:
+    batch_size = settings.REPLAY_BATCH_SIZE
+    for start in range(0, len(rows), batch_size):
+        await db.execute(insert(model), rows[start:start + batch_size])
+
+
+async def replay_bar(
+    db: AsyncSession,
+    bar_id,
+    date_from: date,
+    date_to: date,
+    executor: ProcessPoolExecutor | None = None,
+) -> dict:
+    """
+    Replace reconciliation and loss rows for a bar's closed shifts in the
+    business date range and refresh the staff scorecards and daily rollups
+    of those shifts' days. Runs in the caller's transaction; product stock
+    is untouched.
+    """
+    inputs = await load_replay_inputs(db, bar_id, date_from, date_to)
+    shift_end, shift_day, rows = inputs["shift_end"], inputs["shift_day"], inputs["rows"]
+    summary = {
+        "bar_id": str(bar_id),
+        "shifts": len(shift_end),
+        "reconciliations": 0,
+        "loss_reports": 0,
+        "reviews_kept": 0,
+        "reviews_downgraded": 0,
+    }
+    if not shift_end:
+        return summary
+    shift_ids = list(shift_end)
+
+    rule_set = await get_loss_rules(db, bar_id)
+    computed = await _run_kernel(rows, rule_set, executor) if rows else {}
+
+    # Keep dates and reviews of the rows being replaced
+    existing_recon = await db.execute(
+        select(DailyReconciliation.shift_id, DailyReconciliation.product_id, DailyReconciliation.date)
+        .where(DailyReconciliation.shift_id.in_(shift_ids))
+    )
+    recon_dates = {(shift_id, product_id): day for shift_id, product_id, day in existing_recon.all()}
+
+    existing_losses = await db.execute(
+        select(
+            LossReport.shift_id, LossReport.product_id, LossReport.reason_code,
+            LossReport.reviewed_by, LossReport.reviewed_at, LossReport.notes, LossReport.created_at,
+        ).where(LossReport.shift_id.in_(shift_ids), LossReport.created_at >= inputs["since"])
+    )
+    previous_losses = {(row.shift_id, row.product_id): row for row in existing_losses.all()}
+
+    reconciliation_rows = []
+    loss_rows = []
+    for i, row in enumerate(rows):
+        key = (row["shift_id"], row["product_id"])
+        end_time = shift_end[row["shift_id"]]
+        recon_id = uuid.uuid4()
+        reconciliation_rows.append({
+            "id": recon_id,
+            "bar_id": bar_id,
+            "shift_id": row["shift_id"],
+            "product_id": row["product_id"],
+            "date": recon_dates.get(key, shift_day[row["shift_id"]]),
+            "opening_stock": row["opening"],
+            "received": row["received"],
+            "sold": row["sold"],
+            "expected_closing": computed["expected_closing"][i],
+            "actual_closing": row["actual_closing"],
+            "discrepancy": computed["discrepancy"][i],
+            "created_at": end_time,
+        })
+
+        severity_code = computed["severity"][i]
+        previous = previous_losses.get(key)
+        reviewed = previous is not None and previous.reviewed_by is not None
+        if severity_code == SEVERITY_NONE:
+            if not reviewed:
+                continue
+            # Reviewed reports are kept, downgraded, once the discrepancy is within threshold
+            severity = LossSeverity.INFO
+            summary["reviews_downgraded"] += 1
+        else:
+            severity = SEVERITY_BY_CODE[severity_code]
+        loss_rows.append({
+            "id": uuid.uuid4(),
+            "bar_id": bar_id,
+            "reconciliation_id": recon_id,
+            "product_id": row["product_id"],
+            "shift_id": row["shift_id"],
+            "discrepancy_quantity": abs(computed["discrepancy"][i]),
+            "loss_value": computed["loss_value"][i],
+            "severity": severity,
+            "reason_code": previous.reason_code if previous else None,
+            "reviewed_by": previous.reviewed_by if previous else None,
+            "reviewed_at": previous.reviewed_at if previous else None,
+            "notes": previous.notes if previous else None,
+            "created_at": previous.created_at if previous else end_time,
+            "business_date": shift_day[row["shift_id"]],
+        })
+        if reviewed:
+            summary["reviews_kept"] += 1
+
+    await db.execute(
+        delete(LossReport).where(LossReport.shift_id.in_(shift_ids), LossReport.created_at >= inputs["since"])
+    )
+    await db.execute(delete(DailyReconciliation).where(DailyReconciliation.shift_id.in_(shift_ids)))
+    await _insert_batched(db, DailyReconciliation, reconciliation_rows)
+    await _insert_batched(db, LossReport, loss_rows)
+    mark_bar_dirty(db, bar_id)
+    await refresh_shift_scorecards(db, bar_id, shift_ids)
+    await refresh_rollup_days(db, bar_id, set(shift_day.values()))
+
+    summary["reconciliations"] = len(reconciliation_rows)
+    summary["loss_reports"] = len(loss_rows)
+    return summary
+
+
+async def replay_bars(bar_ids: list, date_from: date, date_to: date) -> list[dict]:
+    """Replay several bars concurrently, one session and one kernel task per bar."""
+    executor = get_replay_executor()
+
+    async def replay_one(bar_id):
+        async with AsyncSessionLocal() as db:
+            summary = await replay_bar(db, bar_id, date_from, date_to, executor)
+            await db.commit()
+            return summary
+
+    return await asyncio.gather(*(replay_one(bar_id) for bar_id in bar_ids))
+
+
+@register_job(REPLAY_RECONCILIATION_JOB)
+async def replay_reconciliation_job(db: AsyncSession, job: Job) -> dict:
+    """Job handler: replay the job's bar over the payload's date range."""
+    return await replay_bar(
+        db,
+        job.bar_id,
+        date.fromisoformat(job.payload["date_from"]),
+        date.fromisoformat(job.payload["date_to"]),
+        get_replay_executor(),
+    )
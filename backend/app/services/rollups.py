@@ -0,0 +1,270 @@
+"""
+Daily per-product rollups of sales and losses, by business date.
+
+Writes that add sales or loss reports also bump the matching
+daily_product_rollups row in the same transaction. Days are compacted
+nightly (compact_rollups.py): the day's rows are recomputed from the raw
+sales and loss reports, which repairs any drift, and closing stock is
+snapshotted. Corrections that rewrite loss reports (re-reconciliation,
+replay) recompute the days they touch the same way.
+
+Aggregate endpoints read daily_facts(): compacted history from the
+rollups plus today's tail from the raw tables, so a window costs one
+index range over (bar_id, day) however long the bar's history is.
+"""
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Iterable
+
+from sqlalchemy import Date, func, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import DailyProductRollup, LossReport, LossSeverity, Product, SalesRecord
+from app.services.partitions import business_date_window
+
+SALES_FIELDS = ("units_sold", "sales_count", "revenue")
+LOSS_FIELDS = (
+    "loss_quantity", "loss_incidents", "loss_value",
+    "info_incidents", "info_loss_value",
+    "warning_incidents", "warning_loss_value",
+    "critical_incidents", "critical_loss_value",
+    "unresolved_incidents",
+)
+ROLLUP_FIELDS = SALES_FIELDS + LOSS_FIELDS
+
+# Keeps multi-row VALUES well under the 32,767 bind-parameter limit
+UPSERT_CHUNK_SIZE = 1000
+
+
+def _field(row, name, default=None):
+    return row.get(name, default) if isinstance(row, dict) else getattr(row, name, default)
+
+
+async def _upsert_increments(db: AsyncSession, bar_id, increments: dict) -> None:
+    """Add {(product_id, day): {field: delta}} onto the rollups with chunked upserts."""
+    if not increments:
+        return
+
+    # Sorted keys give concurrent writers a consistent lock order
+    rows = [
+        {
+            "product_id": product_id,
+            "day": day,
+            "bar_id": bar_id,
+            **{field: deltas.get(field, 0) for field in ROLLUP_FIELDS},
+            "updated_at": datetime.utcnow(),
+        }
+        for (product_id, day), deltas in sorted(increments.items(), key=lambda kv: (str(kv[0][0]), kv[0][1]))
+    ]
+
+    table = DailyProductRollup.__table__
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = pg_insert(DailyProductRollup).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.product_id, table.c.day],
+            set_={
+                **{field: table.c[field] + stmt.excluded[field] for field in ROLLUP_FIELDS},
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt)
+
+
+async def roll_up_sales(db: AsyncSession, bar_id, sales: Iterable) -> None:
+    """
+    Add sales to the rollups. `sales` yields objects or mappings with
+    product_id, quantity_sold, sale_amount and business_date.
+    """
+    increments: dict = defaultdict(lambda: defaultdict(float))
+    for sale in sales:
+        key = (_field(sale, "product_id"), _field(sale, "business_date"))
+        increments[key]["units_sold"] += float(_field(sale, "quantity_sold"))
+        increments[key]["revenue"] += float(_field(sale, "sale_amount"))
+        increments[key]["sales_count"] += 1
+    await _upsert_increments(db, bar_id, increments)
+
+
+async def roll_up_losses(db: AsyncSession, bar_id, losses: Iterable) -> None:
+    """
+    Add new loss reports to the rollups. `losses` yields objects or mappings
+    with product_id, severity, loss_value, discrepancy_quantity,
+    business_date and optionally reason_code.
+    """
+    increments: dict = defaultdict(lambda: defaultdict(float))
+    for loss in losses:
+        key = (_field(loss, "product_id"), _field(loss, "business_date"))
+        severity = LossSeverity(_field(loss, "severity")).value
+        loss_value = float(_field(loss, "loss_value"))
+        increments[key]["loss_quantity"] += float(_field(loss, "discrepancy_quantity"))
+        increments[key]["loss_incidents"] += 1
+        increments[key]["loss_value"] += loss_value
+        increments[key][f"{severity}_incidents"] += 1
+        increments[key][f"{severity}_loss_value"] += loss_value
+        if _field(loss, "reason_code") is None:
+            increments[key]["unresolved_incidents"] += 1
+    await _upsert_increments(db, bar_id, increments)
+
+
+async def roll_up_review(db: AsyncSession, report: LossReport, was_unresolved: bool) -> None:
+    """Move a reviewed loss report in or out of its day's unresolved count."""
+    delta = int(report.reason_code is None) - int(was_unresolved)
+    if delta:
+        await _upsert_increments(
+            db, report.bar_id, {(report.product_id, report.business_date): {"unresolved_incidents": delta}},
+        )
+
+
+def _sales_columns(day) -> list:
+    return [
+        SalesRecord.product_id,
+        day.label("day"),
+        func.sum(SalesRecord.quantity_sold).label("units_sold"),
+        func.count().label("sales_count"),
+        func.sum(SalesRecord.sale_amount).label("revenue"),
+    ]
+
+
+def _loss_columns(day) -> list:
+    def by_severity(severity: LossSeverity) -> list:
+        matches = LossReport.severity == severity
+        return [
+            func.count().filter(matches).label(f"{severity.value}_incidents"),
+            func.coalesce(func.sum(LossReport.loss_value).filter(matches), 0).label(f"{severity.value}_loss_value"),
+        ]
+
+    return [
+        LossReport.product_id,
+        day.label("day"),
+        func.sum(LossReport.discrepancy_quantity).label("loss_quantity"),
+        func.count().label("loss_incidents"),
+        func.sum(LossReport.loss_value).label("loss_value"),
+        *by_severity(LossSeverity.INFO),
+        *by_severity(LossSeverity.WARNING),
+        *by_severity(LossSeverity.CRITICAL),
+        func.count().filter(LossReport.reason_code.is_(None)).label("unresolved_incidents"),
+    ]
+
+
+async def refresh_rollup_days(db: AsyncSession, bar_id, days: Iterable[date]) -> None:
+    """Recompute the bar's sales and loss rollups for the given days from the raw rows."""
+    days = sorted(set(days))
+    if not days:
+        return
+    table = DailyProductRollup.__table__
+
+    await db.execute(
+        update(DailyProductRollup)
+        .where(DailyProductRollup.bar_id == bar_id, DailyProductRollup.day.in_(days))
+        .values(**dict.fromkeys(ROLLUP_FIELDS, 0), updated_at=datetime.utcnow())
+    )
+
+    for model, columns, fields in (
+        (SalesRecord, _sales_columns, SALES_FIELDS),
+        (LossReport, _loss_columns, LOSS_FIELDS),
+    ):
+        aggregates = (
+            select(*columns(model.business_date), literal(bar_id, table.c.bar_id.type), literal(datetime.utcnow()))
+            .where(
+                model.bar_id == bar_id,
+                model.business_date.in_(days),
+                business_date_window(model, days[0], days[-1]),
+            )
+            .group_by(model.product_id, model.business_date)
+        )
+        stmt = pg_insert(DailyProductRollup).from_select(
+            ["product_id", "day", *fields, "bar_id", "updated_at"], aggregates,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.product_id, table.c.day],
+            set_={**{field: stmt.excluded[field] for field in fields}, "updated_at": stmt.excluded.updated_at},
+        )
+        await db.execute(stmt)
+
+
+async def compact_days(db: AsyncSession, bar_id, days: Iterable[date], snapshot_stock: bool = False) -> None:
+    """
+    Recompute the given days from the raw rows and mark them compacted.
+    With snapshot_stock, each active product's current stock is stored as
+    the closing stock of the latest day (meant for the day that just ended).
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    await refresh_rollup_days(db, bar_id, days)
+
+    now = datetime.utcnow()
+    if snapshot_stock:
+        table = DailyProductRollup.__table__
+        snapshot = select(
+            Product.id,
+            literal(days[-1], Date),
+            literal(bar_id, table.c.bar_id.type),
+            Product.current_stock,
+            Product.current_stock * Product.cost_price,
+            literal(now),
+        ).where(Product.bar_id == bar_id, Product.is_active == True)
+        stmt = pg_insert(DailyProductRollup).from_select(
+            ["product_id", "day", "bar_id", "closing_stock", "closing_stock_value", "updated_at"], snapshot,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.product_id, table.c.day],
+            set_={
+                "closing_stock": stmt.excluded.closing_stock,
+                "closing_stock_value": stmt.excluded.closing_stock_value,
+                "updated_at": stmt.excluded.updated_at,
+            },
+        )
+        await db.execute(stmt)
+
+    await db.execute(
+        update(DailyProductRollup)
+        .where(DailyProductRollup.bar_id == bar_id, DailyProductRollup.day.in_(days))
+        .values(compacted_at=now)
+    )
+
+
+def daily_facts(bar_id, date_from: date, today: date, date_to: date | None = None):
+    """
+    Subquery of per-product, per-business-day sales and loss figures for
+    the bar over [date_from, date_to] (open-ended without date_to): rollup
+    rows before `today` (the bar's current business date), today's tail
+    aggregated from the raw rows. Columns are product_id, day and
+    ROLLUP_FIELDS.
+    """
+    history = select(
+        DailyProductRollup.product_id,
+        DailyProductRollup.day,
+        *(getattr(DailyProductRollup, field) for field in ROLLUP_FIELDS),
+    ).where(
+        DailyProductRollup.bar_id == bar_id,
+        DailyProductRollup.day >= date_from,
+        DailyProductRollup.day < today,
+    )
+    if date_to is not None:
+        history = history.where(DailyProductRollup.day <= date_to)
+    parts = [history]
+
+    if (date_to is None or date_to >= today) and date_from <= today:
+        day = literal(today, Date)
+        zeros = lambda fields: [literal(0).label(field) for field in fields]
+        parts.append(
+            select(*_sales_columns(day), *zeros(LOSS_FIELDS))
+            .where(
+                SalesRecord.bar_id == bar_id,
+                SalesRecord.business_date == today,
+                business_date_window(SalesRecord, today),
+            )
+            .group_by(SalesRecord.product_id)
+        )
+        loss_columns = _loss_columns(day)
+        parts.append(
+            select(*loss_columns[:2], *zeros(SALES_FIELDS), *loss_columns[2:])
+            .where(
+                LossReport.bar_id == bar_id,
+                LossReport.business_date == today,
+                business_date_window(LossReport, today),
+            )
+            .group_by(LossReport.product_id)
+        )
+    return union_all(*parts).subquery("daily_facts")
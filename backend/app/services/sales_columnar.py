@@ -0,0 +1,321 @@
+"""
+Columnar (Parquet / Arrow IPC) sales imports.
+
+POS exports in Parquet or Arrow IPC (file or stream format) import through
+the background import jobs as the "sales_parquet" and "sales_arrow"
+parsers. They take the same shift_id parameter as sales_csv and produce
+the same per-row error report. Files are read one record batch at a time,
+a Parquet row group or an IPC batch sliced to IMPORT_BATCH_ROWS, so memory
+follows the file's batch size rather than its length. IPC files are
+memory-mapped.
+
+Each row is matched on the first of sku, barcode or product_name it has a
+value for, so rows with a blank sku fall back to their barcode, then their
+name. Each batch resolves them with vectorised pyarrow.compute lookups
+(normalise, then index_in against the bar's catalog), and amounts are cast
+and checked column by column. Only rejected rows are looked at one by one,
+to word their errors. Valid rows go through sales_writer like every other
+sales import. Names match as in the CSV import: NFKC, lower case,
+collapsed whitespace, with active products shadowing deactivated ones.
+
+Resuming skips already committed records: whole Parquet row groups by
+their metadata, IPC batches by their row counts. Progress offsets are
+proportional to records read, or the stream position for IPC streams.
+
+Needs the optional pyarrow package.
+"""
+import asyncio
+import os
+from typing import AsyncIterator, Callable, Iterator, NamedTuple
+
+from sqlalchemy import select
+
+from app.models import Product
+from app.services.import_parsers import RecordBatch, register_parser
+from app.services.product_codes import normalize_code
+from app.services.sales_import import AMBIGUOUS, SalesImportParser
+from app.services.sales_writer import write_sales
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = None
+
+# Product match columns, in order of preference
+MATCH_COLUMNS = ("sku", "barcode", "product_name")
+AMOUNT_COLUMNS = ("quantity_sold", "sale_amount")
+
+_NUMBER_PATTERN = r"^\s*[-+]?(\d+(\.\d*)?|\.\d+)([eE][-+]?\d+)?\s*$"
+
+
+def _normalize_names(values):
+    values = pc.utf8_normalize(values, "NFKC")
+    values = pc.utf8_lower(values)
+    values = pc.replace_substring_regex(values, r"\s+", " ")
+    return pc.utf8_trim_whitespace(values)
+
+
+def _match_keys(column, match_column: str):
+    if not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+        column = pc.cast(column, pa.string())
+    if match_column == "product_name":
+        return _normalize_names(column)
+    return pc.utf8_trim_whitespace(column)
+
+
+def _numbers(column, name: str):
+    """(float64 values, mask of present but unparseable values)."""
+    kind = column.type
+    if pa.types.is_integer(kind) or pa.types.is_floating(kind) or pa.types.is_decimal(kind):
+        return pc.cast(column, pa.float64()), None
+    if pa.types.is_string(kind) or pa.types.is_large_string(kind):
+        parseable = pc.match_substring_regex(column, _NUMBER_PATTERN)
+        cleaned = pc.if_else(parseable, pc.utf8_trim_whitespace(column), pa.scalar(None, kind))
+        return pc.cast(cleaned, pa.float64()), pc.fill_null(pc.invert(parseable), False)
+    raise ValueError(f"Column {name} has type {kind}, expected numbers")
+
+
+class Catalog(NamedTuple):
+    keys: dict            # match column -> pa.Array of its keys
+    offsets: dict         # match column -> index of its first key in ids
+    ids: list             # product id per key, or AMBIGUOUS
+    ambiguous: object     # pa.Array of bools per key
+
+
+class ColumnarSalesParser(SalesImportParser):
+    """Base for Arrow-readable sales files; subclasses open the file."""
+
+    @classmethod
+    async def validate_params(cls, db, bar_id, params: dict) -> dict:
+        if pa is None:
+            raise ValueError(f"{cls.name} imports need the optional pyarrow package")
+        return await super().validate_params(db, bar_id, params)
+
+    async def prepare(self) -> None:
+        await super().prepare()
+        result = await self.db.execute(
+            select(Product.id, Product.name, Product.is_active, Product.sku, Product.barcode)
+            .where(Product.bar_id == self.bar_id)
+        )
+        self.products = result.all()
+        self.catalog: Catalog | None = None
+
+    def _lookup(self, match_column: str) -> dict:
+        if match_column == "product_name":
+            names = _normalize_names(pa.array([name for _, name, _, _, _ in self.products], pa.string()))
+            candidates: dict[str, list] = {}
+            for (product_id, _, is_active, _, _), key in zip(self.products, names.to_pylist()):
+                candidates.setdefault(key, []).append((product_id, is_active))
+            lookup = {}
+            for key, products in candidates.items():
+                active = [product_id for product_id, is_active in products if is_active]
+                ids = active or [product_id for product_id, _ in products]
+                lookup[key] = ids[0] if len(ids) == 1 else AMBIGUOUS
+        else:
+            # Codes are unique per bar
+            position = 3 if match_column == "sku" else 4
+            lookup = {
+                normalize_code(product[position]): product[0]
+                for product in self.products if normalize_code(product[position])
+            }
+        return lookup
+
+    def _build_catalog(self, match_columns: list[str]) -> Catalog:
+        """One id list for all match columns; each column's keys index into it from its offset."""
+        keys, offsets, ids = {}, {}, []
+        for match_column in match_columns:
+            lookup = self._lookup(match_column)
+            keys[match_column] = pa.array(list(lookup), pa.string())
+            offsets[match_column] = len(ids)
+            ids.extend(lookup.values())
+        return Catalog(keys, offsets, ids, pa.array([product_id is AMBIGUOUS for product_id in ids], pa.bool_()))
+
+    def _read_schema(self, schema) -> list[str]:
+        """Columns to read; raises ValueError when the file cannot be imported."""
+        missing = [column for column in AMOUNT_COLUMNS if column not in schema.names]
+        match_columns = [column for column in MATCH_COLUMNS if column in schema.names]
+        if not match_columns:
+            missing.append(" / ".join(MATCH_COLUMNS))
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        self.state["match_columns"] = match_columns
+        self.catalog = self._build_catalog(match_columns)
+        return [*match_columns, *AMOUNT_COLUMNS]
+
+    def _match_positions(self, batch) -> tuple:
+        """
+        (index into catalog.ids, index into match_columns) per row, from the
+        first match column with a non-blank value. Rows with no key at all
+        have a null column index; unknown keys a null position.
+        """
+        positions = pa.nulls(batch.num_rows, pa.int64())
+        key_columns = pa.nulls(batch.num_rows, pa.int8())
+        pending = pa.repeat(True, batch.num_rows)
+        for index, match_column in enumerate(self.state["match_columns"]):
+            keys = _match_keys(batch.column(match_column), match_column)
+            present = pc.fill_null(pc.not_equal(keys, ""), False)
+            use = pc.and_(pending, present)
+            found = pc.add(
+                pc.cast(pc.index_in(keys, value_set=self.catalog.keys[match_column]), pa.int64()),
+                self.catalog.offsets[match_column],
+            )
+            positions = pc.if_else(use, found, positions)
+            key_columns = pc.if_else(use, pa.scalar(index, pa.int8()), key_columns)
+            pending = pc.and_(pending, pc.invert(present))
+        return positions, key_columns
+
+    async def _batches(
+        self,
+        source: Iterator,
+        skip: int,
+        first_record: int,
+        batch_rows: int,
+        position: Callable[[int], int],
+    ) -> AsyncIterator[RecordBatch]:
+        """Slice `source`'s Arrow batches to batch_rows, after skipping `skip` rows."""
+        number = first_record
+        while True:
+            batch = await asyncio.to_thread(next, source, None)
+            if batch is None:
+                return
+            if skip >= batch.num_rows:
+                skip -= batch.num_rows
+                continue
+            for start in range(skip, batch.num_rows, batch_rows):
+                part = batch.slice(start, batch_rows)
+                yield RecordBatch((number, part), position(number + part.num_rows - 1), number + part.num_rows - 1)
+                number += part.num_rows
+            skip = 0
+
+    async def write_batch(self, records) -> tuple[int, list[tuple[int, str]]]:
+        first_number, batch = records
+        match_columns = self.state["match_columns"]
+        positions, key_columns = self._match_positions(batch)
+        quantity, quantity_bad = _numbers(batch.column("quantity_sold"), "quantity_sold")
+        amount, amount_bad = _numbers(batch.column("sale_amount"), "sale_amount")
+
+        found = pc.is_valid(positions)
+        ambiguous = pc.fill_null(pc.take(self.catalog.ambiguous, positions), False)
+        valid = pc.and_(found, pc.invert(ambiguous))
+        for values in (quantity, amount):
+            valid = pc.and_(valid, pc.fill_null(pc.is_finite(values), False))
+
+        taken = pc.indices_nonzero(valid)
+        rows = [
+            {
+                "product_id": self.catalog.ids[position],
+                "shift_id": self.shift_id,
+                "quantity_sold": quantity_sold,
+                "sale_amount": sale_amount,
+            }
+            for position, quantity_sold, sale_amount in zip(
+                pc.take(positions, taken).to_pylist(),
+                pc.take(quantity, taken).to_pylist(),
+                pc.take(amount, taken).to_pylist(),
+            )
+        ]
+
+        errors = []
+        rejected = pc.indices_nonzero(pc.invert(valid)).to_pylist()
+        if rejected:
+            columns = {
+                **{column: pc.take(batch.column(column), rejected).to_pylist() for column in match_columns},
+                "key_column": pc.take(key_columns, rejected).to_pylist(),
+                "found": pc.take(found, rejected).to_pylist(),
+                "ambiguous": pc.take(ambiguous, rejected).to_pylist(),
+                "quantity_sold": pc.take(quantity, rejected).to_pylist(),
+                "sale_amount": pc.take(amount, rejected).to_pylist(),
+            }
+            bad = {
+                "quantity_sold": pc.take(quantity_bad, rejected).to_pylist() if quantity_bad is not None else None,
+                "sale_amount": pc.take(amount_bad, rejected).to_pylist() if amount_bad is not None else None,
+            }
+            for n, index in enumerate(rejected):
+                errors.append((first_number + index, await self._row_error(match_columns, columns, bad, n)))
+
+        await write_sales(self.db, self.bar_id, rows, self.business_date)
+        return len(rows), errors
+
+    async def _row_error(self, match_columns: list[str], columns: dict, bad: dict, n: int) -> str:
+        if columns["key_column"][n] is None:
+            return f"{' / '.join(match_columns)} is missing"
+        match_column = match_columns[columns["key_column"][n]]
+        key = columns[match_column][n]
+        if not columns["found"][n]:
+            if match_column == "product_name":
+                return await self._unknown_name(str(key).strip())
+            return f"No product with {match_column} '{str(key).strip()}'"
+        if columns["ambiguous"][n]:
+            return f"Product name '{str(key).strip()}' matches several products"
+        for column in AMOUNT_COLUMNS:
+            if bad[column] is not None and bad[column][n]:
+                return f"{column} is not a number"
+            if columns[column][n] is None:
+                return f"{column} is missing"
+        return "quantity_sold and sale_amount must be finite numbers"
+
+
+@register_parser("sales_parquet")
+class SalesParquetParser(ColumnarSalesParser):
+    """Sales Parquet (sku, barcode or product_name; quantity_sold, sale_amount) into one shift."""
+
+    async def file_batches(
+        self, path: str, offset: int = 0, first_record: int = 1, batch_rows: int = 1000,
+    ) -> AsyncIterator[RecordBatch]:
+        try:
+            parquet = await asyncio.to_thread(pq.ParquetFile, path)
+        except (pa.ArrowInvalid, OSError) as e:
+            raise ValueError(f"Not a readable Parquet file: {e}")
+        try:
+            columns = self._read_schema(parquet.schema_arrow)
+            metadata = parquet.metadata
+            total, size = metadata.num_rows, os.path.getsize(path)
+
+            # Skip whole row groups that earlier runs committed
+            skip, start_group = first_record - 1, 0
+            while start_group < metadata.num_row_groups and skip >= metadata.row_group(start_group).num_rows:
+                skip -= metadata.row_group(start_group).num_rows
+                start_group += 1
+            source = parquet.iter_batches(
+                batch_size=batch_rows, row_groups=range(start_group, metadata.num_row_groups), columns=columns,
+            )
+            async for batch in self._batches(source, skip, first_record, batch_rows, lambda last: size * last // max(total, 1)):
+                yield batch
+        finally:
+            parquet.close()
+
+
+@register_parser("sales_arrow")
+class SalesArrowParser(ColumnarSalesParser):
+    """Sales Arrow IPC file or stream (sku, barcode or product_name; quantity_sold, sale_amount) into one shift."""
+
+    async def file_batches(
+        self, path: str, offset: int = 0, first_record: int = 1, batch_rows: int = 1000,
+    ) -> AsyncIterator[RecordBatch]:
+        size = os.path.getsize(path)
+        source = pa.memory_map(path)
+        try:
+            try:
+                reader = ipc.open_file(source)
+            except pa.ArrowInvalid:
+                try:
+                    source.seek(0)
+                    reader = ipc.open_stream(source)
+                except pa.ArrowInvalid as e:
+                    raise ValueError(f"Not a readable Arrow IPC file: {e}")
+                batches, position = iter(reader), lambda last: source.tell()
+            else:
+                count = reader.num_record_batches
+                total = sum(reader.get_batch(i).num_rows for i in range(count))
+                batches = (reader.get_batch(i) for i in range(count))
+                position = lambda last: size * last // max(total, 1)  # noqa: E731
+
+            columns = self._read_schema(reader.schema)
+            selected = (batch.select(columns) for batch in batches)
+            async for batch in self._batches(selected, first_record - 1, first_record, batch_rows, position):
+                yield batch
+        finally:
+            source.close()
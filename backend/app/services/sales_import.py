@@ -0,0 +1,177 @@
+"""
+CSV sales import.
+
+Files of product_name, quantity_sold, sale_amount rows are streamed in
+chunks (services.import_parsers) rather than read whole. Product names
+resolve through a dict built from one catalog query, and valid rows are
+written per batch through services.sales_writer. A bad row is reported
+with its record number and skipped; the rest of the file still imports.
+
+Names match after Unicode normalisation (NFKC), case folding and
+whitespace collapsing, so "  JAMESON  irish" finds "Jameson Irish".
+
+SalesCsvParser is registered as the "sales_csv" import parser, so the
+same code serves POST /sales/import-csv and background import jobs.
+SalesImportParser holds what every sales parser shares (the shift_id
+parameter, business date and name suggestions); see also
+services.sales_columnar.
+"""
+import math
+import unicodedata
+import uuid
+
+from fastapi import UploadFile
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Product, Shift
+from app.services.business_date import business_today
+from app.services.import_parsers import CsvImportParser, ImportParser, register_parser
+from app.services.product_search import suggest_product_name
+from app.services.sales_writer import write_sales
+
+IMPORT_BATCH_ROWS = 2000
+# Errors listed in the response; error_count still covers them all
+MAX_REPORTED_ERRORS = 1000
+
+REQUIRED_COLUMNS = ("product_name", "quantity_sold", "sale_amount")
+
+# Name shared by several products of the bar
+AMBIGUOUS = object()
+
+
+def normalize_name(value: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", value).casefold().split())
+
+
+async def build_name_lookup(db: AsyncSession, bar_id) -> dict:
+    """
+    Normalised product name -> product id for the bar, or AMBIGUOUS when
+    several products share it. Active products shadow deactivated ones.
+    """
+    result = await db.execute(
+        select(Product.id, Product.name, Product.is_active).where(Product.bar_id == bar_id)
+    )
+    candidates: dict[str, list[tuple]] = {}
+    for product_id, name, is_active in result.all():
+        candidates.setdefault(normalize_name(name), []).append((product_id, is_active))
+
+    lookup = {}
+    for key, products in candidates.items():
+        active = [product_id for product_id, is_active in products if is_active]
+        ids = active or [product_id for product_id, _ in products]
+        lookup[key] = ids[0] if len(ids) == 1 else AMBIGUOUS
+    return lookup
+
+
+class SalesImportParser(ImportParser):
+    """Base for parsers importing sales into the shift given as params["shift_id"]."""
+
+    @classmethod
+    async def validate_params(cls, db: AsyncSession, bar_id, params: dict) -> dict:
+        try:
+            shift_id = uuid.UUID(str(params["shift_id"]))
+        except (KeyError, ValueError):
+            raise ValueError(f"{cls.name} imports need a shift_id")
+        result = await db.execute(select(Shift.id).where(Shift.id == shift_id, Shift.bar_id == bar_id))
+        if result.scalar_one_or_none() is None:
+            raise LookupError("Shift not found")
+        return {"shift_id": str(shift_id)}
+
+    async def prepare(self) -> None:
+        self.shift_id = uuid.UUID(self.params["shift_id"])
+        self.business_date = await business_today(self.db, self.bar_id)
+        self.suggestions: dict[str, str | None] = {}
+
+    async def _suggest(self, name: str) -> str | None:
+        # One in-process index lookup per distinct unknown name
+        if name not in self.suggestions:
+            self.suggestions[name] = await suggest_product_name(self.db, self.bar_id, name)
+        return self.suggestions[name]
+
+    async def _unknown_name(self, name: str) -> str:
+        suggestion = await self._suggest(name)
+        hint = f" (did you mean '{suggestion}'?)" if suggestion else ""
+        return f"Product '{name}' not found{hint}"
+
+
+@register_parser("sales_csv")
+class SalesCsvParser(SalesImportParser, CsvImportParser):
+    """Sales CSV (product_name, quantity_sold, sale_amount) into one shift."""
+
+    async def prepare(self) -> None:
+        await super().prepare()
+        self.lookup = await build_name_lookup(self.db, self.bar_id)
+
+    def _read_header(self, fields: list[str]) -> None:
+        header = [field.strip() for field in fields]
+        missing = [column for column in REQUIRED_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"Missing column(s): {', '.join(missing)}")
+        self.state["columns"] = [header.index(column) for column in REQUIRED_COLUMNS]
+
+    async def write_batch(self, records: list[tuple[int, object]]) -> tuple[int, list[tuple[int, str]]]:
+        """Raises ValueError when the header row is unreadable or lacks a required column."""
+        rows, errors = [], []
+        for number, fields in records:
+            if isinstance(fields, ValueError):
+                if "columns" not in self.state:
+                    raise ValueError(f"Unreadable header: {fields}")
+                errors.append((number, str(fields)))
+                continue
+            if not fields:
+                continue
+            if "columns" not in self.state:
+                self._read_header(fields)
+                continue
+
+            try:
+                product_name, quantity, amount = (
+                    fields[i] if i < len(fields) else "" for i in self.state["columns"]
+                )
+                quantity, amount = float(quantity), float(amount)
+                if not (math.isfinite(quantity) and math.isfinite(amount)):
+                    raise ValueError("quantity_sold and sale_amount must be finite numbers")
+            except ValueError as e:
+                errors.append((number, str(e)))
+                continue
+
+            product_name = product_name.strip()
+            product_id = self.lookup.get(normalize_name(product_name))
+            if product_id is None:
+                errors.append((number, await self._unknown_name(product_name)))
+                continue
+            if product_id is AMBIGUOUS:
+                errors.append((number, f"Product name '{product_name}' matches several products"))
+                continue
+
+            rows.append({
+                "product_id": product_id,
+                "shift_id": self.shift_id,
+                "quantity_sold": quantity,
+                "sale_amount": amount,
+            })
+
+        await write_sales(self.db, self.bar_id, rows, self.business_date)
+        return len(rows), errors
+
+    async def finish(self) -> None:
+        if "columns" not in self.state:
+            raise ValueError("File is empty")
+
+
+async def import_sales_csv(db: AsyncSession, bar_id, shift_id, upload: UploadFile) -> dict:
+    """Import an uploaded sales CSV into a shift within the request."""
+    parser = SalesCsvParser(db, bar_id, {"shift_id": str(shift_id)})
+    await parser.prepare()
+    created, error_count, errors = 0, 0, []
+
+    async for batch in parser.read_batches(upload.read, batch_rows=IMPORT_BATCH_ROWS):
+        written, batch_errors = await parser.write_batch(batch.records)
+        created += written
+        error_count += len(batch_errors)
+        for number, message in batch_errors[:MAX_REPORTED_ERRORS - len(errors)]:
+            errors.append(f"Row {number}: {message}")
+
+    await parser.finish()
+    return {"created": created, "errors": errors, "error_count": error_count}
@@ -0,0 +1,250 @@
+"""
+Streaming POS sales ingestion.
+
+Terminals POST newline-delimited JSON sales (one SalesRecordCreate object
+per line) to /sales/stream and keep the request open for as long as they
+like. Lines are queued in their bar's in-memory buffer, and one writer task
+per bar flushes it as a single transaction whenever SALES_STREAM_BATCH_ROWS
+lines are waiting or the oldest has waited SALES_STREAM_FLUSH_SECONDS, so
+concurrent terminals of a bar share batches. After each flush every stream
+with lines in the batch gets an acknowledgement: its own ack sequence
+number, the bar-wide batch number, the last line covered and the lines
+rejected (bad JSON, unknown product or shift, or a failed write). Lines
+whose idempotency_key was already stored count as accepted and also as
+`replayed`.
+
+Backpressure: a bar holds at most SALES_STREAM_MAX_PENDING_ROWS unwritten
+lines. When the database falls behind, producers wait for room and stop
+reading their request bodies, which slows the terminals down through TCP.
+
+Buffers live in process memory. Lines still buffered when a process dies
+were never acknowledged, so a terminal resends everything after the last
+line it saw acknowledged.
+"""
+import asyncio
+import json
+import logging
+import math
+from collections import deque
+from typing import AsyncIterator, NamedTuple
+
+from pydantic import ValidationError
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.schemas.sales_record import SalesRecordCreate
+from app.services.sales_writer import known_sales_refs, write_sales
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class SalesStream:
+    """One terminal's request: numbered lines in, acknowledgements out."""
+
+    def __init__(self, bar_id):
+        self.bar_id = bar_id
+        self.acks: asyncio.Queue = asyncio.Queue()
+        self.submitted = 0
+        self.acked = 0
+        self.accepted = 0
+        self.rejected = 0
+        self.acks_sent = 0
+        # Why reading the body stopped early, if it did
+        self.error: str | None = None
+
+    def acknowledge(self, ack: dict) -> None:
+        self.acked += ack["accepted"] + len(ack["rejected"])
+        self.accepted += ack["accepted"]
+        self.rejected += len(ack["rejected"])
+        self.acks_sent += 1
+        self.acks.put_nowait({"seq": self.acks_sent, **ack})
+
+
+class PendingSale(NamedTuple):
+    stream: SalesStream
+    line: int
+    row: dict | None
+    error: str | None
+    queued_at: float
+
+
+class BarSalesBuffer:
+    """Unwritten stream lines of one bar and the task writing them."""
+
+    def __init__(self, bar_id):
+        self.bar_id = bar_id
+        self.pending: deque[PendingSale] = deque()
+        self.batches = 0
+        self._changed = asyncio.Condition()
+        self._writer: asyncio.Task | None = None
+
+    async def put(self, sale: PendingSale) -> None:
+        """Queue a line, waiting while the bar already has too many unwritten."""
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self.pending) < settings.SALES_STREAM_MAX_PENDING_ROWS)
+            self.pending.append(sale)
+            if self._writer is None:
+                self._writer = asyncio.create_task(self._write_loop(), name=f"sales-stream-{self.bar_id}")
+            self._changed.notify_all()
+
+    async def _next_batch(self) -> list[PendingSale]:
+        loop = asyncio.get_running_loop()
+        async with self._changed:
+            deadline = self.pending[0].queued_at + settings.SALES_STREAM_FLUSH_SECONDS
+            while len(self.pending) < settings.SALES_STREAM_BATCH_ROWS:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            size = min(len(self.pending), settings.SALES_STREAM_BATCH_ROWS)
+            batch = [self.pending.popleft() for _ in range(size)]
+            self._changed.notify_all()
+            return batch
+
+    async def _write_loop(self) -> None:
+        while True:
+            async with self._changed:
+                if not self.pending:
+                    self._writer = None
+                    return
+            batch = await self._next_batch()
+            self.batches += 1
+            await self._flush(self.batches, batch)
+
+    async def _flush(self, batch_number: int, batch: list[PendingSale]) -> None:
+        errors = {i: sale.error for i, sale in enumerate(batch) if sale.error}
+        candidates = [(i, sale.row) for i, sale in enumerate(batch) if sale.row is not None]
+        replayed = set()
+        try:
+            async with AsyncSessionLocal() as db:
+                known_products, known_shifts = await known_sales_refs(db, self.bar_id, [row for _, row in candidates])
+                positions, rows = [], []
+                for i, row in candidates:
+                    if row["product_id"] not in known_products:
+                        errors[i] = f"Unknown product {row['product_id']}"
+                    elif row["shift_id"] not in known_shifts:
+                        errors[i] = f"Unknown shift {row['shift_id']}"
+                    else:
+                        positions.append(i)
+                        rows.append(row)
+                written = await write_sales(db, self.bar_id, rows)
+                await db.commit()
+            replayed = {i for i, record in zip(positions, written) if record["replayed"]}
+        except Exception as e:
+            logger.exception("Streamed sales batch %s for bar %s failed", batch_number, self.bar_id)
+            for i, _ in candidates:
+                errors.setdefault(i, f"Write failed, resend: {type(e).__name__}")
+
+        acks: dict[SalesStream, dict] = {}
+        for i, sale in enumerate(batch):
+            ack = acks.setdefault(
+                sale.stream, {"batch": batch_number, "through": 0, "accepted": 0, "replayed": 0, "rejected": []},
+            )
+            ack["through"] = sale.line
+            if i in errors:
+                ack["rejected"].append({"line": sale.line, "error": errors[i]})
+            else:
+                ack["accepted"] += 1
+                ack["replayed"] += i in replayed
+        for stream, ack in acks.items():
+            stream.acknowledge(ack)
+
+
+_buffers: dict = {}
+
+
+def get_sales_buffer(bar_id) -> BarSalesBuffer:
+    buffer = _buffers.get(bar_id)
+    if buffer is None:
+        buffer = _buffers[bar_id] = BarSalesBuffer(bar_id)
+    return buffer
+
+
+async def drain_sales_buffers(timeout: float | None = None) -> None:
+    """Wait (up to `timeout`) for every bar's buffered lines to be written, e.g. on shutdown."""
+    writers = [buffer._writer for buffer in _buffers.values() if buffer._writer is not None]
+    if writers:
+        await asyncio.wait(writers, timeout=timeout)
+
+
+def _parse_line(raw: bytes) -> tuple[dict | None, str | None]:
+    if len(raw) > settings.SALES_STREAM_MAX_LINE_BYTES:
+        return None, f"Line longer than {settings.SALES_STREAM_MAX_LINE_BYTES} bytes"
+    try:
+        sale = SalesRecordCreate.model_validate_json(raw)
+    except ValidationError as e:
+        return None, "; ".join(
+            f"{'.'.join(map(str, err['loc']))}: {err['msg']}" if err["loc"] else err["msg"]
+            for err in e.errors()
+        )
+    if not (math.isfinite(sale.quantity_sold) and math.isfinite(sale.sale_amount)):
+        return None, "quantity_sold and sale_amount must be finite numbers"
+    return sale.model_dump(), None
+
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buffer = b""
+    async for chunk in body:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buffer) > settings.SALES_STREAM_MAX_LINE_BYTES:
+            # Keep the oversized line's length known without holding all of it
+            buffer = buffer[:settings.SALES_STREAM_MAX_LINE_BYTES + 1]
+    if buffer:
+        yield buffer
+
+
+async def _feed(stream: SalesStream, body: AsyncIterator[bytes]) -> None:
+    buffer = get_sales_buffer(stream.bar_id)
+    loop = asyncio.get_running_loop()
+    try:
+        number = 0
+        async for raw in _lines(body):
+            number += 1
+            raw = raw.strip()
+            if not raw:
+                continue
+            row, line_error = _parse_line(raw)
+            await buffer.put(PendingSale(stream, number, row, line_error, loop.time()))
+            stream.submitted += 1
+    except Exception as e:
+        # The terminal went away or the body broke off; what was queued is still written
+        stream.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+    # End-of-input marker for stream_sales
+    stream.acks.put_nowait(None)
+
+
+async def stream_sales(bar_id, body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Feed an NDJSON request body into the bar's buffer and yield NDJSON
+    acknowledgements as batches commit, then a final summary line.
+    """
+    stream = SalesStream(bar_id)
+    feeder = asyncio.create_task(_feed(stream, body))
+    fed = False
+    try:
+        while not (fed and stream.acked == stream.submitted):
+            ack = await stream.acks.get()
+            if ack is None:
+                fed = True
+                continue
+            yield (json.dumps(ack) + "\n").encode()
+    finally:
+        if not feeder.done():
+            feeder.cancel()
+
+    summary = {
+        "done": True,
+        "lines": stream.submitted,
+        "accepted": stream.accepted,
+        "rejected": stream.rejected,
+    }
+    if stream.error:
+        summary["error"] = stream.error
+    yield (json.dumps(summary) + "\n").encode()
@@ -0,0 +1,175 @@
+"""
+Batched sales writes.
+
+Imports and the bulk endpoint hand rows (mappings with product_id,
+shift_id, quantity_sold and sale_amount) to write_sales, which stamps ids,
+created_at and the bar's business date and inserts each batch with one
+INSERT ... SELECT FROM unnest(...) RETURNING: one array parameter per
+column, so a batch costs a single round-trip and no bind-parameter limit
+applies. The returned rows (amounts as stored, after Numeric rounding)
+feed the shift ledger and daily rollups in the same transaction and are
+what callers build responses from. The rows never become ORM objects, so
+dashboards are invalidated explicitly.
+
+Rows may carry an idempotency_key (see services.idempotency). Keys are
+claimed per batch before the insert, one more statement when a batch has
+any. A key the bar already stored, or one repeated within the call, is not
+inserted again: its row comes back as first stored, with replayed=True, and
+is left out of the ledger.
+
+known_sales_refs / check_sales_refs validate the products and shifts a
+batch references against the bar with one query each.
+"""
+import uuid
+from datetime import date, datetime
+from typing import Iterable
+
+from sqlalchemy import bindparam, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Product, SalesRecord, Shift
+from app.services.business_date import business_today
+from app.services.cache import mark_bar_dirty
+from app.services.idempotency import claim_keys, recent_keys, remember_keys, stored_rows
+from app.services.ledger import record_sales
+
+# Rows per INSERT statement; bounds the size of each array parameter
+INSERT_BATCH_ROWS = 10000
+
+SALES_TABLE = "sales_records"
+
+SALES_COLUMNS = (
+    "id", "bar_id", "product_id", "shift_id", "quantity_sold", "sale_amount", "created_at", "business_date",
+    "idempotency_key",
+)
+
+# Unknown ids quoted in a validation error
+MAX_REPORTED_REFS = 5
+
+
+def _build_insert():
+    table = SalesRecord.__table__
+    source = select(*[
+        func.unnest(bindparam(name, type_=ARRAY(table.c[name].type))).label(name)
+        for name in SALES_COLUMNS
+    ])
+    return insert(table).from_select(list(SALES_COLUMNS), source).returning(*table.c)
+
+
+_INSERT_SALES = _build_insert()
+
+
+def _unknown(kind: str, ids: set) -> str:
+    listed = ", ".join(sorted(str(i) for i in ids)[:MAX_REPORTED_REFS])
+    more = f" and {len(ids) - MAX_REPORTED_REFS} more" if len(ids) > MAX_REPORTED_REFS else ""
+    return f"Unknown {kind}(s) for this bar: {listed}{more}"
+
+
+async def known_sales_refs(db: AsyncSession, bar_id, rows: Iterable[dict]) -> tuple[set, set]:
+    """The product ids and shift ids referenced by `rows` that belong to the bar."""
+    product_ids, shift_ids = set(), set()
+    for row in rows:
+        product_ids.add(row["product_id"])
+        shift_ids.add(row["shift_id"])
+
+    known_products, known_shifts = set(), set()
+    if product_ids:
+        result = await db.execute(select(Product.id).where(Product.bar_id == bar_id, Product.id.in_(product_ids)))
+        known_products = set(result.scalars().all())
+    if shift_ids:
+        result = await db.execute(select(Shift.id).where(Shift.bar_id == bar_id, Shift.id.in_(shift_ids)))
+        known_shifts = set(result.scalars().all())
+    return known_products, known_shifts
+
+
+async def check_sales_refs(db: AsyncSession, bar_id, rows: Iterable[dict]) -> None:
+    """Raise ValueError unless every product_id and shift_id in `rows` belongs to the bar."""
+    rows = list(rows)
+    known_products, known_shifts = await known_sales_refs(db, bar_id, rows)
+    missing = {row["product_id"] for row in rows} - known_products
+    if missing:
+        raise ValueError(_unknown("product", missing))
+    missing = {row["shift_id"] for row in rows} - known_shifts
+    if missing:
+        raise ValueError(_unknown("shift", missing))
+
+
+async def write_sales(
+    db: AsyncSession, bar_id, rows: Iterable[dict], business_date: date | None = None,
+) -> list[dict]:
+    """
+    Insert sales rows for the bar and return them as stored, in input order,
+    each with a `replayed` flag (see the module docstring).
+    """
+    rows = list(rows)
+    results: list[dict | None] = [None] * len(rows)
+    fresh, repeats, first_by_key = [], [], {}
+    for i, row in enumerate(rows):
+        key = row.get("idempotency_key")
+        if key is None:
+            fresh.append(i)
+        elif key in first_by_key:
+            repeats.append((i, first_by_key[key]))
+        else:
+            first_by_key[key] = i
+            cached = recent_keys.get(SALES_TABLE, bar_id, key)
+            if cached is not None:
+                results[i] = {**cached, "replayed": True}
+            else:
+                fresh.append(i)
+
+    written = []
+    if fresh:
+        if business_date is None:
+            business_date = await business_today(db, bar_id)
+        now = datetime.utcnow()
+        conflicts = {}
+        for start in range(0, len(fresh), INSERT_BATCH_ROWS):
+            positions = fresh[start:start + INSERT_BATCH_ROWS]
+            ids = {i: uuid.uuid4() for i in positions}
+            claimed = await claim_keys(db, SALES_TABLE, bar_id, [
+                {"idempotency_key": rows[i].get("idempotency_key"), "id": ids[i], "created_at": now}
+                for i in positions
+            ])
+            kept = []
+            for i in positions:
+                key = rows[i].get("idempotency_key")
+                if key is None or key in claimed:
+                    kept.append(i)
+                else:
+                    conflicts[key] = i
+            if not kept:
+                continue
+
+            batch = [rows[i] for i in kept]
+            params = {
+                "id": [ids[i] for i in kept],
+                "bar_id": [bar_id] * len(batch),
+                "product_id": [row["product_id"] for row in batch],
+                "shift_id": [row["shift_id"] for row in batch],
+                "quantity_sold": [row["quantity_sold"] for row in batch],
+                "sale_amount": [row["sale_amount"] for row in batch],
+                "created_at": [now] * len(batch),
+                "business_date": [business_date] * len(batch),
+                "idempotency_key": [row.get("idempotency_key") for row in batch],
+            }
+            result = await db.execute(_INSERT_SALES, params)
+            # RETURNING order is not guaranteed
+            stored = {row["id"]: dict(row, replayed=False) for row in result.mappings()}
+            for i in kept:
+                results[i] = stored[ids[i]]
+                written.append(results[i])
+
+        existing = await stored_rows(db, SalesRecord, bar_id, conflicts)
+        for key, i in conflicts.items():
+            results[i] = {**existing[key], "replayed": True}
+
+    for i, first in repeats:
+        results[i] = {**results[first], "replayed": True}
+
+    if written:
+        await record_sales(db, bar_id, written)
+        mark_bar_dirty(db, bar_id)
+    remember_keys(db, SALES_TABLE, bar_id, (results[i] for i in first_by_key.values()))
+    return results
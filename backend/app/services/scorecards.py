@@ -0,0 +1,206 @@
+"""
+Staff daily scorecards.
+
+A scorecard row holds one staff member's closed shifts on one business
+day (the one the shift opened on), the loss reports raised on those shifts and the
+sales recorded in them. Rows are recomputed from their shifts whenever
+something feeding them changes: a shift is reconciled, re-reconciled or
+replayed, or one of its loss reports is reviewed. Recomputing a handful
+of (staff, day) rows keeps every refresh idempotent and independent of
+the order writes arrive in.
+
+Reads sum the daily rows over the requested window with a single range
+query on (bar_id, day).
+"""
+from datetime import date, timedelta
+from typing import Iterable
+
+from sqlalchemy import delete, func, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import (
+    User, Shift, ShiftStatus, LossReport, ShiftProductLedger, StaffDailyScorecard,
+)
+from app.services.cache import mark_bar_dirty
+from app.services.partitions import business_date_window
+
+SCORECARD_FIELDS = (
+    "shifts_worked", "hours_worked", "loss_incidents", "reviewed_incidents",
+    "loss_value", "sales_count", "sales_value",
+)
+
+# Keeps the (staff_id, day) IN list well under the bind-parameter limit
+KEY_CHUNK_SIZE = 1000
+
+
+async def refresh_scorecards(db: AsyncSession, bar_id, keys: Iterable[tuple] | None = None) -> int:
+    """
+    Recompute the bar's scorecard rows for the given (staff_id, day) keys,
+    or every row when keys is None. Keys left without a closed shift are
+    removed. Returns the number of keys refreshed (rows written for None).
+    """
+    if keys is None:
+        await db.execute(delete(StaffDailyScorecard).where(StaffDailyScorecard.bar_id == bar_id))
+        written = await _insert_aggregates(db, bar_id, None)
+        mark_bar_dirty(db, bar_id)
+        return written
+
+    # Sorted keys give concurrent refreshes a consistent lock order
+    keys = sorted(set(keys), key=lambda key: (str(key[0]), key[1]))
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        chunk = keys[start:start + KEY_CHUNK_SIZE]
+        await db.execute(
+            delete(StaffDailyScorecard).where(
+                StaffDailyScorecard.bar_id == bar_id,
+                tuple_(StaffDailyScorecard.staff_id, StaffDailyScorecard.day).in_(chunk),
+            )
+        )
+        await _insert_aggregates(db, bar_id, chunk)
+    if keys:
+        mark_bar_dirty(db, bar_id)
+    return len(keys)
+
+
+async def _insert_aggregates(db: AsyncSession, bar_id, keys: list | None) -> int:
+    """INSERT ... SELECT the scorecard aggregates of the bar's closed shifts, optionally limited to keys."""
+    day = Shift.business_date
+    shift_filter = [
+        Shift.bar_id == bar_id,
+        Shift.status == ShiftStatus.CLOSED,
+        Shift.end_time.is_not(None),
+    ]
+    if keys is not None:
+        shift_filter.append(tuple_(Shift.staff_id, day).in_(keys))
+
+    shifts = (
+        select(
+            Shift.id,
+            Shift.staff_id,
+            day.label("day"),
+            (func.extract("epoch", Shift.end_time - Shift.start_time) / 3600).label("hours"),
+        )
+        .where(*shift_filter)
+        .cte("scorecard_shifts")
+    )
+    loss_filter = [LossReport.shift_id.in_(select(shifts.c.id))]
+    if keys is not None:
+        loss_filter.append(business_date_window(LossReport, min(key_day for _, key_day in keys)))
+    losses = (
+        select(
+            LossReport.shift_id,
+            func.count().label("incidents"),
+            func.count(LossReport.reason_code).label("reviewed"),
+            func.sum(LossReport.loss_value).label("value"),
+        )
+        .where(*loss_filter)
+        .group_by(LossReport.shift_id)
+        .subquery()
+    )
+    sales = (
+        select(
+            ShiftProductLedger.shift_id,
+            func.sum(ShiftProductLedger.sales_count).label("count"),
+            func.sum(ShiftProductLedger.revenue).label("value"),
+        )
+        .where(ShiftProductLedger.shift_id.in_(select(shifts.c.id)))
+        .group_by(ShiftProductLedger.shift_id)
+        .subquery()
+    )
+    aggregates = (
+        select(
+            shifts.c.staff_id,
+            shifts.c.day,
+            literal(bar_id, StaffDailyScorecard.bar_id.type).label("bar_id"),
+            func.count(shifts.c.id),
+            func.coalesce(func.sum(shifts.c.hours), 0),
+            func.coalesce(func.sum(losses.c.incidents), 0),
+            func.coalesce(func.sum(losses.c.reviewed), 0),
+            func.coalesce(func.sum(losses.c.value), 0),
+            func.coalesce(func.sum(sales.c.count), 0),
+            func.coalesce(func.sum(sales.c.value), 0),
+            func.timezone("utc", func.now()),
+        )
+        .select_from(
+            shifts
+            .outerjoin(losses, losses.c.shift_id == shifts.c.id)
+            .outerjoin(sales, sales.c.shift_id == shifts.c.id)
+        )
+        .group_by(shifts.c.staff_id, shifts.c.day)
+    )
+
+    stmt = pg_insert(StaffDailyScorecard).from_select(
+        ["staff_id", "day", "bar_id", *SCORECARD_FIELDS, "updated_at"], aggregates,
+    )
+    # A concurrent refresh of the same key may have inserted it first
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[StaffDailyScorecard.staff_id, StaffDailyScorecard.day],
+        set_={
+            **{field: stmt.excluded[field] for field in SCORECARD_FIELDS},
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    result = await db.execute(stmt)
+    return result.rowcount
+
+
+async def refresh_shift_scorecards(db: AsyncSession, bar_id, shift_ids: Iterable) -> int:
+    """Refresh the scorecard rows the given shifts belong to."""
+    shift_ids = list(shift_ids)
+    if not shift_ids:
+        return 0
+    result = await db.execute(
+        select(Shift.staff_id, Shift.business_date)
+        .where(Shift.id.in_(shift_ids), Shift.end_time.is_not(None))
+        .distinct()
+    )
+    return await refresh_scorecards(db, bar_id, [tuple(row) for row in result.all()])
+
+
+def window_start(days: int, today: date) -> date:
+    """First day of a `days`-day window ending on business date `today`."""
+    return today - timedelta(days=days - 1)
+
+
+async def staff_scorecards(db: AsyncSession, bar_id, date_from: date, date_to: date | None = None) -> list[dict]:
+    """
+    Every user of the bar with their scorecard totals over [date_from,
+    date_to], zeros for users without shifts, highest loss value first.
+    """
+    window = [StaffDailyScorecard.bar_id == bar_id, StaffDailyScorecard.day >= date_from]
+    if date_to is not None:
+        window.append(StaffDailyScorecard.day <= date_to)
+    totals = (
+        select(
+            StaffDailyScorecard.staff_id,
+            *(func.sum(getattr(StaffDailyScorecard, field)).label(field) for field in SCORECARD_FIELDS),
+        )
+        .where(*window)
+        .group_by(StaffDailyScorecard.staff_id)
+        .subquery()
+    )
+    result = await db.execute(
+        select(User.id, User.full_name, User.role, *(totals.c[field] for field in SCORECARD_FIELDS))
+        .outerjoin(totals, totals.c.staff_id == User.id)
+        .where(User.bar_id == bar_id)
+    )
+
+    scorecards = []
+    for row in result.all():
+        shifts_worked = int(row.shifts_worked or 0)
+        loss_value = float(row.loss_value or 0)
+        scorecards.append({
+            "id": str(row.id),
+            "name": row.full_name,
+            "role": row.role.value,
+            "shifts_worked": shifts_worked,
+            "hours_worked": round(float(row.hours_worked or 0), 2),
+            "loss_incidents": int(row.loss_incidents or 0),
+            "reviewed_incidents": int(row.reviewed_incidents or 0),
+            "loss_value": round(loss_value, 2),
+            "loss_per_shift": round(loss_value / shifts_worked, 2) if shifts_worked else 0,
+            "sales_count": int(row.sales_count or 0),
+            "sales_value": round(float(row.sales_value or 0), 2),
+        })
+    scorecards.sort(key=lambda s: s["loss_value"], reverse=True)
+    return scorecards
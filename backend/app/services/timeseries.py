@@ -0,0 +1,265 @@
+"""
+Time-bucketed metric series for analytics.
+
+Series are summed into date_trunc buckets from the cheapest source that can
+answer the query:
+
+- rollups: daily_product_rollups plus today's raw tail (day, week and month
+  buckets, optional product or category filter);
+- scorecards: staff_daily_scorecards for a staff filter on its own, bucketed
+  by the business date each shift opened on;
+- raw: sales_records / loss_reports, for hourly buckets and filter
+  combinations the rollups cannot answer. Limited to
+  ANALYTICS_RAW_MAX_DAYS per request.
+
+Days are the bar's business dates. Hourly buckets are in the bar's local
+time and run from the cutover hour of date_from to that of date_to + 1;
+they place loss reports at the hour they were raised, so a shift closed
+after the cutover counts towards its business date by day but towards the
+next day's hours.
+
+Empty buckets are filled with zeros and long series are downsampled with
+largest-triangle-three-buckets (LTTB), which keeps the visual peaks and
+dips a plain stride would drop.
+"""
+import enum
+import math
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+import numpy as np
+from sqlalchemy import DateTime, cast, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import get_settings
+from app.models import (
+    LossReport, Product, ProductCategory, SalesRecord, Shift, StaffDailyScorecard,
+)
+from app.services.business_date import BarClock, get_bar_clock
+from app.services.partitions import business_date_window
+from app.services.rollups import daily_facts
+
+settings = get_settings()
+
+
+class TimeseriesMetric(str, enum.Enum):
+    REVENUE = "revenue"
+    UNITS_SOLD = "units_sold"
+    SALES_COUNT = "sales_count"
+    LOSS_VALUE = "loss_value"
+    LOSS_INCIDENTS = "loss_incidents"
+    LOSS_QUANTITY = "loss_quantity"
+
+
+class TimeBucket(str, enum.Enum):
+    HOUR = "hour"
+    DAY = "day"
+    WEEK = "week"
+    MONTH = "month"
+
+
+# Raw-table aggregate per metric: (model, aggregate factory)
+RAW_METRICS = {
+    TimeseriesMetric.REVENUE: (SalesRecord, lambda: func.sum(SalesRecord.sale_amount)),
+    TimeseriesMetric.UNITS_SOLD: (SalesRecord, lambda: func.sum(SalesRecord.quantity_sold)),
+    TimeseriesMetric.SALES_COUNT: (SalesRecord, lambda: func.count(SalesRecord.id)),
+    TimeseriesMetric.LOSS_VALUE: (LossReport, lambda: func.sum(LossReport.loss_value)),
+    TimeseriesMetric.LOSS_INCIDENTS: (LossReport, lambda: func.count(LossReport.id)),
+    TimeseriesMetric.LOSS_QUANTITY: (LossReport, lambda: func.sum(LossReport.discrepancy_quantity)),
+}
+
+# Scorecard column per metric, where the scorecards track it
+SCORECARD_METRICS = {
+    TimeseriesMetric.REVENUE: "sales_value",
+    TimeseriesMetric.SALES_COUNT: "sales_count",
+    TimeseriesMetric.LOSS_VALUE: "loss_value",
+    TimeseriesMetric.LOSS_INCIDENTS: "loss_incidents",
+}
+
+
+class TimeseriesQuery(NamedTuple):
+    metric: TimeseriesMetric
+    bucket: TimeBucket
+    date_from: date
+    date_to: date
+    product_id: object = None
+    category: ProductCategory | None = None
+    staff_id: object = None
+
+    def cache_variant(self) -> str:
+        return ":".join(str(value) for value in self)
+
+
+def choose_source(query: TimeseriesQuery) -> str:
+    """Pick the series source for a query; raises ValueError when none can answer it."""
+    if query.bucket == TimeBucket.HOUR:
+        source = "raw"
+    elif query.staff_id is None:
+        source = "rollups"
+    elif query.product_id is None and query.category is None and query.metric in SCORECARD_METRICS:
+        source = "scorecards"
+    else:
+        source = "raw"
+
+    if source == "raw" and (query.date_to - query.date_from).days + 1 > settings.ANALYTICS_RAW_MAX_DAYS:
+        raise ValueError(
+            f"Hourly buckets, and staff filters combined with a product, a category or "
+            f"{query.metric.value}, are read from raw rows and limited to "
+            f"{settings.ANALYTICS_RAW_MAX_DAYS} days"
+        )
+    return source
+
+
+async def _bucket_totals(db: AsyncSession, bar_id, query: TimeseriesQuery, source: str, clock: BarClock) -> dict:
+    """{bucket start: total} for the buckets that have data."""
+    if source == "rollups":
+        facts = daily_facts(bar_id, query.date_from, clock.business_date(), query.date_to)
+        # date_trunc on a date yields timestamptz; truncate a timestamp to match the naive bucket starts
+        bucket = func.date_trunc(query.bucket.value, cast(facts.c.day, DateTime))
+        stmt = select(bucket, func.sum(facts.c[query.metric.value]))
+        if query.product_id is not None:
+            stmt = stmt.where(facts.c.product_id == query.product_id)
+        if query.category is not None:
+            stmt = stmt.join(Product, Product.id == facts.c.product_id).where(Product.category == query.category)
+    elif source == "scorecards":
+        bucket = func.date_trunc(query.bucket.value, cast(StaffDailyScorecard.day, DateTime))
+        stmt = select(bucket, func.sum(getattr(StaffDailyScorecard, SCORECARD_METRICS[query.metric]))).where(
+            StaffDailyScorecard.bar_id == bar_id,
+            StaffDailyScorecard.staff_id == query.staff_id,
+            StaffDailyScorecard.day >= query.date_from,
+            StaffDailyScorecard.day <= query.date_to,
+        )
+    else:
+        model, aggregate = RAW_METRICS[query.metric]
+        if query.bucket == TimeBucket.HOUR:
+            # Stored UTC moments shifted to the bar's wall clock
+            local_time = func.timezone(clock.timezone, func.timezone("UTC", model.created_at))
+            bucket = func.date_trunc("hour", local_time)
+            window = [
+                model.created_at >= clock.day_start(query.date_from),
+                model.created_at < clock.day_start(query.date_to + timedelta(days=1)),
+            ]
+        else:
+            bucket = func.date_trunc(query.bucket.value, cast(model.business_date, DateTime))
+            window = [
+                model.business_date >= query.date_from,
+                model.business_date <= query.date_to,
+                business_date_window(model, query.date_from, query.date_to),
+            ]
+        stmt = select(bucket, aggregate()).where(model.bar_id == bar_id, *window)
+        if query.product_id is not None:
+            stmt = stmt.where(model.product_id == query.product_id)
+        if query.category is not None:
+            stmt = stmt.join(Product, Product.id == model.product_id).where(Product.category == query.category)
+        if query.staff_id is not None:
+            stmt = stmt.join(Shift, Shift.id == model.shift_id).where(Shift.staff_id == query.staff_id)
+
+    result = await db.execute(stmt.group_by(bucket).order_by(bucket))
+    return {start: float(total or 0) for start, total in result.all()}
+
+
+def bucket_starts(bucket: TimeBucket, date_from: date, date_to: date, cutover_hour: int = 0) -> list[datetime]:
+    """
+    Every bucket start covering [date_from, date_to], aligned like Postgres
+    date_trunc. Hourly starts run from the cutover hour of each business day.
+    """
+    day_start = time(cutover_hour) if bucket == TimeBucket.HOUR else time()
+    end = datetime.combine(date_to + timedelta(days=1), day_start)
+    current = datetime.combine(date_from, day_start)
+    if bucket == TimeBucket.WEEK:
+        current -= timedelta(days=current.weekday())
+    elif bucket == TimeBucket.MONTH:
+        current = current.replace(day=1)
+
+    starts = []
+    while current < end:
+        starts.append(current)
+        if bucket == TimeBucket.HOUR:
+            current += timedelta(hours=1)
+        elif bucket == TimeBucket.DAY:
+            current += timedelta(days=1)
+        elif bucket == TimeBucket.WEEK:
+            current += timedelta(weeks=1)
+        else:
+            current = current.replace(year=current.year + current.month // 12, month=current.month % 12 + 1)
+    return starts
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Indices of the points largest-triangle-three-buckets keeps when reducing
+    (x, y) to `threshold` points. First and last points are always kept.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    every = (n - 2) / (threshold - 2)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle vertex
+        next_start = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(areas.argmax())
+        selected[i + 1] = a
+    selected[-1] = n - 1
+    return selected
+
+
+async def _series(
+    db: AsyncSession, bar_id, query: TimeseriesQuery, source: str, clock: BarClock, max_points: int,
+) -> dict:
+    totals = await _bucket_totals(db, bar_id, query, source, clock)
+    starts = bucket_starts(query.bucket, query.date_from, query.date_to, clock.cutover_hour)
+    values = np.array([totals.get(start, 0.0) for start in starts], dtype=np.float64)
+    x = np.array([start.timestamp() for start in starts], dtype=np.float64)
+    keep = lttb(x, values, max_points)
+    return {
+        "total_points": len(starts),
+        "downsampled": len(keep) < len(starts),
+        "points": [{"t": starts[i].isoformat(), "v": round(float(values[i]), 2)} for i in keep],
+    }
+
+
+def _year_earlier(day: date) -> date:
+    try:
+        return day.replace(year=day.year - 1)
+    except ValueError:  # 29 February
+        return day.replace(year=day.year - 1, day=28)
+
+
+async def compute_timeseries(
+    db: AsyncSession,
+    bar_id,
+    query: TimeseriesQuery,
+    max_points: int,
+    compare_previous_year: bool = False,
+) -> dict:
+    """The series for a query, plus the same range a year earlier when asked for."""
+    source = choose_source(query)
+    clock = await get_bar_clock(db, bar_id)
+    series = await _series(db, bar_id, query, source, clock, max_points)
+    response = {
+        "metric": query.metric.value,
+        "bucket": query.bucket.value,
+        "date_from": str(query.date_from),
+        "date_to": str(query.date_to),
+        "source": source,
+        "max_points": max_points,
+        **series,
+        "previous_year": None,
+    }
+    if compare_previous_year:
+        previous = query._replace(date_from=_year_earlier(query.date_from), date_to=_year_earlier(query.date_to))
+        response["previous_year"] = (await _series(db, bar_id, previous, source, clock, max_points))["points"]
+    return response
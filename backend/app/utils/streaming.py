@@ -0,0 +1,16 @@
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    Streaming response whose body generator is still reading the request
+    body. StreamingResponse watches `receive` for a disconnect while it
+    streams, which would swallow request body chunks; here the generator is
+    the only reader and sees a disconnect as ClientDisconnect instead.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
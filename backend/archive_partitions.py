@@ -0,0 +1,51 @@
+"""
+archive_partitions.py
+Detaches the monthly partitions of sales_records, stock_movements and
+loss_reports older than a month, so old history can be dumped and dropped
+without touching the live tables. Detached partitions stay as standalone
+tables (e.g. sales_records_p202401) until --drop, or until you drop them
+after e.g. `pg_dump -t sales_records_p202401`.
+
+Daily rollups, scorecards, reconciliations and the shift ledger are kept;
+raw-row reads (hourly charts, replays, ledger checks) only cover the
+months still attached.
+
+    python archive_partitions.py --before 2025-01 [--drop]
+"""
+import argparse
+import asyncio
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+from app.database import engine
+from app.services.partitions import detach_partitions_before
+
+
+async def main(before: date, drop: bool):
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        detached = await detach_partitions_before(conn, before)
+        for name in detached:
+            print(f"Detached {name}")
+            if drop:
+                await conn.execute(text(f"DROP TABLE {name}"))
+                print(f"Dropped {name}")
+    await engine.dispose()
+
+    if not detached:
+        print(f"No partitions before {before:%Y-%m}.")
+    else:
+        print(f"✅ {len(detached)} partition(s) before {before:%Y-%m} {'dropped' if drop else 'detached'}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--before", required=True, type=lambda value: datetime.strptime(value, "%Y-%m").date(),
+        help="First month to keep, YYYY-MM",
+    )
+    parser.add_argument("--drop", action="store_true", help="Drop the detached tables")
+    args = parser.parse_args()
+    asyncio.run(main(args.before, args.drop))
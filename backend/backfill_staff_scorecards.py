@@ -0,0 +1,45 @@
+"""
+backfill_staff_scorecards.py
+Rebuild staff_daily_scorecards from closed shifts, their loss reports and
+the shift product ledger. Needed once on a database with history; after
+that, rows are refreshed as shifts close and losses are reviewed.
+
+Replaces the stored scorecards of the bars in scope.
+
+    python backfill_staff_scorecards.py [--bar BAR_UUID]
+"""
+import argparse
+import asyncio
+import uuid
+
+from sqlalchemy import select
+
+from app.database import engine, AsyncSessionLocal, Base
+from app.models import Bar
+from app.services.scorecards import refresh_scorecards
+
+
+async def main(bar_id: uuid.UUID | None):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        if bar_id:
+            bar_ids = [bar_id]
+        else:
+            bar_ids = (await db.execute(select(Bar.id))).scalars().all()
+
+        for current in bar_ids:
+            written = await refresh_scorecards(db, current)
+            await db.commit()
+            print(f"  {current}: {written} staff/day rows")
+
+    await engine.dispose()
+    print("✅ Staff scorecards rebuilt.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bar", type=uuid.UUID, default=None, help="Limit to one bar")
+    args = parser.parse_args()
+    asyncio.run(main(args.bar))
@@ -0,0 +1,8 @@
+"""
+Benchmark suite for the reconciliation engine and the read-heavy endpoints.
+
+Seeds a synthetic bar of configurable size (benchmarks.generator), times
+scenarios against it (benchmarks.runner) and emits a JSON report with
+latency percentiles, SQL statement counts and rows written, for comparing
+runs before and after engine changes. Run with `python -m benchmarks`.
+"""
@@ -0,0 +1,68 @@
+"""
+Run the benchmark suite against the database from DATABASE_URL.
+
+    python -m benchmarks [--skus 500] [--shifts 14] [--sales-per-product 4]
+                         [--movement-density 0.2] [--leak-rate 0.3] [--seed 42]
+                         [--repeat 10] [--warmup 1] [--scenarios reconcile close_shift ...]
+                         [--output results.json] [--keep]
+    python -m benchmarks compare before.json after.json
+
+Query plan regressions are checked by tests/test_query_plans.py.
+
+Use a disposable database: the synthetic bar is committed while the
+scenarios run and purged afterwards (kept with --keep).
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from app.database import engine
+from benchmarks.generator import SyntheticBarSpec
+from benchmarks.runner import DEFAULT_SCENARIOS, SCENARIOS, compare_reports, dump_report, run_benchmarks
+
+
+async def main(args) -> None:
+    spec = SyntheticBarSpec(
+        skus=args.skus,
+        shifts=args.shifts,
+        sales_per_product=args.sales_per_product,
+        movement_density=args.movement_density,
+        leak_rate=args.leak_rate,
+        seed=args.seed,
+    )
+    try:
+        report = await run_benchmarks(spec, args.scenarios, repeat=args.repeat, warmup=args.warmup, keep=args.keep)
+    finally:
+        await engine.dispose()
+    dump_report(report, args.output)
+
+    mismatch = report["scenarios"].get("reconcile_per_product", {}).get("matches_set_based") is False
+    if mismatch:
+        print("❌ Set-based and per-product reconciliation results differ.", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        parser = argparse.ArgumentParser(prog="python -m benchmarks compare")
+        parser.add_argument("before")
+        parser.add_argument("after")
+        args = parser.parse_args(sys.argv[2:])
+        with open(args.before) as before, open(args.after) as after:
+            print(compare_reports(json.load(before), json.load(after)))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--skus", type=int, default=500)
+    parser.add_argument("--shifts", type=int, default=14, help="Closed shifts of history to seed")
+    parser.add_argument("--sales-per-product", type=float, default=4.0, help="Mean sale rows per product per shift")
+    parser.add_argument("--movement-density", type=float, default=0.2, help="Share of products delivered per shift")
+    parser.add_argument("--leak-rate", type=float, default=0.3, help="Share of products closing with a discrepancy")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic bar afterwards")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,262 @@
+"""
+Synthetic bar generator.
+
+Seeds a self-contained bar (owner, staff, products, a history of closed
+shifts with counts, sales and deliveries, plus the reconciliation rows the
+engine would have written for them) with bulk inserts, so benchmarks run
+against realistic volumes without going through the API.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from sqlalchemy import bindparam, delete, insert, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import Base
+from app.middleware.auth import create_access_token
+from app.models import (
+    Bar, User, UserRole, Product, ProductCategory, ProductUnit, Shift, ShiftStatus,
+    ShiftStockCount, SalesRecord, StockMovement, MovementType, MovementReason,
+)
+from app.services.ledger import check_ledger, record_received, record_sales
+from app.services.partitions import ensure_partitions
+from app.services.reconciliation_replay import replay_bar
+from app.services.rollups import compact_days
+
+# Keeps multi-row inserts well under the bind-parameter limit
+INSERT_CHUNK_SIZE = 2000
+
+
+class SyntheticBarSpec(NamedTuple):
+    skus: int = 500
+    shifts: int = 14
+    sales_per_product: float = 4.0   # mean sale rows per product per shift
+    movement_density: float = 0.2    # share of products receiving a delivery per shift
+    leak_rate: float = 0.3           # share of products closing with a discrepancy
+    seed: int = 42
+
+
+class SyntheticBar(NamedTuple):
+    bar_id: uuid.UUID
+    owner_id: uuid.UUID
+    staff_id: uuid.UUID
+    product_ids: list
+    token: str
+
+
+class ShiftWorkload(NamedTuple):
+    """Rows one synthetic shift generates, keyed by product."""
+    opening: dict
+    received: dict
+    sales: list
+    closing: dict
+
+
+async def _insert_chunked(db: AsyncSession, model, rows: list[dict]) -> None:
+    for start in range(0, len(rows), INSERT_CHUNK_SIZE):
+        await db.execute(insert(model), rows[start:start + INSERT_CHUNK_SIZE])
+
+
+def _shift_workload(spec: SyntheticBarSpec, rng: random.Random, products: list[dict], stock: dict) -> ShiftWorkload:
+    opening, received, closing, sales = {}, {}, {}, []
+    for product in products:
+        product_id = product["id"]
+        opening[product_id] = stock[product_id]
+        delivered = rng.choice((6, 12, 24)) if rng.random() < spec.movement_density else 0
+        if delivered:
+            received[product_id] = delivered
+
+        available = opening[product_id] + delivered
+        # Exponentially distributed sale rows: a few best sellers, a long quiet tail
+        sale_rows = int(rng.expovariate(1 / spec.sales_per_product)) if spec.sales_per_product else 0
+        sold = min(sale_rows, int(available))
+        sales.extend(
+            {"product_id": product_id, "quantity_sold": 1, "sale_amount": product["sale_price"]}
+            for _ in range(sold)
+        )
+
+        leak = rng.choice((0.5, 1, 2, 4)) if rng.random() < spec.leak_rate else 0
+        closing[product_id] = max(available - sold - leak, 0)
+    return ShiftWorkload(opening, received, sales, closing)
+
+
+async def seed_bar(db: AsyncSession, spec: SyntheticBarSpec) -> SyntheticBar:
+    """
+    Insert a synthetic bar with spec.skus products and spec.shifts closed
+    daily shifts of history, then reconcile and roll up that history. Not
+    committed.
+    """
+    rng = random.Random(spec.seed)
+    now = datetime.utcnow()
+    bar_id, owner_id, staff_id = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+    await ensure_partitions(db, first=(now - timedelta(days=spec.shifts + 1)).date())
+
+    await db.execute(insert(Bar), [{"id": bar_id, "name": f"bench-{spec.skus}"}])
+    await db.execute(insert(User), [
+        {
+            "id": owner_id, "bar_id": bar_id, "email": f"bench-owner-{bar_id}@example.com",
+            "password_hash": "x", "full_name": "Bench Owner", "role": UserRole.OWNER,
+        },
+        {
+            "id": staff_id, "bar_id": bar_id, "email": f"bench-staff-{bar_id}@example.com",
+            "password_hash": "x", "full_name": "Bench Staff", "role": UserRole.STAFF,
+        },
+    ])
+
+    categories, units = list(ProductCategory), list(ProductUnit)
+    products = []
+    for i in range(spec.skus):
+        cost = round(rng.uniform(1, 60), 2)
+        products.append({
+            "id": uuid.uuid4(), "bar_id": bar_id, "name": f"SKU {i:05d}",
+            "barcode": f"{i:013d}", "sku": f"SKU-{i:05d}",
+            "category": rng.choice(categories), "unit": rng.choice(units),
+            "volume_ml": rng.choice((None, 330, 700, 750)),
+            "cost_price": cost, "sale_price": round(cost * rng.uniform(1.5, 4), 2),
+            "min_stock_threshold": rng.choice((2, 5, 10, 24)),
+            "current_stock": rng.randint(10, 60),
+        })
+    await _insert_chunked(db, Product, products)
+
+    stock = {p["id"]: p["current_stock"] for p in products}
+    shifts, counts, movements, sales = [], [], [], []
+    for day in range(spec.shifts, 0, -1):
+        shift_id = uuid.uuid4()
+        start = now - timedelta(days=day, hours=8)
+        end = start + timedelta(hours=8)
+        shifts.append({
+            "id": shift_id, "bar_id": bar_id, "staff_id": staff_id, "opened_by": staff_id,
+            "closed_by": staff_id, "start_time": start, "end_time": end,
+            "status": ShiftStatus.CLOSED, "created_at": start, "business_date": start.date(),
+        })
+        workload = _shift_workload(spec, rng, products, stock)
+        for product_id, opening in workload.opening.items():
+            counts.append({
+                "id": uuid.uuid4(), "shift_id": shift_id, "product_id": product_id,
+                "opening_count": opening, "closing_count": workload.closing[product_id],
+            })
+        for product_id, quantity in workload.received.items():
+            movements.append({
+                "id": uuid.uuid4(), "bar_id": bar_id, "product_id": product_id, "staff_id": staff_id,
+                "type": MovementType.IN, "reason": MovementReason.DELIVERY, "quantity": quantity,
+                "created_at": start + timedelta(hours=1), "business_date": start.date(),
+            })
+        for i, sale in enumerate(workload.sales):
+            created_at = start + timedelta(seconds=i % 28800)
+            sales.append({
+                "id": uuid.uuid4(), "bar_id": bar_id, "shift_id": shift_id, **sale,
+                "created_at": created_at, "business_date": created_at.date(),
+            })
+        stock = workload.closing
+
+    await _insert_chunked(db, Shift, shifts)
+    await _insert_chunked(db, ShiftStockCount, counts)
+    await _insert_chunked(db, StockMovement, movements)
+    await _insert_chunked(db, SalesRecord, sales)
+    await check_ledger(db, bar_id=bar_id, fix=True)
+    if shifts:
+        await db.execute(
+            update(Product)
+            .where(Product.id == ShiftStockCount.product_id, ShiftStockCount.shift_id == shifts[-1]["id"])
+            .values(current_stock=ShiftStockCount.closing_count)
+            .execution_options(synchronize_session=False)
+        )
+        first_day = shifts[0]["business_date"]
+        await replay_bar(db, bar_id, first_day, now.date())
+        await compact_days(db, bar_id, [first_day + timedelta(days=i) for i in range((now.date() - first_day).days)])
+
+    token = create_access_token(str(owner_id), str(bar_id), UserRole.OWNER.value)
+    return SyntheticBar(bar_id, owner_id, staff_id, [p["id"] for p in products], token)
+
+
+async def seed_open_shift(db: AsyncSession, bar: SyntheticBar, spec: SyntheticBarSpec, rng: random.Random) -> tuple:
+    """
+    Open a shift for the bar's staff with sales and deliveries recorded the
+    way the API records them (ledger included). Returns the shift id and the
+    closing counts to submit. Not committed.
+    """
+    now = datetime.utcnow()
+    products_result = await db.execute(
+        select(Product.id, Product.sale_price, Product.current_stock).where(Product.bar_id == bar.bar_id)
+    )
+    products = [
+        {"id": product_id, "sale_price": float(price), "current_stock": float(current)}
+        for product_id, price, current in products_result.all()
+    ]
+    workload = _shift_workload(spec, rng, products, {p["id"]: p["current_stock"] for p in products})
+    # Synthetic bars keep the default UTC clock with a midnight cutover
+    today = now.date()
+
+    shift_id = uuid.uuid4()
+    await db.execute(insert(Shift), [{
+        "id": shift_id, "bar_id": bar.bar_id, "staff_id": bar.staff_id, "opened_by": bar.staff_id,
+        "start_time": now - timedelta(hours=8), "status": ShiftStatus.OPEN, "business_date": today,
+    }])
+    await _insert_chunked(db, ShiftStockCount, [
+        {"id": uuid.uuid4(), "shift_id": shift_id, "product_id": product_id, "opening_count": opening}
+        for product_id, opening in workload.opening.items()
+    ])
+    await _insert_chunked(db, StockMovement, [
+        {
+            "id": uuid.uuid4(), "bar_id": bar.bar_id, "product_id": product_id, "staff_id": bar.staff_id,
+            "type": MovementType.IN, "reason": MovementReason.DELIVERY, "quantity": quantity,
+            "business_date": today,
+        }
+        for product_id, quantity in workload.received.items()
+    ])
+    sales = [
+        {"id": uuid.uuid4(), "bar_id": bar.bar_id, "shift_id": shift_id, **sale, "business_date": today}
+        for sale in workload.sales
+    ]
+    await _insert_chunked(db, SalesRecord, sales)
+    await record_received(db, bar.bar_id, workload.received.items())
+    await record_sales(db, bar.bar_id, sales)
+    return shift_id, workload.closing
+
+
+async def close_shift_counts(db: AsyncSession, shift_id, closing: dict) -> None:
+    """Mark a seeded shift closed with the given counts, bypassing the API."""
+    counts = ShiftStockCount.__table__
+    await db.execute(
+        update(counts)
+        .where(counts.c.shift_id == bindparam("b_shift_id"), counts.c.product_id == bindparam("b_product_id"))
+        .values(closing_count=bindparam("b_count")),
+        [
+            {"b_shift_id": shift_id, "b_product_id": product_id, "b_count": count}
+            for product_id, count in closing.items()
+        ],
+    )
+    await db.execute(
+        update(Shift).where(Shift.id == shift_id).values(status=ShiftStatus.CLOSED, end_time=datetime.utcnow())
+    )
+
+
+async def purge_bar(db: AsyncSession, bar_id) -> None:
+    """
+    Delete everything belonging to a bar, children first. Tables without a
+    bar_id column are cleared through their foreign key to one that has it.
+    """
+    tables = Base.metadata.sorted_tables
+    for table in reversed(tables):
+        if "bar_id" in table.c:
+            await db.execute(delete(table).where(table.c.bar_id == bar_id))
+        elif table.name == "bars":
+            await db.execute(delete(table).where(table.c.id == bar_id))
+        else:
+            for fk in table.foreign_keys:
+                parent = fk.column.table
+                if "bar_id" in parent.c:
+                    await db.execute(
+                        delete(table).where(
+                            fk.parent.in_(select(fk.column).where(parent.c.bar_id == bar_id))
+                        )
+                    )
+                    break
+
+
+async def analyze(db: AsyncSession) -> None:
+    """Refresh planner statistics after seeding."""
+    for table in Base.metadata.sorted_tables:
+        await db.execute(text(f"ANALYZE {table.name}"))
@@ -0,0 +1,335 @@
+"""
+Benchmark scenarios and JSON reporting.
+
+Every scenario is timed `repeat` times after `warmup` untimed runs. Each
+sample records wall time, the SQL statements issued on the app engine and
+the rows those statements inserted, updated or deleted. HTTP scenarios go
+through the real FastAPI app in-process (httpx ASGITransport, no server
+and no lifespan, so shift-close reconciliation runs inline in the request).
+"""
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+from typing import Awaitable, Callable
+
+import httpx
+import numpy as np
+from sqlalchemy import event, select, text
+
+from app.database import engine, AsyncSessionLocal, Base
+from app.main import app
+from app.models import Product, DailyReconciliation, LossReport
+from app.services.reconciliation_engine import run_reconciliation
+from benchmarks.generator import (
+    SyntheticBar, SyntheticBarSpec, analyze, close_shift_counts, purge_bar,
+    seed_bar, seed_open_shift,
+)
+
+DML_VERBS = ("INSERT", "UPDATE", "DELETE")
+
+
+class StatementMeter:
+    """Counts statements and rows written on the app engine while active."""
+
+    def __init__(self):
+        self.statements = 0
+        self.rows_written = 0
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements += 1
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb in DML_VERBS:
+            rowcount = cursor.rowcount
+            if rowcount is not None and rowcount >= 0:
+                self.rows_written += rowcount
+            elif executemany:
+                self.rows_written += len(parameters)
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "after_cursor_execute", self._after_execute)
+
+
+async def measure(action: Callable[[], Awaitable]) -> dict:
+    with StatementMeter() as meter:
+        started = time.perf_counter()
+        await action()
+        elapsed = time.perf_counter() - started
+    return {"ms": elapsed * 1000, "statements": meter.statements, "rows_written": meter.rows_written}
+
+
+def _percentiles(values: list) -> dict:
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        "min": round(float(values.min()), 3),
+        "p50": round(float(np.percentile(values, 50)), 3),
+        "p90": round(float(np.percentile(values, 90)), 3),
+        "p95": round(float(np.percentile(values, 95)), 3),
+        "p99": round(float(np.percentile(values, 99)), 3),
+        "max": round(float(values.max()), 3),
+        "mean": round(float(values.mean()), 3),
+    }
+
+
+def summarize(samples: list[dict]) -> dict:
+    return {
+        "samples": len(samples),
+        "latency_ms": _percentiles([s["ms"] for s in samples]),
+        "queries": _percentiles([s["statements"] for s in samples]),
+        "rows_written": _percentiles([s["rows_written"] for s in samples]),
+    }
+
+
+async def _snapshot(db, shift_id) -> tuple:
+    """Comparable view of the rows written for a shift, keyed by product name."""
+    recon_result = await db.execute(
+        select(
+            Product.name, DailyReconciliation.opening_stock, DailyReconciliation.received,
+            DailyReconciliation.sold, DailyReconciliation.expected_closing,
+            DailyReconciliation.actual_closing, DailyReconciliation.discrepancy,
+        )
+        .join(Product, Product.id == DailyReconciliation.product_id)
+        .where(DailyReconciliation.shift_id == shift_id)
+    )
+    loss_result = await db.execute(
+        select(Product.name, LossReport.discrepancy_quantity, LossReport.loss_value, LossReport.severity)
+        .join(Product, Product.id == LossReport.product_id)
+        .where(LossReport.shift_id == shift_id)
+    )
+    return sorted(map(tuple, recon_result.all())), sorted(map(tuple, loss_result.all()))
+
+
+class BenchmarkContext:
+    def __init__(self, bar: SyntheticBar, spec: SyntheticBarSpec, client: httpx.AsyncClient):
+        self.bar = bar
+        self.spec = spec
+        self.client = client
+        self.headers = {"Authorization": f"Bearer {bar.token}"}
+        self.rng = random.Random(spec.seed + 1)
+        self.snapshots: dict = {}
+        self.closed_shift_id = None
+
+    async def prepared_closed_shift(self):
+        """One closed, unreconciled shift shared by both reconcile scenarios."""
+        if self.closed_shift_id is None:
+            async with AsyncSessionLocal() as db:
+                shift_id, closing = await seed_open_shift(db, self.bar, self.spec, self.rng)
+                await close_shift_counts(db, shift_id, closing)
+                await db.commit()
+            self.closed_shift_id = shift_id
+        return self.closed_shift_id
+
+
+async def _reconcile(ctx: BenchmarkContext, repeat: int, warmup: int, set_based: bool) -> list[dict]:
+    """run_reconciliation on one prepared closed shift, each run in a rolled-back savepoint."""
+    shift_id = await ctx.prepared_closed_shift()
+    async with AsyncSessionLocal() as db:
+        samples = []
+        for i in range(warmup + repeat):
+            savepoint = await db.begin_nested()
+
+            async def action():
+                await run_reconciliation(db, ctx.bar.bar_id, shift_id, set_based=set_based)
+                await db.flush()
+
+            sample = await measure(action)
+            if i == 0:
+                ctx.snapshots["set_based" if set_based else "per_product"] = await _snapshot(db, shift_id)
+            await savepoint.rollback()
+            if i >= warmup:
+                samples.append(sample)
+    return samples
+
+
+async def scenario_reconcile(ctx, repeat, warmup):
+    """run_reconciliation, set-based engine."""
+    return await _reconcile(ctx, repeat, warmup, set_based=True)
+
+
+async def scenario_reconcile_per_product(ctx, repeat, warmup):
+    """run_reconciliation, original per-product loop."""
+    return await _reconcile(ctx, repeat, warmup, set_based=False)
+
+
+async def scenario_close_shift(ctx, repeat, warmup):
+    """POST /shifts/{id}/close end to end, reconciliation included, on a fresh open shift each run."""
+    samples = []
+    for i in range(warmup + repeat):
+        async with AsyncSessionLocal() as db:
+            shift_id, closing = await seed_open_shift(db, ctx.bar, ctx.spec, ctx.rng)
+            await db.commit()
+        payload = {"stock_counts": [{"product_id": str(p), "count": c} for p, c in closing.items()]}
+
+        async def action():
+            response = await ctx.client.post(f"/api/v1/shifts/{shift_id}/close", json=payload, headers=ctx.headers)
+            response.raise_for_status()
+
+        sample = await measure(action)
+        if i >= warmup:
+            samples.append(sample)
+    return samples
+
+
+# Rows per POST /sales/bulk in the bulk_sales scenario
+BULK_SALES_ROWS = 10000
+
+
+async def scenario_bulk_sales(ctx, repeat, warmup):
+    """POST /sales/bulk with BULK_SALES_ROWS rows spread over the catalog, into one open shift."""
+    async with AsyncSessionLocal() as db:
+        shift_id, _ = await seed_open_shift(db, ctx.bar, ctx.spec, ctx.rng)
+        await db.commit()
+        product_ids = (await db.execute(select(Product.id).where(Product.bar_id == ctx.bar.bar_id))).scalars().all()
+
+    samples = []
+    for i in range(warmup + repeat):
+        payload = {"records": [
+            {
+                "product_id": str(ctx.rng.choice(product_ids)),
+                "shift_id": str(shift_id),
+                "quantity_sold": ctx.rng.randint(1, 3),
+                "sale_amount": round(ctx.rng.uniform(3, 30), 2),
+            }
+            for _ in range(BULK_SALES_ROWS)
+        ]}
+
+        async def action():
+            response = await ctx.client.post("/api/v1/sales/bulk", json=payload, headers=ctx.headers)
+            response.raise_for_status()
+
+        sample = await measure(action)
+        if i >= warmup:
+            samples.append(sample)
+    return samples
+
+
+def _get_scenario(path: str):
+    async def scenario(ctx, repeat, warmup):
+        samples = []
+        for i in range(warmup + repeat):
+            async def action():
+                response = await ctx.client.get(path, headers=ctx.headers)
+                response.raise_for_status()
+
+            sample = await measure(action)
+            if i >= warmup:
+                samples.append(sample)
+        return samples
+    scenario.__doc__ = f"GET {path}"
+    return scenario
+
+
+SCENARIOS = {
+    "reconcile": scenario_reconcile,
+    "reconcile_per_product": scenario_reconcile_per_product,
+    "close_shift": scenario_close_shift,
+    "bulk_sales": scenario_bulk_sales,
+    "dashboard_manager": _get_scenario("/api/v1/dashboard/manager"),
+    "dashboard_owner": _get_scenario("/api/v1/dashboard/owner"),
+    "loss_summary": _get_scenario("/api/v1/loss-reports/summary"),
+    "daily_shifts": _get_scenario("/api/v1/shifts/daily"),
+}
+
+# The per-product loop is slow at large SKU counts; run it on request
+DEFAULT_SCENARIOS = [name for name in SCENARIOS if name != "reconcile_per_product"]
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmarks(
+    spec: SyntheticBarSpec,
+    scenarios: list[str],
+    repeat: int = 10,
+    warmup: int = 1,
+    keep: bool = False,
+) -> dict:
+    """Seed a synthetic bar, run the scenarios against it and return the JSON-ready report."""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    started_at = datetime.utcnow()
+    seed_started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        bar = await seed_bar(db, spec)
+        await db.commit()
+        await analyze(db)
+        await db.commit()
+    seed_seconds = time.perf_counter() - seed_started
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            ctx = BenchmarkContext(bar, spec, client)
+            for name in scenarios:
+                results[name] = summarize(await SCENARIOS[name](ctx, repeat, warmup))
+                results[name]["description"] = (SCENARIOS[name].__doc__ or "").strip().split("\n")[0]
+
+            if "set_based" in ctx.snapshots and "per_product" in ctx.snapshots:
+                results["reconcile_per_product"]["matches_set_based"] = (
+                    ctx.snapshots["set_based"] == ctx.snapshots["per_product"]
+                )
+    finally:
+        if not keep:
+            async with AsyncSessionLocal() as db:
+                await purge_bar(db, bar.bar_id)
+                await db.commit()
+
+    async with engine.connect() as conn:
+        server_version = (await conn.execute(text("SHOW server_version"))).scalar()
+
+    return {
+        "meta": {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "postgres": server_version,
+            "spec": spec._asdict(),
+            "repeat": repeat,
+            "warmup": warmup,
+            "seed_seconds": round(seed_seconds, 2),
+            "bar_id": str(bar.bar_id) if keep else None,
+        },
+        "scenarios": results,
+    }
+
+
+def compare_reports(before: dict, after: dict) -> str:
+    """Side-by-side p50/p95 latency and median query counts of two reports."""
+    lines = [f"{'scenario':<24} {'p50 ms':>18} {'p95 ms':>18} {'queries':>14} {'change':>8}"]
+    for name, new in after["scenarios"].items():
+        old = before["scenarios"].get(name)
+        if old is None:
+            continue
+        old_p50, new_p50 = old["latency_ms"]["p50"], new["latency_ms"]["p50"]
+        change = f"{(new_p50 - old_p50) / old_p50 * 100:+.0f}%" if old_p50 else ""
+        lines.append(
+            f"{name:<24} "
+            f"{old_p50:>8.1f} → {new_p50:<7.1f} "
+            f"{old['latency_ms']['p95']:>8.1f} → {new['latency_ms']['p95']:<7.1f} "
+            f"{old['queries']['p50']:>5.0f} → {new['queries']['p50']:<5.0f} "
+            f"{change:>8}"
+        )
+    return "\n".join(lines)
+
+
+def dump_report(report: dict, path: str | None) -> None:
+    body = json.dumps(report, indent=2, default=str)
+    if path:
+        with open(path, "w") as f:
+            f.write(body + "\n")
+    else:
+        print(body)
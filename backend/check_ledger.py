@@ -0,0 +1,43 @@
+"""
+check_ledger.py
+Rebuilds shift_product_ledger from raw sales_records and stock_movements
+and reports drift against the stored ledger. Run with --fix to replace the
+stored rows (migrate_add_shift_ledger.py does this once on deploy).
+
+    python check_ledger.py [--bar BAR_UUID] [--fix]
+"""
+import argparse
+import asyncio
+import sys
+import uuid
+
+from app.database import engine, AsyncSessionLocal
+from app.services.ledger import check_ledger
+
+
+async def main(bar_id: uuid.UUID | None, fix: bool) -> int:
+    async with AsyncSessionLocal() as db:
+        drift = await check_ledger(db, bar_id=bar_id, fix=fix)
+        await db.commit()
+    await engine.dispose()
+
+    print(f"Expected rows: {drift['expected_rows']}  Stored rows: {drift['stored_rows']}")
+    print(f"Missing: {drift['missing']}  Extra: {drift['extra']}  Mismatched: {drift['mismatched']}")
+
+    has_drift = drift["missing"] or drift["extra"] or drift["mismatched"]
+    if not has_drift:
+        print("✅ Ledger is consistent with raw rows.")
+        return 0
+    if drift["fixed"]:
+        print("✅ Ledger rebuilt from raw rows.")
+        return 0
+    print("❌ Ledger drift detected. Re-run with --fix to rebuild.")
+    return 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bar", type=uuid.UUID, default=None, help="Limit to one bar")
+    parser.add_argument("--fix", action="store_true", help="Rebuild the stored ledger")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.bar, args.fix)))
@@ -0,0 +1,59 @@
+"""
+compact_rollups.py
+Nightly compaction of daily_product_rollups: recomputes each day in range
+from the raw sales and loss reports and marks it compacted. Compacting the
+default day (each bar's previous business date) also snapshots every
+product's current stock as that day's closing stock. Bars cut over at
+different hours, so run it hourly; recompacting a day is idempotent, e.g.
+
+    5 * * * *  cd /app/backend && python compact_rollups.py
+
+A range backfills the rollups of a database with history (closing stock is
+only snapshotted for a bar's previous business date):
+
+    python compact_rollups.py [--from 2024-01-01 --to 2026-03-31] [--bar BAR_UUID ...]
+"""
+import argparse
+import asyncio
+import uuid
+from datetime import date, timedelta
+
+from sqlalchemy import select
+
+from app.database import engine, AsyncSessionLocal, Base
+from app.models import Bar
+from app.services.business_date import business_today
+from app.services.rollups import compact_days
+
+
+async def main(bar_ids: list[uuid.UUID], date_from: date | None, date_to: date | None):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        if not bar_ids:
+            bar_ids = (await db.execute(select(Bar.id))).scalars().all()
+
+        for bar_id in bar_ids:
+            yesterday = await business_today(db, bar_id) - timedelta(days=1)
+            first, last = date_from or yesterday, date_to or yesterday
+            days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+            await compact_days(db, bar_id, days, snapshot_stock=last == yesterday)
+            await db.commit()
+            print(f"  {bar_id}: {len(days)} day(s) compacted")
+
+    await engine.dispose()
+    print("✅ Rollups compacted.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--bar", dest="bar_ids", type=uuid.UUID, action="append", default=[])
+    args = parser.parse_args()
+    if (args.date_from is None) != (args.date_to is None):
+        parser.error("--from and --to go together")
+    if args.date_from and args.date_from > args.date_to:
+        parser.error("--from must not be after --to")
+    asyncio.run(main(args.bar_ids, args.date_from, args.date_to))
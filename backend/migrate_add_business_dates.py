@@ -0,0 +1,91 @@
+"""
+migrate_add_business_dates.py
+Adds the bar time zone and business-day cutover, and a business_date column
+(with a (bar_id, business_date) index) to sales_records, stock_movements,
+loss_reports and shifts, backfilled from each row's timestamp in its bar's
+time zone. Loss reports take the business date of their shift.
+Safe to run multiple times (uses IF NOT EXISTS, only backfills NULLs).
+
+Set the bars' time zones before running it, or re-run the backfill by
+hand after changing them, then rebuild the day-keyed aggregates:
+
+    python compact_rollups.py --from 2024-01-01 --to 2026-03-31
+    python backfill_staff_scorecards.py
+"""
+import asyncio
+from sqlalchemy import text
+from app.database import engine
+
+# Local business date of a naive UTC timestamp column for the joined bar `b`
+BUSINESS_DATE = (
+    "(({column} AT TIME ZONE 'UTC') AT TIME ZONE b.timezone"
+    " - make_interval(hours => b.day_cutover_hour))::date"
+)
+
+TABLES = (
+    ("shifts", "start_time"),
+    ("sales_records", "created_at"),
+    ("stock_movements", "created_at"),
+    ("loss_reports", "created_at"),
+)
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        print("Adding timezone and day_cutover_hour columns to bars...")
+        await conn.execute(text("""
+            ALTER TABLE bars
+            ADD COLUMN IF NOT EXISTS timezone VARCHAR(64) NOT NULL DEFAULT 'UTC';
+        """))
+        await conn.execute(text("""
+            ALTER TABLE bars
+            ADD COLUMN IF NOT EXISTS day_cutover_hour SMALLINT NOT NULL DEFAULT 0;
+        """))
+
+        for table, _ in TABLES:
+            print(f"Adding business_date column to {table}...")
+            await conn.execute(text(f"""
+                ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS business_date DATE;
+            """))
+
+        print("Backfilling shifts.business_date from start_time...")
+        await conn.execute(text(f"""
+            UPDATE shifts s SET business_date = {BUSINESS_DATE.format(column="s.start_time")}
+            FROM bars b
+            WHERE b.id = s.bar_id AND s.business_date IS NULL;
+        """))
+
+        print("Backfilling loss_reports.business_date from their shifts...")
+        await conn.execute(text("""
+            UPDATE loss_reports l SET business_date = s.business_date
+            FROM shifts s
+            WHERE s.id = l.shift_id AND l.business_date IS NULL;
+        """))
+
+        for table, column in TABLES[1:]:
+            print(f"Backfilling {table}.business_date from {column}...")
+            await conn.execute(text(f"""
+                UPDATE {table} t SET business_date = {BUSINESS_DATE.format(column=f"t.{column}")}
+                FROM bars b
+                WHERE b.id = t.bar_id AND t.business_date IS NULL;
+            """))
+
+        for table, _ in TABLES:
+            print(f"Indexing {table} by (bar_id, business_date)...")
+            await conn.execute(text(f"""
+                ALTER TABLE {table}
+                ALTER COLUMN business_date SET NOT NULL;
+            """))
+            await conn.execute(text(f"""
+                CREATE INDEX IF NOT EXISTS ix_{table}_bar_business_date
+                ON {table} (bar_id, business_date);
+            """))
+
+        print("✅ Migration complete — business dates added and backfilled.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,41 @@
+"""
+migrate_add_idempotency_keys.py
+Adds an idempotency_key column to sales_records and stock_movements, unique
+per bar, so client retries of POST /sales, /sales/bulk, /sales/stream and
+/stock-movements resolve to the row stored first. The unique indexes are
+built CONCURRENTLY.
+Safe to run multiple times (uses IF NOT EXISTS).
+"""
+import asyncio
+from sqlalchemy import text
+from app.database import engine
+
+KEYED_TABLES = ("sales_records", "stock_movements")
+
+
+async def migrate():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        for table in KEYED_TABLES:
+            print(f"Adding idempotency_key column to {table}...")
+            await conn.execute(text(f"""
+                ALTER TABLE {table}
+                ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(128);
+            """))
+
+        for table in KEYED_TABLES:
+            print(f"Creating index uq_{table}_bar_idempotency_key...")
+            await conn.execute(text(f"""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_{table}_bar_idempotency_key
+                ON {table} (bar_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
+            """))
+
+        print("✅ Migration complete — idempotency keys added.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,53 @@
+"""
+migrate_add_index_pack.py
+Adds the composite and partial indexes behind the bar-scoped listings,
+reconciliation sums and the open-shift check. Indexes are built
+CONCURRENTLY, so writes keep flowing while it runs on a live database.
+Safe to run multiple times (uses IF NOT EXISTS).
+
+Verify the access paths afterwards with:
+
+    python -m unittest tests.test_query_plans
+"""
+import asyncio
+from sqlalchemy import text
+from app.database import engine
+
+INDEXES = (
+    ("ix_sales_records_bar_created_at", "sales_records (bar_id, created_at)"),
+    ("ix_sales_records_product_created_at", "sales_records (product_id, created_at)"),
+    ("ix_sales_records_shift_product", "sales_records (shift_id, product_id)"),
+    ("ix_stock_movements_bar_created_at", "stock_movements (bar_id, created_at)"),
+    ("ix_stock_movements_product_created_at", "stock_movements (product_id, created_at)"),
+    ("ix_loss_reports_bar_created_at", "loss_reports (bar_id, created_at)"),
+    ("ix_loss_reports_shift_product", "loss_reports (shift_id, product_id)"),
+    ("ix_loss_reports_unresolved", "loss_reports (bar_id, created_at) WHERE reason_code IS NULL"),
+    ("ix_shifts_bar_created_at", "shifts (bar_id, created_at)"),
+    ("ix_shifts_open_staff", "shifts (bar_id, staff_id) WHERE status = 'OPEN'"),
+    ("ix_shift_stock_counts_shift_product", "shift_stock_counts (shift_id, product_id)"),
+    ("ix_daily_reconciliations_bar_date", "daily_reconciliations (bar_id, date)"),
+    ("ix_products_bar_name", "products (bar_id, name)"),
+    ("ix_purchase_orders_bar_created_at", "purchase_orders (bar_id, created_at)"),
+    ("ix_purchase_order_items_order", "purchase_order_items (purchase_order_id)"),
+)
+
+
+async def migrate():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for name, definition in INDEXES:
+            print(f"Creating index {name}...")
+            await conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition};"))
+
+        print("Refreshing planner statistics...")
+        for table in sorted({definition.split()[0] for _, definition in INDEXES}):
+            await conn.execute(text(f"ANALYZE {table};"))
+
+        print("✅ Migration complete — index pack created.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,40 @@
+"""
+migrate_add_product_codes.py
+Adds barcode and sku columns to products, each unique per bar, for
+scanner-driven stock counts (POST /products/scan and barcode-keyed shift
+counts). The unique indexes are built CONCURRENTLY.
+Safe to run multiple times (uses IF NOT EXISTS).
+"""
+import asyncio
+from sqlalchemy import text
+from app.database import engine
+
+CODE_COLUMNS = ("barcode", "sku")
+
+
+async def migrate():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        for column in CODE_COLUMNS:
+            print(f"Adding {column} column to products...")
+            await conn.execute(text(f"""
+                ALTER TABLE products
+                ADD COLUMN IF NOT EXISTS {column} VARCHAR(64);
+            """))
+
+        for column in CODE_COLUMNS:
+            print(f"Creating index uq_products_bar_{column}...")
+            await conn.execute(text(f"""
+                CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_products_bar_{column}
+                ON products (bar_id, {column}) WHERE {column} IS NOT NULL;
+            """))
+
+        print("✅ Migration complete — product barcode and sku added.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
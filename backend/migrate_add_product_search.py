@@ -0,0 +1,49 @@
+"""
+migrate_add_product_search.py
+Enables pg_trgm and adds a trigram GIN index over products.name for the
+typo-tolerant /products/search, plus a (bar_id, lower(name)) index for the
+case-insensitive name lookups of the sales CSV import. Indexes are built
+CONCURRENTLY. Safe to run multiple times (uses IF NOT EXISTS).
+
+Where the extension cannot be installed (managed databases without it, no
+superuser), the trigram index is skipped and search falls back to the
+in-process index (PRODUCT_SEARCH_BACKEND=auto).
+"""
+import asyncio
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from app.database import engine
+
+
+async def migrate():
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+        print("Creating index ix_products_bar_lower_name...")
+        await conn.execute(text("""
+            CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_bar_lower_name
+            ON products (bar_id, lower(name));
+        """))
+
+        print("Enabling pg_trgm...")
+        try:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
+        except DBAPIError as e:
+            print(f"⚠️  pg_trgm unavailable, search will use the in-process index: {e.orig}")
+        else:
+            print("Creating index ix_products_name_trgm...")
+            await conn.execute(text("""
+                CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_products_name_trgm
+                ON products USING gin (name gin_trgm_ops);
+            """))
+
+        await conn.execute(text("ANALYZE products;"))
+
+        print("✅ Migration complete — product search indexes created.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,72 @@
+"""
+migrate_add_reconciliation_unique.py
+Adds a unique constraint on daily_reconciliations (shift_id, product_id) so
+re-reconciliation can upsert. Duplicate rows left by earlier double runs
+are removed first, keeping the newest row per shift and product; loss
+reports of removed rows are re-pointed to the kept row.
+Safe to run multiple times.
+"""
+import asyncio
+from sqlalchemy import text
+from app.database import engine
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        print("Re-pointing loss reports of duplicate reconciliation rows...")
+        await conn.execute(text("""
+            WITH ranked AS (
+                SELECT id,
+                       first_value(id) OVER (
+                           PARTITION BY shift_id, product_id ORDER BY created_at DESC, id
+                       ) AS keep_id
+                FROM daily_reconciliations
+            )
+            UPDATE loss_reports lr
+            SET reconciliation_id = ranked.keep_id
+            FROM ranked
+            WHERE lr.reconciliation_id = ranked.id AND ranked.id <> ranked.keep_id;
+        """))
+
+        print("Removing duplicate loss reports (keeping reviewed, then newest)...")
+        await conn.execute(text("""
+            DELETE FROM loss_reports
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (
+                        PARTITION BY reconciliation_id
+                        ORDER BY (reviewed_by IS NULL), created_at DESC, id
+                    ) AS rn
+                    FROM loss_reports
+                ) ranked
+                WHERE rn > 1
+            );
+        """))
+
+        print("Removing duplicate reconciliation rows...")
+        await conn.execute(text("""
+            DELETE FROM daily_reconciliations
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, row_number() OVER (
+                        PARTITION BY shift_id, product_id ORDER BY created_at DESC, id
+                    ) AS rn
+                    FROM daily_reconciliations
+                ) ranked
+                WHERE rn > 1
+            );
+        """))
+
+        print("Adding unique constraint on (shift_id, product_id)...")
+        await conn.execute(text("""
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_daily_reconciliations_shift_product
+            ON daily_reconciliations (shift_id, product_id);
+        """))
+
+        print("✅ Migration complete — daily_reconciliations is unique per shift and product.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
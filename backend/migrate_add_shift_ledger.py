@@ -0,0 +1,35 @@
+"""
+migrate_add_shift_ledger.py
+Creates shift_product_ledger if it does not exist and rebuilds it from raw
+sales_records and stock_movements. Reconciliation reads sold and received
+totals from the ledger only, so shifts that were open when the ledger was
+deployed would otherwise close with their earlier sales and deliveries
+missing. Ledger writes are blocked while it is rebuilt.
+Safe to run multiple times (the rebuild replaces the stored rows).
+"""
+import asyncio
+from sqlalchemy import text
+from app.database import engine, AsyncSessionLocal
+from app.models import ShiftProductLedger
+from app.services.ledger import check_ledger
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        print("Creating shift_product_ledger table...")
+        await conn.run_sync(lambda sync_conn: ShiftProductLedger.__table__.create(sync_conn, checkfirst=True))
+
+    async with AsyncSessionLocal() as db:
+        print("Rebuilding the ledger from raw sales and stock movements...")
+        await db.execute(text("LOCK TABLE shift_product_ledger IN EXCLUSIVE MODE"))
+        drift = await check_ledger(db, fix=True)
+        await db.commit()
+        print(f"  {drift['expected_rows']} rows ({drift['missing']} missing, {drift['mismatched']} mismatched before).")
+
+    print("✅ Migration complete — shift_product_ledger backfilled from raw rows.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,94 @@
+"""
+migrate_partition_history.py
+Converts sales_records, stock_movements and loss_reports to tables
+range-partitioned by month on created_at (see services.partitions), and
+moves idempotency key uniqueness to the idempotency_keys table, since
+partitions can only enforce uniqueness that includes created_at.
+
+Each table is rebuilt in its own transaction: the old table is renamed,
+the partitioned one is created from the model with partitions from its
+oldest month through PARTITION_MONTHS_AHEAD months ahead, rows are copied
+over and the old table is dropped once the row counts match. The table
+is locked while it is copied, so run it in a quiet period.
+Safe to run multiple times (skips tables that are already partitioned).
+
+Verify the access paths afterwards with:
+
+    python -m unittest tests.test_query_plans
+"""
+import asyncio
+from sqlalchemy import text
+from app.database import engine
+from app.models import IdempotencyKey, LossReport, SalesRecord, StockMovement
+from app.services.partitions import ensure_partitions
+
+MODELS = (SalesRecord, StockMovement, LossReport)
+KEYED_TABLES = ("sales_records", "stock_movements")
+
+
+async def partition(conn, model) -> None:
+    table = model.__tablename__
+    old = f"{table}_unpartitioned"
+    partitioned = (await conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_class WHERE relname = :name AND relkind = 'p')"), {"name": table},
+    )).scalar()
+    if partitioned:
+        print(f"{table} is already partitioned, skipping.")
+        return
+
+    print(f"Partitioning {table}...")
+    await conn.execute(text(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE"))
+    await conn.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+    # Free the index (and primary key) names for the new table
+    indexes = (await conn.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :name"), {"name": old},
+    )).scalars().all()
+    for index in indexes:
+        await conn.execute(text(f"ALTER INDEX {index} RENAME TO {(index + '_unpartitioned')[:63]}"))
+    await conn.execute(text(f"UPDATE {old} SET created_at = business_date WHERE created_at IS NULL"))
+
+    await conn.run_sync(lambda sync_conn: model.__table__.create(sync_conn, checkfirst=True))
+    oldest = (await conn.execute(text(f"SELECT min(created_at) FROM {old}"))).scalar()
+    await ensure_partitions(conn, first=oldest.date() if oldest else None)
+
+    columns = ", ".join(column.name for column in model.__table__.columns)
+    await conn.execute(text(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {old}"))
+    copied = (await conn.execute(text(f"SELECT count(*) FROM {table}"))).scalar()
+    expected = (await conn.execute(text(f"SELECT count(*) FROM {old}"))).scalar()
+    if copied != expected:
+        raise RuntimeError(f"{table}: copied {copied} of {expected} rows, rolled back")
+    await conn.execute(text(f"DROP TABLE {old}"))
+    print(f"  {copied} rows copied.")
+
+
+async def migrate():
+    async with engine.begin() as conn:
+        print("Creating idempotency_keys table...")
+        await conn.run_sync(lambda sync_conn: IdempotencyKey.__table__.create(sync_conn, checkfirst=True))
+
+    for model in MODELS:
+        async with engine.begin() as conn:
+            await partition(conn, model)
+
+    async with engine.begin() as conn:
+        for table in KEYED_TABLES:
+            print(f"Claiming stored idempotency keys of {table}...")
+            await conn.execute(text(f"""
+                INSERT INTO idempotency_keys (bar_id, table_name, key, record_id, record_created_at)
+                SELECT bar_id, '{table}', idempotency_key, id, created_at
+                FROM {table} WHERE idempotency_key IS NOT NULL
+                ON CONFLICT DO NOTHING;
+            """))
+
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for model in MODELS:
+            await conn.execute(text(f"ANALYZE {model.__tablename__}"))
+
+    print("✅ Migration complete — history tables partitioned by month.")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
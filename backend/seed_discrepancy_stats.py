@@ -0,0 +1,55 @@
+"""
+seed_discrepancy_stats.py
+One-off bootstrap of product_discrepancy_stats from existing
+daily_reconciliations, so learned thresholds do not start from an empty
+warm-up on a database with history. After this, stats are only updated
+incrementally at each shift close.
+
+Replaces the stored stats of the bars in scope.
+
+    python seed_discrepancy_stats.py [--bar BAR_UUID]
+"""
+import argparse
+import asyncio
+import uuid
+
+from sqlalchemy import text
+
+from app.database import engine
+
+
+async def main(bar_id: uuid.UUID | None):
+    bar_filter = "WHERE bar_id = :bar_id" if bar_id else ""
+    params = {"bar_id": bar_id} if bar_id else {}
+
+    async with engine.begin() as conn:
+        print("Clearing existing stats...")
+        await conn.execute(text(f"DELETE FROM product_discrepancy_stats {bar_filter}"), params)
+
+        print("Aggregating discrepancies per product and weekday...")
+        # isodow - 1 gives Python's weekday() numbering (0 = Monday);
+        # m2 = var_pop * n is Welford's sum of squared deviations
+        result = await conn.execute(text(f"""
+            INSERT INTO product_discrepancy_stats (product_id, weekday, bar_id, n, mean, m2, updated_at)
+            SELECT product_id,
+                   (EXTRACT(ISODOW FROM date) - 1)::smallint,
+                   bar_id,
+                   COUNT(*),
+                   AVG(discrepancy)::double precision,
+                   (VAR_POP(discrepancy) * COUNT(*))::double precision,
+                   NOW() AT TIME ZONE 'utc'
+            FROM daily_reconciliations
+            {bar_filter}
+            GROUP BY product_id, EXTRACT(ISODOW FROM date), bar_id
+        """), params)
+        print(f"  {result.rowcount} product/weekday rows written")
+
+    await engine.dispose()
+    print("✅ Discrepancy stats seeded.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--bar", type=uuid.UUID, default=None, help="Limit to one bar")
+    args = parser.parse_args()
+    asyncio.run(main(args.bar))
@@ -0,0 +1,43 @@
+"""
+Shared test setup: a session on the configured database, inside a
+transaction that is rolled back after each test, with a small synthetic
+bar seeded into it. The session's own commits and rollbacks act on
+savepoints, so commit hooks fire while nothing outlives the test. Tests
+are skipped when the database is unreachable.
+
+    python -m unittest discover -s tests -t .
+"""
+import unittest
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import get_settings
+from benchmarks.generator import SyntheticBarSpec, seed_bar
+
+settings = get_settings()
+
+
+class DatabaseTestCase(unittest.IsolatedAsyncioTestCase):
+    spec = SyntheticBarSpec(skus=20, shifts=3)
+
+    async def asyncSetUp(self):
+        self.engine = create_async_engine(settings.DATABASE_URL, poolclass=NullPool)
+        try:
+            self.conn = await self.engine.connect()
+        except (OSError, ConnectionError) as e:
+            await self.engine.dispose()
+            self.skipTest(f"database unavailable: {e}")
+        self.transaction = await self.conn.begin()
+        self.db = AsyncSession(
+            bind=self.conn, expire_on_commit=False, join_transaction_mode="create_savepoint",
+        )
+        self.bar = await seed_bar(self.db, self.spec)
+        # A rollback in the test returns to the seeded bar
+        await self.db.commit()
+
+    async def asyncTearDown(self):
+        await self.db.close()
+        await self.transaction.rollback()
+        await self.conn.close()
+        await self.engine.dispose()
@@ -0,0 +1,94 @@
+import asyncio
+import unittest
+import uuid
+from unittest import mock
+
+from sqlalchemy.orm import Session
+
+from app.services.cache import DashboardCache, MemoryBackend, mark_bar_dirty
+
+
+class DashboardCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cache = DashboardCache(MemoryBackend(max_entries=100), ttl=60)
+        patcher = mock.patch("app.services.cache.dashboard_cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.bar_id = uuid.uuid4()
+        # No bind: commit and rollback only run the session hooks
+        self.session = Session()
+        self.addCleanup(self.session.close)
+
+    async def _version(self):
+        return await self.cache.backend.get(self.cache._version_key(self.bar_id)) or 0
+
+    async def test_version_bumped_only_on_commit(self):
+        mark_bar_dirty(self.session, self.bar_id)
+        self.assertEqual(await self._version(), 0)
+
+        self.session.commit()
+        self.assertEqual(await self._version(), 1)
+
+        # The marks went with the commit
+        self.session.commit()
+        self.assertEqual(await self._version(), 1)
+
+    async def test_rollback_discards_pending_marks(self):
+        # Marks follow a write, so a transaction is open
+        self.session.begin()
+        mark_bar_dirty(self.session, self.bar_id)
+        self.session.rollback()
+        self.session.commit()
+
+        self.assertEqual(await self._version(), 0)
+        self.assertEqual(self.cache.invalidations, 0)
+
+    async def test_commit_retires_cached_entries(self):
+        values = iter(["before", "after"])
+
+        async def compute():
+            return next(values)
+
+        self.assertEqual(await self.cache.get_or_compute("owner", self.bar_id, compute), "before")
+        self.assertEqual(await self.cache.get_or_compute("owner", self.bar_id, compute), "before")
+
+        mark_bar_dirty(self.session, self.bar_id)
+        self.session.commit()
+
+        self.assertEqual(await self.cache.get_or_compute("owner", self.bar_id, compute), "after")
+        self.assertEqual(self.cache.metrics["owner"], {"hits": 1, "misses": 2, "coalesced": 0, "errors": 0})
+
+    async def test_concurrent_misses_share_one_computation(self):
+        calls = 0
+        release = asyncio.Event()
+
+        async def compute():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"calls": calls}
+
+        waiters = [asyncio.create_task(self.cache.get_or_compute("owner", self.bar_id, compute)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+
+        self.assertEqual(await asyncio.gather(*waiters), [{"calls": 1}] * 3)
+        self.assertEqual(calls, 1)
+        self.assertEqual(self.cache.metrics["owner"]["misses"], 1)
+        self.assertEqual(self.cache.metrics["owner"]["coalesced"], 2)
+
+    async def test_failed_computation_reaches_every_waiter(self):
+        release = asyncio.Event()
+
+        async def compute():
+            await release.wait()
+            raise RuntimeError("dashboard query failed")
+
+        waiters = [asyncio.create_task(self.cache.get_or_compute("owner", self.bar_id, compute)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        # Nothing was cached, so the next call computes again
+        self.assertEqual(await self.cache.get_or_compute("owner", self.bar_id, release.wait), True)
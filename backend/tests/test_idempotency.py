@@ -0,0 +1,143 @@
+from fastapi import Response
+from sqlalchemy import func, select
+
+from app.models import IdempotencyKey, MovementType, Product, SalesRecord, Shift, User
+from app.routers.stock_movements import MOVEMENTS_TABLE, create_stock_movement
+from app.schemas.stock_movement import StockMovementCreate
+from app.services.idempotency import recent_keys
+from app.services.sales_writer import SALES_TABLE, write_sales
+from tests.support import DatabaseTestCase
+
+
+class IdempotentSalesTest(DatabaseTestCase):
+    async def asyncSetUp(self):
+        recent_keys.clear()
+        await super().asyncSetUp()
+        self.shift_id = (await self.db.execute(
+            select(Shift.id).where(Shift.bar_id == self.bar.bar_id).limit(1)
+        )).scalar_one()
+
+    async def asyncTearDown(self):
+        await super().asyncTearDown()
+        recent_keys.clear()
+
+    def _sale(self, key, quantity=1):
+        return {
+            "product_id": self.bar.product_ids[0],
+            "shift_id": self.shift_id,
+            "quantity_sold": quantity,
+            "sale_amount": 10 * quantity,
+            "idempotency_key": key,
+        }
+
+    async def _stored_count(self, key):
+        return (await self.db.execute(
+            select(func.count()).select_from(SalesRecord).where(
+                SalesRecord.bar_id == self.bar.bar_id, SalesRecord.idempotency_key == key,
+            )
+        )).scalar_one()
+
+    async def test_key_stored_earlier_replays_first_row(self):
+        [first] = await write_sales(self.db, self.bar.bar_id, [self._sale("sale-1")])
+        await self.db.commit()
+        recent_keys.clear()
+
+        [again] = await write_sales(self.db, self.bar.bar_id, [self._sale("sale-1", quantity=4)])
+
+        self.assertFalse(first["replayed"])
+        self.assertTrue(again["replayed"])
+        self.assertEqual(again["id"], first["id"])
+        self.assertEqual(float(again["quantity_sold"]), 1)
+        self.assertEqual(await self._stored_count("sale-1"), 1)
+
+    async def test_key_repeated_in_one_call_is_written_once(self):
+        rows = await write_sales(self.db, self.bar.bar_id, [
+            self._sale("sale-1"), self._sale(None), self._sale("sale-1", quantity=4),
+        ])
+
+        self.assertEqual([row["replayed"] for row in rows], [False, False, True])
+        self.assertEqual(rows[2]["id"], rows[0]["id"])
+        self.assertEqual(float(rows[2]["quantity_sold"]), 1)
+        self.assertEqual(await self._stored_count("sale-1"), 1)
+
+    async def test_rolled_back_claim_is_released(self):
+        await write_sales(self.db, self.bar.bar_id, [self._sale("sale-1")])
+        await self.db.rollback()
+
+        self.assertIsNone(recent_keys.get(SALES_TABLE, self.bar.bar_id, "sale-1"))
+        claims = (await self.db.execute(
+            select(func.count()).select_from(IdempotencyKey).where(
+                IdempotencyKey.bar_id == self.bar.bar_id, IdempotencyKey.key == "sale-1",
+            )
+        )).scalar_one()
+        self.assertEqual(claims, 0)
+
+        [row] = await write_sales(self.db, self.bar.bar_id, [self._sale("sale-1")])
+        self.assertFalse(row["replayed"])
+        self.assertEqual(await self._stored_count("sale-1"), 1)
+
+    async def test_recent_keys_only_hold_committed_rows(self):
+        [first] = await write_sales(self.db, self.bar.bar_id, [self._sale("sale-1")])
+        self.assertIsNone(recent_keys.get(SALES_TABLE, self.bar.bar_id, "sale-1"))
+        await self.db.commit()
+
+        # Hit: answered from the LRU
+        hits = recent_keys.hits
+        [cached] = await write_sales(self.db, self.bar.bar_id, [self._sale("sale-1")])
+        self.assertEqual(recent_keys.hits, hits + 1)
+        self.assertTrue(cached["replayed"])
+        self.assertEqual(cached["id"], first["id"])
+
+        # Miss: resolved through the claims table
+        recent_keys.clear()
+        hits = recent_keys.hits
+        [stored] = await write_sales(self.db, self.bar.bar_id, [self._sale("sale-1")])
+        self.assertEqual(recent_keys.hits, hits)
+        self.assertTrue(stored["replayed"])
+        self.assertEqual(stored["id"], first["id"])
+
+
+class IdempotentStockMovementTest(DatabaseTestCase):
+    async def asyncSetUp(self):
+        recent_keys.clear()
+        await super().asyncSetUp()
+        self.staff = await self.db.get(User, self.bar.staff_id)
+        self.product_id = self.bar.product_ids[0]
+
+    async def asyncTearDown(self):
+        await super().asyncTearDown()
+        recent_keys.clear()
+
+    async def _current_stock(self):
+        return float((await self.db.execute(
+            select(Product.current_stock).where(Product.id == self.product_id)
+        )).scalar_one())
+
+    async def _receive(self, quantity):
+        response = Response()
+        data = StockMovementCreate(
+            product_id=self.product_id, type=MovementType.IN, quantity=quantity, idempotency_key="delivery-1",
+        )
+        movement = await create_stock_movement(data, response, self.staff, self.db)
+        await self.db.commit()
+        return response, movement
+
+    async def test_replay_leaves_current_stock_unchanged(self):
+        before = await self._current_stock()
+        _, first = await self._receive(6)
+        self.assertFalse(first.replayed)
+        self.assertEqual(await self._current_stock(), before + 6)
+
+        for from_cache in (True, False):
+            with self.subTest(from_cache=from_cache):
+                if not from_cache:
+                    recent_keys.clear()
+                self.assertEqual(
+                    recent_keys.get(MOVEMENTS_TABLE, self.bar.bar_id, "delivery-1") is not None, from_cache,
+                )
+                response, again = await self._receive(9)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(again.replayed)
+                self.assertEqual(again.id, first.id)
+                self.assertEqual(again.quantity, 6)
+                self.assertEqual(await self._current_stock(), before + 6)
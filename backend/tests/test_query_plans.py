@@ -0,0 +1,197 @@
+"""
+Query plan checks.
+
+Drives the API's hot paths against a seeded synthetic bar, captures every
+statement they issue and EXPLAINs it with sequential scans disabled. The
+planner then only falls back to a Seq Scan when no index can serve the
+access path, so a Seq Scan on one of LARGE_TABLES means a query lost its
+index, however much (or little) data the database holds.
+
+The synthetic bar is committed, since the app reads it on its own
+connections, and purged afterwards.
+"""
+import random
+import unittest
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+import httpx
+from sqlalchemy import event, select
+
+from app.database import engine, AsyncSessionLocal, Base
+from app.main import app
+from app.middleware.auth import create_access_token
+from app.models import Shift, ShiftStatus, UserRole
+from app.services.pagination import encode_cursor
+from app.services.partitions import partition_parent
+from benchmarks.generator import SyntheticBarSpec, analyze, purge_bar, seed_bar, seed_open_shift
+
+# Tables that grow with trading history; small per-bar tables (users,
+# suppliers, loss rules) may be scanned
+LARGE_TABLES = frozenset({
+    "sales_records", "stock_movements", "loss_reports", "shifts", "shift_stock_counts",
+    "daily_reconciliations", "shift_product_ledger", "products", "purchase_orders",
+    "purchase_order_items", "daily_product_rollups", "staff_daily_scorecards", "idempotency_keys",
+})
+
+EXPLAINABLE_VERBS = ("SELECT", "WITH", "UPDATE", "DELETE", "INSERT")
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    method: str
+    path: str            # formatted with the check context (shift_id, product_id, ...)
+    as_staff: bool = False
+    expected_status: int = 200
+
+
+PLAN_CHECKS = [
+    PlanCheck("list_sales", "GET", "/api/v1/sales"),
+    PlanCheck("list_sales_by_shift", "GET", "/api/v1/sales?shift_id={shift_id}"),
+    PlanCheck("list_sales_by_product", "GET", "/api/v1/sales?product_id={product_id}"),
+    PlanCheck("list_sales_next_page", "GET", "/api/v1/sales?cursor={sales_cursor}"),
+    PlanCheck("list_stock_movements", "GET", "/api/v1/stock-movements"),
+    PlanCheck("list_stock_movements_by_product", "GET", "/api/v1/stock-movements?product_id={product_id}"),
+    PlanCheck("list_loss_reports", "GET", "/api/v1/loss-reports"),
+    PlanCheck("list_unresolved_loss_reports", "GET", "/api/v1/loss-reports?unresolved_only=true"),
+    PlanCheck("list_loss_reports_next_page", "GET", "/api/v1/loss-reports?cursor={loss_reports_cursor}"),
+    PlanCheck("loss_summary", "GET", "/api/v1/loss-reports/summary"),
+    PlanCheck("list_reconciliations_by_shift", "GET", "/api/v1/reconciliation?shift_id={shift_id}"),
+    PlanCheck("list_shifts", "GET", "/api/v1/shifts"),
+    PlanCheck("list_shifts_next_page", "GET", "/api/v1/shifts?cursor={shifts_cursor}"),
+    PlanCheck("list_open_shifts", "GET", "/api/v1/shifts?shift_status=open"),
+    PlanCheck("daily_shifts", "GET", "/api/v1/shifts/daily"),
+    PlanCheck("get_shift", "GET", "/api/v1/shifts/{shift_id}"),
+    PlanCheck("list_products", "GET", "/api/v1/products"),
+    PlanCheck("list_products_next_page", "GET", "/api/v1/products?cursor={products_cursor}"),
+    PlanCheck("search_products", "GET", "/api/v1/products/search?q=sku%20001"),
+    PlanCheck("scan_products", "POST", "/api/v1/products/scan"),
+    PlanCheck("low_stock_alerts", "GET", "/api/v1/products/low-stock/alerts"),
+    PlanCheck("list_purchase_orders", "GET", "/api/v1/purchase-orders"),
+    PlanCheck("dashboard_manager", "GET", "/api/v1/dashboard/manager"),
+    PlanCheck("dashboard_owner", "GET", "/api/v1/dashboard/owner"),
+    PlanCheck("dashboard_staff", "GET", "/api/v1/dashboard/staff"),
+    PlanCheck("open_shift_check", "POST", "/api/v1/shifts/open", as_staff=True, expected_status=400),
+    PlanCheck("close_shift", "POST", "/api/v1/shifts/{open_shift_id}/close"),
+]
+
+
+class StatementRecorder:
+    """Collects the distinct statements issued on the app engine while active."""
+
+    def __init__(self):
+        self.statements: dict[str, tuple] = {}
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if executemany or verb not in EXPLAINABLE_VERBS:
+            return
+        # A bare INSERT ... VALUES reads nothing
+        if verb == "INSERT" and " SELECT " not in statement.upper():
+            return
+        self.statements.setdefault(statement, parameters)
+
+    def __enter__(self):
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(engine.sync_engine, "before_cursor_execute", self._before_execute)
+
+
+def seq_scans(plan: dict) -> list[str]:
+    """
+    Relations read with a Seq Scan anywhere in an EXPLAIN (FORMAT JSON) plan
+    node; monthly partitions count as their partitioned table.
+    """
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(partition_parent(plan["Relation Name"]) or plan["Relation Name"])
+    for child in plan.get("Plans", ()):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def explain_statements(statements: dict[str, tuple]) -> list[str]:
+    """
+    EXPLAIN each statement with sequential scans disabled; rolled back,
+    nothing runs. Returns one line per statement scanning a large table.
+    """
+    findings = []
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        for statement, parameters in statements.items():
+            result = await conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = result.scalar()[0]["Plan"]
+            tables = sorted(set(seq_scans(plan)) & LARGE_TABLES)
+            if tables:
+                findings.append(f"Seq Scan on {', '.join(tables)}: {' '.join(statement.split())[:160]}")
+        await conn.rollback()
+    return findings
+
+
+class QueryPlanTest(unittest.IsolatedAsyncioTestCase):
+    spec = SyntheticBarSpec(skus=200, shifts=40)
+
+    async def asyncSetUp(self):
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        except (OSError, ConnectionError) as e:
+            await engine.dispose()
+            self.skipTest(f"database unavailable: {e}")
+
+        rng = random.Random(self.spec.seed + 1)
+        async with AsyncSessionLocal() as db:
+            self.bar = await seed_bar(db, self.spec)
+            self.open_shift_id, self.closing = await seed_open_shift(db, self.bar, self.spec, rng)
+            self.shift_id = (await db.execute(
+                select(Shift.id).where(Shift.bar_id == self.bar.bar_id, Shift.status == ShiftStatus.CLOSED).limit(1)
+            )).scalar()
+            await db.commit()
+            await analyze(db)
+            await db.commit()
+
+    async def asyncTearDown(self):
+        async with AsyncSessionLocal() as db:
+            await purge_bar(db, self.bar.bar_id)
+            await db.commit()
+        # The pool's connections belong to this test's event loop
+        await engine.dispose()
+
+    async def test_hot_paths_use_indexes(self):
+        # Keyset continuation from the middle of history; the plan is what matters
+        midpoint = (datetime.utcnow() - timedelta(days=self.spec.shifts // 2), self.shift_id)
+        context = {
+            "shift_id": self.shift_id,
+            "product_id": self.bar.product_ids[0],
+            "open_shift_id": self.open_shift_id,
+            "sales_cursor": encode_cursor("sales", midpoint),
+            "loss_reports_cursor": encode_cursor("loss-reports", midpoint),
+            "shifts_cursor": encode_cursor("shifts", midpoint),
+            "products_cursor": encode_cursor("products", ("SKU 00100", self.shift_id)),
+        }
+        bodies = {
+            "scan_products": {"codes": [f"{i:013d}" for i in range(0, 40, 3)] + ["SKU-00007", "unknown"]},
+            "open_shift_check": {"stock_counts": []},
+            "close_shift": {"stock_counts": [{"product_id": str(p), "count": c} for p, c in self.closing.items()]},
+        }
+        owner_headers = {"Authorization": f"Bearer {self.bar.token}"}
+        # The staff member already has the seeded open shift, so opening stops at the check
+        staff_token = create_access_token(str(self.bar.staff_id), str(self.bar.bar_id), UserRole.STAFF.value)
+        staff_headers = {"Authorization": f"Bearer {staff_token}"}
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://plans") as client:
+            for check in PLAN_CHECKS:
+                with self.subTest(check.name):
+                    with StatementRecorder() as recorder:
+                        response = await client.request(
+                            check.method,
+                            check.path.format(**context),
+                            json=bodies.get(check.name),
+                            headers=staff_headers if check.as_staff else owner_headers,
+                        )
+                    self.assertEqual(response.status_code, check.expected_status, response.text)
+                    self.assertTrue(recorder.statements)
+                    self.assertEqual(await explain_statements(recorder.statements), [])
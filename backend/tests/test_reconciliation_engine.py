@@ -0,0 +1,47 @@
+from sqlalchemy import select, update
+
+from app.models import DailyReconciliation, Shift, ShiftStockCount
+from app.services.reconciliation_engine import rereconcile_shift
+from tests.support import DatabaseTestCase
+
+
+class RereconcileShiftTest(DatabaseTestCase):
+    async def _last_shift(self):
+        result = await self.db.execute(
+            select(Shift).where(Shift.bar_id == self.bar.bar_id).order_by(Shift.start_time.desc()).limit(1)
+        )
+        return result.scalar_one()
+
+    async def test_unchanged_shift_writes_nothing(self):
+        shift = await self._last_shift()
+        summary = await rereconcile_shift(self.db, self.bar.bar_id, shift.id, shift.business_date)
+
+        self.assertEqual(summary["created"], 0)
+        self.assertEqual(summary["updated"], 0)
+        self.assertEqual(summary["unchanged"], self.spec.skus)
+        self.assertEqual(summary["changes"], [])
+
+    async def test_corrected_count_updates_its_product(self):
+        shift = await self._last_shift()
+        product_id = self.bar.product_ids[0]
+        await self.db.execute(
+            update(ShiftStockCount)
+            .where(ShiftStockCount.shift_id == shift.id, ShiftStockCount.product_id == product_id)
+            .values(closing_count=ShiftStockCount.closing_count + 3)
+        )
+
+        summary = await rereconcile_shift(self.db, self.bar.bar_id, shift.id, shift.business_date)
+
+        self.assertEqual(summary["updated"], 1)
+        self.assertEqual(summary["unchanged"], self.spec.skus - 1)
+        recon = (await self.db.execute(
+            select(DailyReconciliation).where(
+                DailyReconciliation.shift_id == shift.id, DailyReconciliation.product_id == product_id,
+            )
+        )).scalar_one()
+        counted = (await self.db.execute(
+            select(ShiftStockCount.closing_count).where(
+                ShiftStockCount.shift_id == shift.id, ShiftStockCount.product_id == product_id,
+            )
+        )).scalar_one()
+        self.assertEqual(float(recon.actual_closing), float(counted))
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from app.models import DailyReconciliation, LossReport, LossSeverity, ReasonCode, ShiftStockCount
+from app.services.reconciliation_replay import replay_bar
+from tests.support import DatabaseTestCase
+
+
+class ReplayReviewedLossTest(DatabaseTestCase):
+    async def _settle(self, loss: LossReport) -> None:
+        """Correct the closing count so the loss's discrepancy disappears."""
+        expected = (await self.db.execute(
+            select(DailyReconciliation.expected_closing).where(DailyReconciliation.id == loss.reconciliation_id)
+        )).scalar_one()
+        await self.db.execute(
+            update(ShiftStockCount)
+            .where(ShiftStockCount.shift_id == loss.shift_id, ShiftStockCount.product_id == loss.product_id)
+            .values(closing_count=expected)
+        )
+
+    async def test_reviewed_report_within_threshold_is_downgraded_not_deleted(self):
+        losses = (await self.db.execute(
+            select(LossReport).where(LossReport.bar_id == self.bar.bar_id).order_by(LossReport.id).limit(2)
+        )).scalars().all()
+        self.assertEqual(len(losses), 2)
+        reviewed, unreviewed = losses
+        reviewed.reason_code = ReasonCode.WASTAGE
+        reviewed.reviewed_by = self.bar.owner_id
+        reviewed.reviewed_at = datetime.utcnow()
+        reviewed.notes = "Dropped crate"
+        await self.db.flush()
+        await self._settle(reviewed)
+        await self._settle(unreviewed)
+        day = (await self.db.execute(
+            select(DailyReconciliation.date).where(DailyReconciliation.id == reviewed.reconciliation_id)
+        )).scalar_one()
+        reviewed_key = (reviewed.shift_id, reviewed.product_id)
+        unreviewed_key = (unreviewed.shift_id, unreviewed.product_id)
+        self.db.expunge_all()
+
+        summary = await replay_bar(self.db, self.bar.bar_id, day.replace(day=1), datetime.utcnow().date())
+
+        self.assertEqual(summary["reviews_downgraded"], 1)
+        self.assertGreaterEqual(summary["reviews_kept"], 1)
+        after = {
+            (loss.shift_id, loss.product_id): loss
+            for loss in (await self.db.execute(
+                select(LossReport).where(LossReport.bar_id == self.bar.bar_id)
+            )).scalars().all()
+        }
+        kept = after[reviewed_key]
+        self.assertEqual(kept.severity, LossSeverity.INFO)
+        self.assertEqual(float(kept.discrepancy_quantity), 0)
+        self.assertEqual(kept.reason_code, ReasonCode.WASTAGE)
+        self.assertEqual(kept.reviewed_by, self.bar.owner_id)
+        self.assertEqual(kept.notes, "Dropped crate")
+        self.assertNotIn(unreviewed_key, after)
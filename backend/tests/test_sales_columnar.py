@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+
+from sqlalchemy import func, select
+
+from app.models import SalesRecord
+from app.services.sales_columnar import SalesParquetParser, pa
+from tests.support import DatabaseTestCase
+
+if pa is not None:
+    import pyarrow.parquet as pq
+
+
+@unittest.skipIf(pa is None, "pyarrow is not installed")
+class NullSkuParquetTest(DatabaseTestCase):
+    async def _import(self, columns: dict) -> tuple[int, list]:
+        shift_id = (await self.db.execute(
+            select(SalesRecord.shift_id).where(SalesRecord.bar_id == self.bar.bar_id).limit(1)
+        )).scalar_one()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "sales.parquet")
+            pq.write_table(pa.table(columns), path)
+            parser = SalesParquetParser(self.db, self.bar.bar_id, {"shift_id": str(shift_id)})
+            await parser.prepare()
+            written, errors = 0, []
+            async for batch in parser.file_batches(path):
+                batch_written, batch_errors = await parser.write_batch(batch.records)
+                written += batch_written
+                errors.extend(batch_errors)
+        return written, errors
+
+    async def _sales_count(self) -> int:
+        result = await self.db.execute(select(func.count()).where(SalesRecord.bar_id == self.bar.bar_id))
+        return result.scalar_one()
+
+    async def test_null_sku_falls_back_to_barcode_then_name(self):
+        before = await self._sales_count()
+        written, errors = await self._import({
+            "sku": pa.array([None, None, None, None, "SKU-00003"], pa.string()),
+            "barcode": pa.array(["0000000000000", None, "  ", None, None], pa.string()),
+            "product_name": ["ignored", "sku 00001", "SKU 00002", None, "ignored"],
+            "quantity_sold": [1, 2, 3, 4, 5],
+            "sale_amount": [10.0, 20.0, 30.0, 40.0, 50.0],
+        })
+
+        self.assertEqual(written, 4)
+        self.assertEqual(errors, [(4, "sku / barcode / product_name is missing")])
+        self.assertEqual(await self._sales_count(), before + 4)
+
+    async def test_all_null_sku_column_matches_on_name(self):
+        written, errors = await self._import({
+            "sku": pa.nulls(3),
+            "product_name": ["SKU 00000", "SKU 00001", "No Such Product"],
+            "quantity_sold": [1, 1, 1],
+            "sale_amount": [5.0, 5.0, 5.0],
+        })
+
+        self.assertEqual(written, 2)
+        self.assertEqual([number for number, _ in errors], [3])
+        self.assertTrue(errors[0][1].startswith("Product 'No Such Product' not found"))
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import unittest
+import uuid
+from unittest import mock
+
+from app.services import sales_stream
+from app.services.sales_stream import BarSalesBuffer, PendingSale, SalesStream, stream_sales
+
+
+class FakeSession:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        pass
+
+
+async def body(lines, hold: asyncio.Event | None = None):
+    """An NDJSON request body, one chunk per line, optionally held open until `hold` is set."""
+    for line in lines:
+        yield (line + "\n").encode()
+        await asyncio.sleep(0)
+    if hold is not None:
+        await hold.wait()
+
+
+async def read_acks(response) -> list[dict]:
+    return [json.loads(line) async for line in response]
+
+
+class SalesStreamTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bar_id = uuid.uuid4()
+        self.product_id = uuid.uuid4()
+        self.shift_id = uuid.uuid4()
+        self.batches: list[list[dict]] = []
+        self.release = asyncio.Event()
+        self.release.set()
+
+        async def write_sales(db, bar_id, rows):
+            await self.release.wait()
+            self.batches.append(rows)
+            return [{**row, "replayed": False} for row in rows]
+
+        async def known_sales_refs(db, bar_id, rows):
+            return {self.product_id}, {self.shift_id}
+
+        for patcher in (
+            mock.patch.object(sales_stream, "write_sales", write_sales),
+            mock.patch.object(sales_stream, "known_sales_refs", known_sales_refs),
+            mock.patch.object(sales_stream, "AsyncSessionLocal", FakeSession),
+            mock.patch.dict(sales_stream._buffers, clear=True),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self):
+        self.release.set()
+        await sales_stream.drain_sales_buffers(timeout=1)
+
+    def configure(self, batch_rows, flush_seconds=60.0, max_pending=5000):
+        for name, value in (
+            ("SALES_STREAM_BATCH_ROWS", batch_rows),
+            ("SALES_STREAM_FLUSH_SECONDS", flush_seconds),
+            ("SALES_STREAM_MAX_PENDING_ROWS", max_pending),
+        ):
+            patcher = mock.patch.object(sales_stream.settings, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sale(self, quantity=1, product_id=None) -> str:
+        return json.dumps({
+            "product_id": str(product_id or self.product_id),
+            "shift_id": str(self.shift_id),
+            "quantity_sold": quantity,
+            "sale_amount": 10 * quantity,
+        })
+
+    async def test_full_batches_flush_without_waiting(self):
+        self.configure(batch_rows=3)
+
+        acks = await asyncio.wait_for(
+            read_acks(stream_sales(self.bar_id, body([self.sale(q) for q in range(1, 7)]))), timeout=5,
+        )
+
+        self.assertEqual([len(rows) for rows in self.batches], [3, 3])
+        self.assertEqual([row["quantity_sold"] for row in self.batches[1]], [4, 5, 6])
+        self.assertEqual(
+            [(ack["batch"], ack["through"], ack["accepted"]) for ack in acks[:-1]], [(1, 3, 3), (2, 6, 3)],
+        )
+        self.assertEqual(acks[-1], {"done": True, "lines": 6, "accepted": 6, "rejected": 0})
+
+    async def test_partial_batch_flushes_after_flush_seconds(self):
+        self.configure(batch_rows=100, flush_seconds=0.05)
+        hold = asyncio.Event()
+        response = stream_sales(self.bar_id, body([self.sale(), self.sale()], hold))
+
+        # The body is still open, so only the timer can have flushed
+        ack = json.loads(await asyncio.wait_for(anext(response), timeout=5))
+        self.assertEqual((ack["batch"], ack["through"], ack["accepted"]), (1, 2, 2))
+        self.assertEqual([len(rows) for rows in self.batches], [2])
+
+        hold.set()
+        summary = json.loads(await anext(response))
+        self.assertEqual(summary, {"done": True, "lines": 2, "accepted": 2, "rejected": 0})
+
+    async def test_streams_of_one_bar_share_a_batch(self):
+        self.configure(batch_rows=4)
+
+        first, second = await asyncio.wait_for(asyncio.gather(
+            read_acks(stream_sales(self.bar_id, body([self.sale(1), self.sale(2)]))),
+            read_acks(stream_sales(self.bar_id, body([self.sale(3), self.sale(4)]))),
+        ), timeout=5)
+
+        self.assertEqual(len(self.batches), 1)
+        self.assertEqual(sorted(row["quantity_sold"] for row in self.batches[0]), [1, 2, 3, 4])
+        for acks in (first, second):
+            self.assertEqual(acks[0], {"seq": 1, "batch": 1, "through": 2, "accepted": 2, "replayed": 0, "rejected": []})
+            self.assertEqual(acks[1]["accepted"], 2)
+
+    async def test_rejected_lines_are_acknowledged(self):
+        self.configure(batch_rows=3)
+        unknown = uuid.uuid4()
+
+        acks = await asyncio.wait_for(read_acks(stream_sales(
+            self.bar_id, body([self.sale(), "not json", self.sale(product_id=unknown)]),
+        )), timeout=5)
+
+        self.assertEqual([len(rows) for rows in self.batches], [1])
+        ack = acks[0]
+        self.assertEqual((ack["through"], ack["accepted"]), (3, 1))
+        self.assertEqual([r["line"] for r in ack["rejected"]], [2, 3])
+        self.assertEqual(ack["rejected"][1]["error"], f"Unknown product {unknown}")
+        self.assertEqual(acks[-1], {"done": True, "lines": 3, "accepted": 1, "rejected": 2})
+
+    async def test_put_waits_for_room(self):
+        self.configure(batch_rows=2, flush_seconds=0.05, max_pending=2)
+        self.release.clear()
+        buffer = BarSalesBuffer(self.bar_id)
+        stream = SalesStream(self.bar_id)
+        loop = asyncio.get_running_loop()
+
+        def pending(line):
+            row = {"product_id": self.product_id, "shift_id": self.shift_id, "quantity_sold": 1, "sale_amount": 10}
+            return PendingSale(stream, line, row, None, loop.time())
+
+        # The writer takes the first two lines and blocks writing them
+        for line in (1, 2):
+            await buffer.put(pending(line))
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(buffer.pending), 0)
+
+        for line in (3, 4):
+            await buffer.put(pending(line))
+        blocked = asyncio.create_task(buffer.put(pending(5)))
+        await asyncio.sleep(0.01)
+        self.assertFalse(blocked.done())
+        self.assertEqual(len(buffer.pending), 2)
+
+        # Once the first batch is written the writer takes the next, making room
+        self.release.set()
+        await asyncio.wait_for(blocked, timeout=5)
+        await asyncio.wait_for(buffer._writer, timeout=5)
+        self.assertEqual([len(rows) for rows in self.batches], [2, 2, 1])
+        self.assertEqual(stream.acked, 5)